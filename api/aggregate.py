@@ -0,0 +1,143 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+from query import Predicate, SortKey, check_columns, filter_positions
+
+FUNCTIONS = ["size", "count", "nunique", "sum", "mean", "median", "min", "max", "std", "var", "quantile", "describe"]
+
+# describe() is expanded into these aggregates, named like the columns of DataFrame.describe()
+DESCRIBE = [("count", "count", None), ("mean", "mean", None), ("std", "std", None), ("min", "min", None)]
+DESCRIBE += [(f"{q:.0%}", "quantile", q) for q in (0.25, 0.5, 0.75)] + [("max", "max", None)]
+
+
+# Request models of /aggregate
+class Aggregation(BaseModel):
+    column: Optional[str] = None
+    func: str
+    q: Optional[float] = None
+
+
+class AggregateRequest(BaseModel):
+    group_by: List[str] = []
+    aggregations: List[Aggregation]
+    filters: List[Predicate] = []
+    dropna: bool = True
+    sort: List[SortKey] = []
+    limit: Optional[int] = Field(None, ge=0)
+
+
+def aggregate_specs(aggregations):
+    # Expands requested aggregations into (output name, column, function, quantile) tuples
+    specs = []
+    for aggregation in aggregations:
+        if aggregation.func not in FUNCTIONS:
+            raise ValueError(f"Unsupported function '{aggregation.func}', expected one of {FUNCTIONS}")
+        if aggregation.func != "size" and aggregation.column is None:
+            raise ValueError(f"Function '{aggregation.func}' requires a column")
+        if aggregation.func == "describe":
+            for name, func, q in DESCRIBE:
+                specs.append((f"{aggregation.column}_{name}", aggregation.column, func, q))
+        elif aggregation.func == "quantile":
+            if aggregation.q is None or not 0 <= aggregation.q <= 1:
+                raise ValueError("Function 'quantile' requires q between 0 and 1")
+            specs.append((f"{aggregation.column}_q{aggregation.q:g}", aggregation.column, "quantile", aggregation.q))
+        elif aggregation.func == "size":
+            specs.append(("size", None, "size", None))
+        else:
+            specs.append((f"{aggregation.column}_{aggregation.func}", aggregation.column, aggregation.func, None))
+    return specs
+
+
+def run_aggregate(df: pd.DataFrame, request) -> pd.DataFrame:
+    specs = aggregate_specs(request.aggregations)
+    value_columns = list(dict.fromkeys(column for _, column, _, _ in specs if column is not None))
+    check_columns(df, request.group_by + value_columns)
+    check_columns(df, [predicate.column for predicate in request.filters])
+
+    # Only the group keys and aggregated columns of the matching rows are taken from the stored frame
+    columns = list(dict.fromkeys(request.group_by + value_columns))
+    if request.filters:
+        positions = filter_positions(df, request.filters)
+        frame = df.iloc[positions, [df.columns.get_loc(column) for column in columns]]
+    else:
+        frame = df[columns]
+    # Floats may be stored compacted to float32, statistics are still computed in float64
+    float32_columns = [column for column in value_columns if frame[column].dtype == np.float32]
+    if float32_columns:
+        frame = frame.astype({column: np.float64 for column in float32_columns})
+
+    results = {}
+    if request.group_by:
+        grouped = frame.groupby(request.group_by, dropna=request.dropna, sort=True, observed=True)
+        for name, column, func, q in specs:
+            if func == "size":
+                results[name] = grouped.size()
+            elif func == "quantile":
+                results[name] = grouped[column].quantile(q)
+            else:
+                results[name] = grouped[column].agg(func)
+        result = pd.DataFrame(results).reset_index()
+    else:
+        for name, column, func, q in specs:
+            if func == "size":
+                results[name] = len(frame)
+            elif func == "quantile":
+                results[name] = frame[column].quantile(q)
+            else:
+                results[name] = frame[column].agg(func)
+        result = pd.DataFrame([results])
+
+    if request.sort:
+        check_columns(result, [key.column for key in request.sort])
+        result = result.sort_values(
+            by=[key.column for key in request.sort],
+            ascending=[not key.descending for key in request.sort],
+            kind="stable",
+        )
+    if request.limit is not None:
+        result = result.head(request.limit)
+    return result.reset_index(drop=True)
+
+
+def result_to_json(result: pd.DataFrame) -> dict:
+    # NaN / NaT are not valid JSON, they are sent as null
+    values = result.astype(object).where(result.notna(), None)
+    rows = [[value.item() if isinstance(value, np.generic) else value for value in row] for row in values.values]
+    return {"columns": list(result.columns), "data": rows}
+
+
+class AggregateCache:
+    # LRU of aggregate results keyed by dataset version and request, so EDA reruns do not recompute them
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, version, request):
+        payload = json.dumps(request.model_dump(), sort_keys=True, default=str)
+        return version, hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, version=None):
+        # Drops entries of the given dataset version (or everything if version is None)
+        for key in [key for key in self.entries if version is None or key[0] == version]:
+            del self.entries[key]
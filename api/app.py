@@ -1,17 +1,40 @@
+import asyncio
 import logging
 import pickle
 from contextlib import asynccontextmanager
-from io import BytesIO
 from json import JSONDecodeError
-from typing import Annotated, Any, Dict, List
+from typing import Annotated, Any, Dict, List, Optional
 
 import pandas as pd
-from sklearn.ensemble import RandomForestRegressor
-from fastapi import FastAPI, HTTPException, Request
+from aggregate import AggregateCache, AggregateRequest, result_to_json, run_aggregate
+from catboost import CatBoostRegressor
+from compact import compact_dtypes
+from crossval import MAX_FOLDS, MAX_REPEATS, cross_validate_job, early_stopping_params
+from datasets import DEFAULT_DATASET, DatasetRegistry, parse_dataset_id
+from fastapi import BackgroundTasks, FastAPI, Header, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
+from features import FeatureCache, PreprocessedCache, append_preprocessed, append_rows, new_rows
+from jobs import JobQueue
+from pools import PoolCache
 from preprocess import preprocess_data, preprocess_data_for_model
-from pydantic import BaseModel
-from sklearn.metrics import r2_score, root_mean_squared_error
+from profiles import compute_profile
+from pydantic import BaseModel, Field
+from query import QueryRequest, run_query
+from responses import CompressionMiddleware, ORJSONResponse
+from search import DEFAULT_ETA, STRATEGIES, configurations, search_job
+from serialization import (
+    ARROW_STREAM,
+    PARQUET,
+    compress_stream,
+    iter_arrow_stream,
+    iter_parquet,
+    negotiate_encoding,
+    read_dataframe,
+)
+from sklearn.ensemble import RandomForestRegressor
+from starlette.concurrency import run_in_threadpool
+from training import train_job
+from uploads import CHUNK_SIZE, UploadStore
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,39 +45,249 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-df = pd.DataFrame()
+datasets = DatasetRegistry()
 models = {}
+uploads = UploadStore()
+aggregate_cache = AggregateCache()
+preprocessed = PreprocessedCache()
+feature_cache = FeatureCache()
+pool_cache = PoolCache()
+training_jobs = JobQueue()
+# Appends read the latest version and store a new one, two of them on the same dataset must not interleave
+append_lock = asyncio.Lock()
+
+DatasetId = Annotated[str, Query(description="Dataset name (latest version) or name@version")]
+
+
+def drop_cached(removed):
+    # Drops cached results of removed dataset versions. Feature matrices and pools are keyed by the version
+    # alone, they are kept while another dataset name stores the same content
+    stored = {version for entry in datasets.list() for version in entry["versions"]}
+    for info in removed:
+        preprocessed.invalidate(info["dataset_id"])
+        aggregate_cache.invalidate(info["dataset_id"])
+        if info["version"] not in stored:
+            feature_cache.invalidate(info["version"])
+            pool_cache.invalidate(info["version"])
+        logger.info(f"Cached results of dataset {info['dataset_id']} dropped")
+
+
+async def store_dataset(dataset_id: str, dataframe: pd.DataFrame) -> dict:
+    # Compacting and persisting touch every value, keep them off the event loop
+    dataframe, report = await run_in_threadpool(compact_dtypes, dataframe)
+    logger.info(
+        f"DataFrame memory usage {report['memory_before']} -> {report['memory_after']} bytes, "
+        f"dtypes changed: {report['dtypes']}"
+    )
+    info, removed = await run_in_threadpool(datasets.put, dataset_id, dataframe)
+    logger.info(f"Dataset {info['dataset_id']} stored: {info['rows']} rows, {len(info['columns'])} columns")
+    # Versions beyond keep_versions were pruned from disk, their cached results go with them
+    await run_in_threadpool(drop_cached, removed)
+    return {
+        "message": "DataFrame successfully received",
+        "dataset_id": info["dataset_id"],
+        "rows": info["rows"],
+        **report,
+    }
+
+
+def build_profile(dataset_id: str) -> dict:
+    dataframe, info = datasets.get(dataset_id)
+    profile = {"dataset_id": info["dataset_id"], **compute_profile(dataframe)}
+    datasets.save_profile(info, profile)
+    logger.info(f"Profile of dataset {info['dataset_id']} computed")
+    return profile
+
+
+def build_profile_task(dataset_id: str):
+    # Runs after the upload response is sent; an existing profile of the same version is reused
+    try:
+        if datasets.load_profile(datasets.info(dataset_id)) is None:
+            build_profile(dataset_id)
+    except Exception as e:
+        logger.error(f"Error computing profile of dataset {dataset_id}: {str(e)}")
+
+
+async def load_dataset(dataset_id: str, status_code: int = 404):
+    # Returns (DataFrame, info); the same status code is used for unknown and empty datasets
+    try:
+        dataframe, info = await run_in_threadpool(datasets.get, dataset_id)
+    except KeyError:
+        logger.error(f"Dataset {dataset_id} not found")
+        raise HTTPException(status_code=status_code, detail=f"Dataset '{dataset_id}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if dataframe.empty:
+        logger.error("DataFrame is empty or not initialized")
+        raise HTTPException(status_code=status_code, detail="DataFrame is empty or not initialized")
+    return dataframe, info
 
 
 class ColumnsRequest(BaseModel):
     columns: list
 
 
+class CrossValidationRequest(BaseModel):
+    folds: int = Field(5, ge=2, le=MAX_FOLDS)
+    repeats: int = Field(1, ge=1, le=MAX_REPEATS, description="More than 1 for repeated k-fold")
+    seed: int = 0
+    parallel: Optional[int] = Field(None, gt=0, description="Folds fitted at the same time, all cores by default")
+
+
 class TrainModelRequest(BaseModel):
     model_id: str
     model_name: str
     hyperparameters: Dict[str, Any]
+    cv: Optional[CrossValidationRequest] = Field(
+        None, description="Cross-validate instead of the single train / validation / test split"
+    )
+
+
+class SearchRequest(BaseModel):
+    model_id: str = Field(description="Prefix of the trial model ids, trial N is registered as <model_id>-N")
+    model_name: str
+    strategy: str = Field("grid", description=f"One of {STRATEGIES}")
+    space: Dict[str, Any] = Field(description='Parameter -> list of values or {"low", "high", "log", "type"}')
+    hyperparameters: Dict[str, Any] = Field({}, description="Fixed hyperparameters of every trial")
+    n_trials: Optional[int] = Field(None, gt=0, description="Configurations sampled by random and halving")
+    parallel: Optional[int] = Field(None, gt=0, description="Trials fitted at the same time, all cores by default")
+    eta: int = Field(DEFAULT_ETA, ge=2)
+    min_iterations: Optional[int] = Field(None, gt=0)
+    seed: int = 0
 
 
 class SuccessResponse(BaseModel):
     message: str
 
 
-class ErrorResponse(BaseModel):
-    detail: str
+class DatasetResponse(BaseModel):
+    message: str
+    dataset_id: str
+    rows: int
+    memory_before: int
+    memory_after: int
+    dtypes: Dict[str, str]
+
+
+class ColumnProfile(BaseModel):
+    name: str
+    dtype: str
+    nulls: int
+    nunique: int
+
+
+class Histogram(BaseModel):
+    edges: List[float]
+    counts: List[int]
+
+
+class DatasetProfile(BaseModel):
+    dataset_id: str
+    rows: int
+    memory_bytes: int
+    columns: List[ColumnProfile]
+    describe: Dict[str, List[Any]]
+    top_values: Dict[str, List[List[Any]]]
+    histograms: Dict[str, Histogram]
 
 
-class DataFrameResponse(BaseModel):
-    df: str
+class AppendResponse(DatasetResponse):
+    previous_dataset_id: str
+    appended: int
+    duplicates: int
 
 
-class ModelResponse(BaseModel):
-    id: str
+class DatasetInfo(BaseModel):
+    dataset_id: str
     name: str
+    version: str
+    rows: int
+    columns: List[str]
+    size_bytes: int
+    created_at: float
+    versions: List[str] = []
+
+
+class OpenUploadRequest(BaseModel):
+    filename: str
+    dataset_id: str = DEFAULT_DATASET
+    format: str = "csv"
+    total_size: Optional[int] = None
+    chunk_size: int = CHUNK_SIZE
+
+
+class UploadSessionResponse(BaseModel):
+    session_id: str
+    dataset_id: str = DEFAULT_DATASET
+    filename: str
+    format: str
+    total_size: Optional[int]
+    chunk_size: int
+    received_chunks: List[int]
+    received_bytes: int
+
+
+class ChunkResponse(BaseModel):
+    index: int
+    size: int
+
+
+class CommitUploadRequest(BaseModel):
+    total_chunks: int
+
+
+class AggregateResponse(BaseModel):
+    dataset_id: str
+    cached: bool
+    columns: List[str]
+    data: List[List[Any]]
+
+
+class ErrorResponse(BaseModel):
+    detail: str
+
+
+class Trial(BaseModel):
+    trial: int
+    model_id: Optional[str] = None
+    hyperparameters: Dict[str, Any]
     status: str
+    rung: int
+    iterations: Optional[int] = None
+    validation_rmse: Optional[float] = None
+    metrics: Optional[Dict[str, float]] = None
+    error: Optional[str] = None
+
+
+class Fold(BaseModel):
+    repeat: int
+    fold: int
+    rows: int
     metrics: Dict[str, float]
 
 
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    progress: float
+    iteration: Optional[int] = None
+    iterations: Optional[int] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    elapsed: Optional[float] = None
+    error: Optional[str] = None
+    warning: Optional[str] = None
+    model_id: str
+    model_name: str
+    dataset_id: str
+    metrics: Optional[Dict[str, float]] = None
+    trials: Optional[List[Trial]] = None
+    folds: Optional[List[Fold]] = None
+    best_model_id: Optional[str] = None
+
+
 class ModelInfo(BaseModel):
     model_id: str
     model_name: str
@@ -90,7 +323,7 @@ async def lifespan(app: FastAPI):
         model = RandomForestRegressor()
         model.load_model("pretrained_model.pkl")
 
-        hyperparameters = {'n_estimators': 100, 'random_state': 123}
+        hyperparameters = {"n_estimators": 100, "random_state": 123}
 
         rmse = 44484.30448
         r2 = 0.62176
@@ -115,71 +348,357 @@ async def lifespan(app: FastAPI):
         logging.info("Model uploaded.")
         yield
     finally:
+        training_jobs.shutdown()
         models.clear()
         logging.info("Stop lifespan.")
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+app.add_middleware(CompressionMiddleware)
 
 
-@app.post("/upload_dataframe", response_model=SuccessResponse, responses={400: {"model": ErrorResponse}})
-async def upload_dataframe(request: Annotated[Request, Request]) -> SuccessResponse:
-    global df
+@app.post("/upload_dataframe", response_model=DatasetResponse, responses={400: {"model": ErrorResponse}})
+async def upload_dataframe(
+    request: Annotated[Request, Request],
+    background_tasks: BackgroundTasks,
+    dataset_id: DatasetId = DEFAULT_DATASET,
+) -> DatasetResponse:
     try:
         logger.info("Call to /upload_dataframe")
-        content = await request.body()
-        logger.info(f"Content received with size: {len(content)} bytes")
+        # Arrow IPC stream or Parquet, spooled to disk and decoded record batch by record batch
+        dataframe = await read_dataframe(request)
+        logger.info(f"DataFrame received with shape: {dataframe.shape}")
+        response = await store_dataset(dataset_id, dataframe)
+        background_tasks.add_task(build_profile_task, response["dataset_id"])
 
-        dataframe = pickle.loads(content)
+        logger.info("DataFrame successfully received")
+        return response
 
-        if not isinstance(dataframe, pd.DataFrame):
-            logger.error("Data is not a DataFrame object")
-            raise ValueError("Data is not a DataFrame object")
+    except Exception as e:
+        logger.error(f"Error processing DataFrame: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error processing DataFrame: {str(e)}")
 
-        df = dataframe
 
-        logger.info("DataFrame successfully received")
-        return {"message": "DataFrame successfully received"}
+@app.post("/uploads", response_model=UploadSessionResponse, responses={400: {"model": ErrorResponse}})
+async def open_upload(request: Annotated[OpenUploadRequest, BaseModel]) -> UploadSessionResponse:
+    logger.info(f"Call to /uploads for {request.filename} ({request.format}, {request.total_size} bytes)")
+    try:
+        parse_dataset_id(request.dataset_id)
+        meta = uploads.open(
+            request.filename, request.format, request.total_size, request.chunk_size, dataset_id=request.dataset_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Upload session {meta['session_id']} opened")
+    return uploads.status(meta["session_id"])
+
+
+@app.get("/uploads/{session_id}", response_model=UploadSessionResponse, responses={404: {"model": ErrorResponse}})
+async def get_upload(session_id: Annotated[str, Any]) -> UploadSessionResponse:
+    try:
+        return uploads.status(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload session '{session_id}' not found")
+
+
+@app.put(
+    "/uploads/{session_id}/chunks/{index}",
+    response_model=ChunkResponse,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def put_upload_chunk(
+    session_id: Annotated[str, Any],
+    index: int,
+    request: Annotated[Request, Request],
+    x_content_sha256: Annotated[str, Header()],
+) -> ChunkResponse:
+    if index < 0:
+        raise HTTPException(status_code=400, detail="Chunk index must be non-negative")
+    try:
+        size = await uploads.write_chunk(session_id, index, request, x_content_sha256)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload session '{session_id}' not found")
+    except ValueError as e:
+        logger.error(f"Upload session {session_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Upload session {session_id}: chunk {index} received ({size} bytes)")
+    return {"index": index, "size": size}
+
 
+@app.post(
+    "/uploads/{session_id}/commit",
+    response_model=DatasetResponse,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def commit_upload(
+    session_id: Annotated[str, Any],
+    request: Annotated[CommitUploadRequest, BaseModel],
+    background_tasks: BackgroundTasks,
+) -> DatasetResponse:
+    logger.info(f"Call to /uploads/{session_id}/commit")
+    try:
+        # Chunks are parsed straight from disk as one stream, off the event loop
+        dataframe = await run_in_threadpool(uploads.read_dataframe, session_id, request.total_chunks)
+        response = await store_dataset(uploads.meta(session_id).get("dataset_id", DEFAULT_DATASET), dataframe)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload session '{session_id}' not found")
     except Exception as e:
-        logger.error(f"Error processing DataFrame: {str(e)}")
+        logger.error(f"Error processing upload session {session_id}: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Error processing DataFrame: {str(e)}")
 
+    uploads.remove(session_id)
+    background_tasks.add_task(build_profile_task, response["dataset_id"])
+    logger.info(f"DataFrame {dataframe.shape} received from upload session {session_id}")
+    return response
+
 
-@app.get("/get_dataframe", response_model=DataFrameResponse, responses={400: {"model": ErrorResponse}})
-async def get_dataframe() -> DataFrameResponse:
-    global df
+@app.delete("/uploads/{session_id}", response_model=SuccessResponse, responses={404: {"model": ErrorResponse}})
+async def abort_upload(session_id: Annotated[str, Any]) -> SuccessResponse:
     try:
-        logger.info("Call to /get_dataframe")
+        uploads.remove(session_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Upload session '{session_id}' not found")
+    logger.info(f"Upload session {session_id} aborted")
+    return {"message": f"Upload session '{session_id}' has been deleted."}
 
-        if df is None or df.empty:
-            logger.error("DataFrame is empty or not initialized")
-            raise HTTPException(status_code=400, detail="DataFrame is empty or not initialized")
 
-        df_serialized = pickle.dumps(df)
+@app.get("/datasets", response_model=List[DatasetInfo])
+async def list_datasets() -> List[DatasetInfo]:
+    logger.info("Call to /datasets")
+    return datasets.list()
 
-        logger.info("DataFrame successfully sent")
-        return {"df": df_serialized.hex()}
+
+@app.get("/datasets/{dataset_id}", response_model=DatasetInfo, responses={404: {"model": ErrorResponse}})
+async def get_dataset_info(dataset_id: Annotated[str, Any]) -> DatasetInfo:
+    try:
+        info = datasets.info(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**info, "versions": datasets.versions(info["name"])}
+
+
+@app.post(
+    "/datasets/{dataset_id}/append",
+    response_model=AppendResponse,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def append_dataset_rows(
+    dataset_id: Annotated[str, Any], request: Annotated[Request, Request], background_tasks: BackgroundTasks
+) -> AppendResponse:
+    logger.info(f"Call to /datasets/{dataset_id}/append")
+    try:
+        rows = await read_dataframe(request)
     except Exception as e:
-        logger.error(f"Error getting DataFrame: {str(e)}")
-        raise HTTPException(status_code=400, detail=f"Error getting DataFrame: {str(e)}")
+        logger.error(f"Error processing DataFrame: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Error processing DataFrame: {str(e)}")
+
+    async with append_lock:
+        df, info = await load_dataset(dataset_id)
+        rows, duplicates = new_rows(df, rows)
+        logger.info(f"Appending {len(rows)} rows to dataset {info['dataset_id']}, {duplicates} duplicate ids skipped")
+        if rows.empty:
+            return {
+                "message": "No new rows",
+                "dataset_id": info["dataset_id"],
+                "rows": info["rows"],
+                "memory_before": 0,
+                "memory_after": 0,
+                "dtypes": {},
+                "previous_dataset_id": info["dataset_id"],
+                "appended": 0,
+                "duplicates": duplicates,
+            }
+        try:
+            combined = await run_in_threadpool(append_rows, df, rows)
+            response = await store_dataset(info["name"], combined)
+        except Exception as e:
+            logger.error(f"Error appending rows: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Error appending rows: {str(e)}")
+
+    # Only the new rows are preprocessed when the previous version's result is cached
+    data = preprocessed.get(info["dataset_id"])
+    if data is not None:
+        try:
+            data = await run_in_threadpool(append_preprocessed, data, rows)
+            preprocessed.put(response["dataset_id"], data)
+        except Exception as e:
+            logger.error(f"Incremental preprocessing failed, the next training preprocesses all rows: {str(e)}")
+    # Versions are content hashes, so the new version starts with empty caches; the old one's entries are dropped
+    preprocessed.invalidate(info["dataset_id"])
+    aggregate_cache.invalidate(info["dataset_id"])
+    background_tasks.add_task(build_profile_task, response["dataset_id"])
+
+    return {
+        **response,
+        "message": "Rows successfully appended",
+        "previous_dataset_id": info["dataset_id"],
+        "appended": len(rows),
+        "duplicates": duplicates,
+    }
+
+
+@app.get("/datasets/{dataset_id}/profile", response_model=DatasetProfile, responses={404: {"model": ErrorResponse}})
+async def get_dataset_profile(dataset_id: Annotated[str, Any]) -> DatasetProfile:
+    logger.info("Call to /datasets/profile")
+    try:
+        info = datasets.info(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    profile = datasets.load_profile(info)
+    if profile is None:
+        # Still being computed after the upload, or stored before profiles were introduced
+        logger.info(f"Profile of dataset {info['dataset_id']} not found, computing it")
+        profile = await run_in_threadpool(build_profile, info["dataset_id"])
+    return profile
+
+
+@app.delete("/datasets/{dataset_id}", response_model=SuccessResponse, responses={404: {"model": ErrorResponse}})
+async def delete_dataset(dataset_id: Annotated[str, Any]) -> SuccessResponse:
+    logger.info(f"Deleting dataset {dataset_id}")
+    try:
+        removed = datasets.delete(dataset_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Dataset '{dataset_id}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Cached results of the deleted versions are dropped with them
+    await run_in_threadpool(drop_cached, removed)
+    return {"message": f"Dataset '{dataset_id}' has been deleted."}
+
+
+@app.get(
+    "/get_dataframe",
+    responses={
+        200: {"content": {ARROW_STREAM: {}, PARQUET: {}}},
+        400: {"model": ErrorResponse},
+    },
+)
+async def get_dataframe(
+    columns: Annotated[Optional[List[str]], Query()] = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=0)] = None,
+    format: Annotated[Optional[str], Query(pattern="^(arrow|parquet)$")] = None,
+    accept: Annotated[Optional[str], Header()] = None,
+    accept_encoding: Annotated[Optional[str], Header()] = None,
+    dataset_id: DatasetId = DEFAULT_DATASET,
+) -> StreamingResponse:
+    logger.info("Call to /get_dataframe")
+    df, info = await load_dataset(dataset_id, status_code=400)
+
+    missing = [column for column in columns or [] if column not in df.columns]
+    if missing:
+        logger.error(f"Columns {missing} not found")
+        raise HTTPException(status_code=400, detail=f"Columns {missing} not found")
+
+    result_df = df[columns] if columns else df
+    result_df = result_df.iloc[offset : None if limit is None else offset + limit]
+
+    # Arrow IPC stream by default; Parquet on ?format=parquet or Accept: application/vnd.apache.parquet
+    if format is None:
+        format = "parquet" if accept and PARQUET in accept else "arrow"
+    if format == "parquet":
+        chunks, media_type = iter_parquet(result_df), PARQUET
+    else:
+        chunks, media_type = iter_arrow_stream(result_df), ARROW_STREAM
+
+    encoding = negotiate_encoding(accept_encoding)
+    response_headers = {"Vary": "Accept, Accept-Encoding", "X-Dataset-Id": info["dataset_id"]}
+    if encoding is not None:
+        response_headers["Content-Encoding"] = encoding
+
+    logger.info(f"Streaming DataFrame {result_df.shape} as {format}, encoding: {encoding}")
+    return StreamingResponse(compress_stream(chunks, encoding), media_type=media_type, headers=response_headers)
+
+
+@app.post(
+    "/query",
+    responses={
+        200: {"content": {ARROW_STREAM: {}}},
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+    },
+)
+async def query_dataframe(
+    request: Annotated[QueryRequest, BaseModel],
+    accept_encoding: Annotated[Optional[str], Header()] = None,
+    dataset_id: DatasetId = DEFAULT_DATASET,
+) -> StreamingResponse:
+    logger.info("Call to /query")
+    df, info = await load_dataset(dataset_id)
+
+    try:
+        logger.info(f"Query: {request.model_dump(exclude={'cursor'})}")
+        result_df, total_rows, next_cursor = await run_in_threadpool(run_query, df, request)
+    except KeyError as e:
+        logger.error(f"Query failed: {e.args[0]}")
+        raise HTTPException(status_code=400, detail=e.args[0])
+    except (ValueError, TypeError) as e:
+        logger.error(f"Query failed: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+
+    encoding = negotiate_encoding(accept_encoding)
+    response_headers = {"X-Total-Rows": str(total_rows), "X-Dataset-Id": info["dataset_id"], "Vary": "Accept-Encoding"}
+    if next_cursor is not None:
+        response_headers["X-Next-Cursor"] = next_cursor
+    if encoding is not None:
+        response_headers["Content-Encoding"] = encoding
+
+    logger.info(f"Query matched {total_rows} rows, returning {result_df.shape}")
+    return StreamingResponse(
+        compress_stream(iter_arrow_stream(result_df), encoding), media_type=ARROW_STREAM, headers=response_headers
+    )
+
+
+@app.post(
+    "/aggregate",
+    response_model=AggregateResponse,
+    responses={400: {"model": ErrorResponse}, 404: {"model": ErrorResponse}},
+)
+async def aggregate(
+    request: Annotated[AggregateRequest, BaseModel], dataset_id: DatasetId = DEFAULT_DATASET
+) -> AggregateResponse:
+    logger.info("Call to /aggregate")
+    df, info = await load_dataset(dataset_id)
+
+    # Versions are content hashes, so cached results never need invalidation on upload
+    key = aggregate_cache.key(info["dataset_id"], request)
+    result = aggregate_cache.get(key)
+    cached = result is not None
+    if not cached:
+        try:
+            result = result_to_json(await run_in_threadpool(run_aggregate, df, request))
+        except KeyError as e:
+            logger.error(f"Aggregation failed: {e.args[0]}")
+            raise HTTPException(status_code=400, detail=e.args[0])
+        except (ValueError, TypeError) as e:
+            logger.error(f"Aggregation failed: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Invalid aggregation: {str(e)}")
+        aggregate_cache.put(key, result)
+
+    logger.info(f"Aggregation returned {len(result['data'])} rows (cached: {cached})")
+    return {"dataset_id": info["dataset_id"], "cached": cached, **result}
 
 
 @app.post(
     "/get_columns",
     responses={
-        200: {"content": {"application/octet-stream": {}}},
+        200: {"content": {ARROW_STREAM: {}}},
         400: {"model": ErrorResponse},
         404: {"model": ErrorResponse},
     },
 )
-async def get_columns(request: Annotated[ColumnsRequest, Request]) -> StreamingResponse:
-    global df
+async def get_columns(
+    request: Annotated[ColumnsRequest, Request],
+    accept_encoding: Annotated[Optional[str], Header()] = None,
+    dataset_id: DatasetId = DEFAULT_DATASET,
+) -> StreamingResponse:
     logger.info("Call to /get_columns")
-
-    if df is None or df.empty:
-        logger.error("DataFrame is empty or not initialized")
-        raise HTTPException(status_code=404, detail="DataFrame is empty or not initialized")
+    df, info = await load_dataset(dataset_id)
 
     try:
         logger.info(f"Columns for slicing: {request.columns}")
@@ -188,85 +707,218 @@ async def get_columns(request: Annotated[ColumnsRequest, Request]) -> StreamingR
         logger.error(f"Column {str(e)} not found")
         raise HTTPException(status_code=400, detail=f"Column {str(e)} not found")
 
-    pickle_data = pickle.dumps(result_df)
-    return StreamingResponse(BytesIO(pickle_data), media_type="application/octet-stream")
+    # Same Arrow IPC stream as /get_dataframe
+    encoding = negotiate_encoding(accept_encoding)
+    response_headers = {"Vary": "Accept-Encoding", "X-Dataset-Id": info["dataset_id"]}
+    if encoding is not None:
+        response_headers["Content-Encoding"] = encoding
+    chunks = iter_arrow_stream(result_df)
+    return StreamingResponse(compress_stream(chunks, encoding), media_type=ARROW_STREAM, headers=response_headers)
+
+
+def training_data(dataset_info: dict):
+    # What a training worker gets besides the dataset id: nothing if the split feature matrix of the version
+    # is in feature_cache already, else a cached preprocess_data result, if any. Without one the worker
+    # reads the dataset version from its Arrow file, preprocesses it itself and sends the result back
+    if feature_cache.contains(dataset_info["version"]):
+        return None
+    return preprocessed.get(dataset_info["dataset_id"])
+
+
+def keep_preprocessed(job: dict, result: dict):
+    # The preprocess_data output of a worker goes into PreprocessedCache, so the next jobs and appends
+    # to this version (the only incremental path of /datasets/{dataset_id}/append) start from it
+    data = result.pop("preprocessed", None)
+    if data is None:
+        return
+    try:
+        datasets.info(job["dataset_id"])
+    except KeyError:
+        # Deleted while the job was running
+        return
+    preprocessed.put(job["dataset_id"], data)
+
+
+def register_model(job: dict, result: dict):
+    keep_preprocessed(job, result)
+    models[job["model_id"]] = {
+        "id": job["model_id"],
+        "name": job["model_name"],
+        "model": result["model"],
+        "status": "trained",
+        "dataset_id": job["dataset_id"],
+        "hyperparameters": job["hyperparameters"],
+        "metrics": result["metrics"],
+        "learning_curves": result["learning_curves"],
+    }
+    job["metrics"] = result["metrics"]
+    job["folds"] = result.get("folds")
 
 
 @app.post(
     "/train_model",
-    response_model=ModelResponse,
+    response_model=JobResponse,
     responses={
         400: {"model": ErrorResponse},
         404: {"model": ErrorResponse},
-        500: {"model": ErrorResponse},
     },
 )
-async def train_model(request: Annotated[TrainModelRequest, BaseModel]) -> ModelResponse:
-    global df
-    global models
-
+async def train_model(
+    request: Annotated[TrainModelRequest, BaseModel], dataset_id: DatasetId = DEFAULT_DATASET
+) -> JobResponse:
     logger.info("Call to /train_model")
-    if df is None or df.empty:
-        raise HTTPException(status_code=404, detail="DataFrame is empty or not initialized")
+    _, dataset_info = await load_dataset(dataset_id)
 
     try:
-        data = preprocess_data(df)
-        logger.info("DataFrame preprocessing succeeded")
-    except Exception as e:
-        logger.info("DataFrame preprocessing failed")
-        raise HTTPException(status_code=500, detail=f"Error during preprocessing: {str(e)}")
-
-    try:
-        X_train, X_val, X_test, y_train, y_val, y_test = preprocess_data_for_model(data, is_trained=True)
-        logger.info("Train/val/test split succeeded")
+        CatBoostRegressor(**request.hyperparameters)
     except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid hyperparameters: {str(e)}")
+    early_stopping = early_stopping_params(request.hyperparameters) if request.cv is not None else []
+    if early_stopping:
+        # The held-out fold is the eval set, early stopping on it would leak into the fold metrics
         raise HTTPException(
-            status_code=500,
-            detail=f"Error during preprocessing data for model: {str(e)}",
+            status_code=400,
+            detail=f"Early stopping is not supported in cross-validation: {', '.join(early_stopping)}",
         )
 
-    try:
-        logger.info("Beginning model training")
-        model = CatBoostRegressor(**request.hyperparameters)
+    # Training runs in a worker process
+    if request.cv is None:
+        target = train_job
+        args = (
+            datasets.root,
+            feature_cache,
+            pool_cache,
+            dataset_info["dataset_id"],
+            training_data(dataset_info),
+            request.hyperparameters,
+        )
+    else:
+        # Folds run in parallel within the job; the registered model is fitted on all rows,
+        # its metrics are the fold means and standard deviations
+        target = cross_validate_job
+        args = (
+            datasets.root,
+            feature_cache,
+            dataset_info["dataset_id"],
+            training_data(dataset_info),
+            request.hyperparameters,
+            request.cv.folds,
+            request.cv.repeats,
+            request.cv.seed,
+            request.cv.parallel,
+        )
+    job = training_jobs.submit(
+        target,
+        args,
+        register_model,
+        model_id=request.model_id,
+        model_name=request.model_name,
+        dataset_id=dataset_info["dataset_id"],
+        hyperparameters=request.hyperparameters,
+        metrics=None,
+    )
+    logger.info(f"Training job {job['job_id']} for model {request.model_id} submitted")
+    return job
+
+
+def register_trials(job: dict, result: dict):
+    keep_preprocessed(job, result)
+    for trial in result["trials"]:
+        if trial["trial"] not in result["models"]:
+            continue
+        trial["model_id"] = f"{job['model_id']}-{trial['trial']}"
+        models[trial["model_id"]] = {
+            "id": trial["model_id"],
+            "name": f"{job['model_name']} #{trial['trial']}",
+            "model": result["models"][trial["trial"]]["model"],
+            "status": "trained",
+            "dataset_id": job["dataset_id"],
+            "hyperparameters": {**job["hyperparameters"], **trial["hyperparameters"]},
+            "metrics": trial["metrics"],
+            "learning_curves": result["models"][trial["trial"]]["learning_curves"],
+        }
+    job["trials"] = result["trials"]
+    # Trials are ranked, the first registered one is the best
+    job["best_model_id"] = next((trial["model_id"] for trial in result["trials"] if trial["model_id"]), None)
+    if job["best_model_id"] is not None:
+        job["metrics"] = models[job["best_model_id"]]["metrics"]
 
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid hyperparameters: {str(e)}")
 
-    try:
-        model.fit(X_train, y_train, eval_set=(X_val, y_val), verbose=True, plot=False)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during model training: {str(e)}")
+@app.post(
+    "/search_hyperparameters",
+    response_model=JobResponse,
+    responses={
+        400: {"model": ErrorResponse},
+        404: {"model": ErrorResponse},
+    },
+)
+async def search_hyperparameters(
+    request: Annotated[SearchRequest, BaseModel], dataset_id: DatasetId = DEFAULT_DATASET
+) -> JobResponse:
+    logger.info("Call to /search_hyperparameters")
+    _, dataset_info = await load_dataset(dataset_id)
 
     try:
-        y_pred = model.predict(X_test)
-        rmse = root_mean_squared_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
+        trial_configurations = configurations(request.space, request.strategy, request.n_trials, request.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search space: {str(e)}")
+    try:
+        for configuration in trial_configurations:
+            CatBoostRegressor(**{**request.hyperparameters, **configuration})
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error during model evaluation: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Invalid hyperparameters: {str(e)}")
 
-    model_info = {
-        "id": request.model_id,
-        "name": request.model_name,
-        "model": model,
-        "status": "trained",
-        "hyperparameters": request.hyperparameters,
-        "metrics": {"RMSE": rmse, "R2": r2},
-        "learning_curves": {
-            "iterations": list(range(len(model.evals_result_["validation"]["RMSE"]))),
-            "train_rmse": model.evals_result_["learn"]["RMSE"],
-            "test_rmse": model.evals_result_["validation"]["RMSE"],
-        },
-    }
+    # The whole search is one job: its worker loads or builds the feature matrix once and fits the trials
+    # in parallel on it
+    job = training_jobs.submit(
+        search_job,
+        (
+            datasets.root,
+            feature_cache,
+            pool_cache,
+            dataset_info["dataset_id"],
+            training_data(dataset_info),
+            request.strategy,
+            trial_configurations,
+            request.hyperparameters,
+            request.parallel,
+            request.eta,
+            request.min_iterations,
+        ),
+        register_trials,
+        model_id=request.model_id,
+        model_name=request.model_name,
+        dataset_id=dataset_info["dataset_id"],
+        hyperparameters=request.hyperparameters,
+        metrics=None,
+        trials=None,
+        best_model_id=None,
+    )
+    logger.info(f"Search job {job['job_id']} submitted: {request.strategy}, {len(trial_configurations)} configurations")
+    return job
+
+
+@app.get("/jobs", response_model=List[JobResponse])
+async def list_jobs() -> List[JobResponse]:
+    logger.info("Call to /jobs")
+    return training_jobs.list()
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}})
+async def get_job(job_id: Annotated[str, Any]) -> JobResponse:
+    try:
+        return training_jobs.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
 
-    models[request.model_id] = model_info
 
-    response = {
-        "id": model_info["id"],
-        "name": model_info["name"],
-        "status": model_info["status"],
-        "metrics": model_info["metrics"],
-    }
-    return response
+@app.delete("/jobs/{job_id}", response_model=JobResponse, responses={404: {"model": ErrorResponse}})
+async def cancel_job(job_id: Annotated[str, Any]) -> JobResponse:
+    logger.info(f"Cancelling job {job_id}")
+    try:
+        return training_jobs.cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
 
 
 @app.get("/get_model_info/{model_id}", response_model=ModelInfo, responses={404: {"model": ErrorResponse}})
@@ -299,7 +951,7 @@ async def get_models_info() -> List[ModelInfo]:
                 "metrics": model_info["metrics"],
             }
         )
-    return result
+    return ORJSONResponse(result)
 
 
 @app.get("/get_learning_curves/{model_id}", response_model=LearningCurves, responses={404: {"model": ErrorResponse}})
@@ -351,7 +1003,8 @@ async def predict(model_id: Annotated[str, Any], request: Annotated[Request, Any
         processed_data = preprocess_data(input_data)
         X = preprocess_data_for_model(processed_data, is_trained=False)
         predictions = model.predict(X)
-        return {"predictions": predictions.tolist(), "model_id": model_id}
+        # Returned as a response, so the array is neither converted to a list nor validated by PredictionResponse
+        return ORJSONResponse({"predictions": predictions, "model_id": model_id})
     except Exception as e:
         raise HTTPException(
             status_code=400,
@@ -382,7 +1035,7 @@ async def compare_learning_curves(request: Annotated[Request, Any]) -> LearningC
                 raise HTTPException(status_code=404, detail=f"Model with ID '{model_id}' not found")
             learning_curves[model_id] = models[model_id]["learning_curves"]
 
-        return {"learning_curves_comparison": learning_curves}
+        return ORJSONResponse({"learning_curves_comparison": learning_curves})
 
     except JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON format")
@@ -0,0 +1,85 @@
+# Response time and payload size of /predict-like responses, old path against the new one:
+#   python benchmark_responses.py --rows 100000 --repeat 20
+# "pydantic + tolist" is how /predict responded before: predictions.tolist(), validated by the response model
+# and serialized with the stdlib json module. "orjson" returns ORJSONResponse with the array itself, behind
+# CompressionMiddleware.
+
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from responses import CompressionMiddleware, ORJSONResponse
+
+
+class PredictionResponse(BaseModel):
+    predictions: List[float]
+    model_id: str
+
+
+def build_app(predictions: np.ndarray) -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/tolist", response_model=PredictionResponse)
+    async def tolist() -> PredictionResponse:
+        return {"predictions": predictions.tolist(), "model_id": "benchmark"}
+
+    @app.get("/orjson", response_model=PredictionResponse)
+    async def numpy() -> PredictionResponse:
+        return ORJSONResponse({"predictions": predictions, "model_id": "benchmark"})
+
+    return app
+
+
+def build_baseline_app(predictions: np.ndarray) -> FastAPI:
+    # The API as it was: default JSONResponse, no compression
+    app = FastAPI()
+
+    @app.get("/tolist", response_model=PredictionResponse)
+    async def tolist() -> PredictionResponse:
+        return {"predictions": predictions.tolist(), "model_id": "benchmark"}
+
+    return app
+
+
+def measure(client: TestClient, path: str, encoding: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, headers={"Accept-Encoding": encoding})
+        response.json()
+        timings.append(time.perf_counter() - start)
+    assert response.status_code == 200, response.text
+    return statistics.median(timings), response.num_bytes_downloaded, response.headers.get("content-encoding")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--rows", type=int, default=100_000)
+    arg_parser.add_argument("--repeat", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    # Salary-like predictions
+    predictions = np.random.default_rng(0).lognormal(11, 0.5, args.rows)
+    cases = [("pydantic + tolist, json", build_baseline_app(predictions), "/tolist", "identity")]
+    app = build_app(predictions)
+    for encoding in ["identity", "gzip", "zstd"]:
+        cases.append((f"pydantic + tolist, orjson, {encoding}", app, "/tolist", encoding))
+        cases.append((f"ndarray, orjson, {encoding}", app, "/orjson", encoding))
+
+    print(f"{args.rows} predictions, median of {args.repeat} requests (client decoding included)")
+    print(f"{'response':<40}{'time, ms':>10}{'bytes':>12}")
+    for name, case_app, path, encoding in cases:
+        with TestClient(case_app) as client:
+            seconds, size, content_encoding = measure(client, path, encoding, args.repeat)
+        assert (content_encoding or "identity") == encoding
+        print(f"{name:<40}{seconds * 1000:>10.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# String columns with at most this share of distinct values become categoricals, the rest Arrow-backed strings
+CATEGORY_MAX_RATIO = 0.5
+
+STRING_DTYPE = pd.StringDtype("pyarrow")
+
+
+def memory_usage(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def downcast_float(column: pd.Series) -> pd.Series:
+    values = column.to_numpy()
+    if not np.isnan(values).any() and np.array_equal(values, np.trunc(values)):
+        return pd.to_numeric(values.astype(np.int64), downcast="integer")
+    # float32 only if every value survives the round trip, e.g. salaries and counts, but not coordinates
+    as_float32 = values.astype(np.float32)
+    if np.array_equal(as_float32.astype(values.dtype), values, equal_nan=True):
+        return as_float32
+    return values
+
+
+def compact_column(column: pd.Series) -> pd.Series:
+    dtype = column.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return column
+    if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        return pd.to_numeric(column, downcast="integer")
+    if pd.api.types.is_float_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        return pd.Series(downcast_float(column), index=column.index, name=column.name)
+    if dtype != object and not isinstance(dtype, pd.StringDtype):
+        return column
+
+    non_null = column.dropna()
+    kind = pd.api.types.infer_dtype(non_null, skipna=True)
+    if kind == "boolean":
+        # CSV booleans with gaps are read as object; nullable booleans would break df[mask] indexing
+        return column.astype(bool) if len(non_null) == len(column) else column.astype("category")
+    if kind != "string":
+        # Mixed columns are left to arrow_schema, which sends them as strings
+        return column
+    if non_null.nunique() <= CATEGORY_MAX_RATIO * len(non_null):
+        return column.astype("category")
+    return column.astype(STRING_DTYPE)
+
+
+def compact_dtypes(df: pd.DataFrame):
+    # Returns the compacted frame and a report of memory_usage(deep=True) before / after and changed dtypes
+    memory_before = memory_usage(df)
+    columns = {}
+    changed = {}
+    for name in df.columns:
+        columns[name] = compact_column(df[name])
+        if columns[name].dtype != df[name].dtype:
+            changed[name] = f"{df[name].dtype} -> {columns[name].dtype}"
+    df = pd.DataFrame(columns, index=df.index)
+    report = {"memory_before": memory_before, "memory_after": memory_usage(df), "dtypes": changed}
+    return df, report
+
+
+def restore_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    # Object strings (None for missing, as decoded from Arrow) and float64 again,
+    # for code that fills new values into columns or relies on float64 arithmetic
+    columns = {}
+    for name in df.columns:
+        dtype = df[name].dtype
+        if isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            columns[name] = df[name].astype(object).where(df[name].notna(), None)
+        elif dtype == np.float32:
+            columns[name] = df[name].astype(np.float64)
+    return df.assign(**columns) if columns else df
+
+
+def arrow_types(arrow_type: pa.DataType):
+    # types_mapper for Table.to_pandas: strings stay in Arrow buffers instead of becoming Python objects
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return STRING_DTYPE
+    return None
@@ -0,0 +1,143 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from catboost import CatBoostRegressor
+from search import cpu_count
+from sklearn.model_selection import KFold, RepeatedKFold
+from training import TrainingError, fit_model, load_splits, total_iterations
+
+logger = logging.getLogger(__name__)
+
+MAX_FOLDS = 20
+MAX_REPEATS = 10
+# With the held-out fold as the eval set, early stopping would pick the iterations on the rows the fold
+# metrics are measured on
+EARLY_STOPPING_PARAMS = ["od_type", "od_wait", "od_pval", "early_stopping_rounds"]
+
+
+def early_stopping_params(hyperparameters: dict) -> list:
+    return [name for name in EARLY_STOPPING_PARAMS if hyperparameters.get(name) is not None]
+
+
+def fold_indices(n_rows: int, folds: int, repeats: int = 1, seed: int = 0):
+    # (repeat, fold, train positions, test positions) of k-fold or repeated k-fold
+    if repeats > 1:
+        splitter = RepeatedKFold(n_splits=folds, n_repeats=repeats, random_state=seed)
+    else:
+        splitter = KFold(n_splits=folds, shuffle=True, random_state=seed)
+    for number, (train_index, test_index) in enumerate(splitter.split(np.zeros(n_rows))):
+        yield number // folds, number % folds, train_index, test_index
+
+
+def aggregate_metrics(fold_metrics: list) -> dict:
+    # Mean and standard deviation of every metric over the folds
+    result = {}
+    for name in fold_metrics[0]:
+        values = [metrics[name] for metrics in fold_metrics]
+        result[name] = float(np.mean(values))
+        result[f"{name}_std"] = float(np.std(values, ddof=1)) if len(values) > 1 else 0.0
+    return result
+
+
+def average_curves(curves: list) -> dict:
+    # Learning curves averaged over the folds, up to the shortest one (early stopping may end folds earlier)
+    length = min(len(curve["test_rmse"]) for curve in curves)
+    return {
+        "iterations": list(range(length)),
+        "train_rmse": np.mean([curve["train_rmse"][:length] for curve in curves], axis=0).tolist(),
+        "test_rmse": np.mean([curve["test_rmse"][:length] for curve in curves], axis=0).tolist(),
+    }
+
+
+class CrossValidation:
+    # Folds are fitted in threads of the worker process on the one feature matrix, like search trials, each
+    # pinned to cores // parallel threads. The held-out fold is the eval set for the learning curves only:
+    # use_best_model is off, so the fold metrics are not tuned on the rows they are measured on.
+    # The model that gets registered is fitted on all rows alongside the folds.
+    def __init__(self, report, X: pd.DataFrame, y: pd.Series, hyperparameters: dict, parallel: int = None):
+        self.report = report
+        self.X = X
+        self.y = y
+        self.hyperparameters = {**hyperparameters, "use_best_model": False}
+        self.cores = cpu_count()
+        self.parallel = max(1, parallel or self.cores)
+        self.done = 0
+
+    def fit_fold(self, fold: dict, train_index, test_index, threads: int) -> dict:
+        X_train, y_train = self.X.iloc[train_index], self.y.iloc[train_index]
+        X_test, y_test = self.X.iloc[test_index], self.y.iloc[test_index]
+        hyperparameters = {"thread_count": threads, **self.hyperparameters}
+        _, metrics, learning_curves = fit_model(
+            (X_train, X_test, X_test, y_train, y_test, y_test), hyperparameters, verbose=False
+        )
+        fold.update({"rows": len(test_index), "metrics": metrics, "learning_curves": learning_curves})
+        return fold
+
+    def fit_final(self, threads: int):
+        hyperparameters = {"thread_count": threads, **self.hyperparameters}
+        hyperparameters.pop("use_best_model")
+        try:
+            model = CatBoostRegressor(**hyperparameters)
+            model.fit(self.X, self.y, verbose=False, plot=False)
+        except Exception as e:
+            raise TrainingError(f"Error during model training: {str(e)}")
+        return model
+
+    def run(self, folds: int, repeats: int = 1, seed: int = 0) -> dict:
+        splits = list(fold_indices(len(self.X), folds, repeats, seed))
+        total = len(splits) + 1
+        threads = max(1, self.cores // min(self.parallel, total))
+        self.report({"stage": "cross-validation", "iteration": 0, "iterations": total})
+        results = []
+        # Not a with block: its exit would wait for the running folds after a failure
+        executor = ThreadPoolExecutor(max_workers=min(self.parallel, total))
+        final = executor.submit(self.fit_final, threads)
+        futures = [
+            executor.submit(self.fit_fold, {"repeat": repeat, "fold": fold}, train_index, test_index, threads)
+            for repeat, fold, train_index, test_index in splits
+        ]
+        for future in as_completed(futures + [final]):
+            # The first failed fold fails the job: queued folds are cancelled, running ones are not waited for
+            if future.exception() is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise future.exception()
+            if future is not final:
+                results.append(future.result())
+            self.done += 1
+            self.report({"iteration": self.done, "iterations": total})
+        executor.shutdown()
+
+        results.sort(key=lambda fold: (fold["repeat"], fold["fold"]))
+        learning_curves = average_curves([fold.pop("learning_curves") for fold in results])
+        metrics = aggregate_metrics([fold["metrics"] for fold in results])
+        logger.info(f"Cross-validation over {len(results)} folds: {metrics}")
+        return {"model": final.result(), "metrics": metrics, "learning_curves": learning_curves, "folds": results}
+
+
+def cross_validate_job(
+    report,
+    dataset_root: str,
+    feature_cache,
+    dataset_id: str,
+    data,
+    hyperparameters: dict,
+    folds: int,
+    repeats: int = 1,
+    seed: int = 0,
+    parallel: int = None,
+) -> dict:
+    # Runs in a worker process. The folds cover all rows of the feature matrix: the train, validation
+    # and test parts of the cached split are put back together
+    splits, preprocessed = load_splits(report, dataset_root, feature_cache, dataset_id, data)
+    X_train, X_val, X_test, y_train, y_val, y_test = splits
+    X = pd.concat([X_train, X_val, X_test], ignore_index=True)
+    y = pd.concat([y_train, y_val, y_test], ignore_index=True)
+    if len(X) < folds:
+        raise TrainingError(f"{len(X)} rows can not be split into {folds} folds")
+    logger.info(f"Cross-validating {folds} folds x {repeats} repeats, {total_iterations(hyperparameters)} iterations")
+    return {
+        **CrossValidation(report, X, y, hyperparameters, parallel).run(folds, repeats, seed),
+        "preprocessed": preprocessed,
+    }
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+from compact import arrow_types
+from serialization import arrow_schema, table_to_dataframe
+
+DATASET_DIR = os.getenv("DATASET_DIR", "datasets")
+# RAM allowed for loaded datasets; least recently used ones are dropped from memory (they stay on disk)
+MEMORY_BUDGET = int(os.getenv("DATASET_MEMORY_BUDGET", 4 * 2**30))
+# Older versions kept on disk per dataset name, so models can be traced back to the data they were trained on
+KEEP_VERSIONS = int(os.getenv("DATASET_KEEP_VERSIONS", 3))
+
+DEFAULT_DATASET = "default"
+DATASET_NAME = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+def parse_dataset_id(dataset_id: str):
+    # "name" refers to the latest version, "name@version" to a specific one
+    name, _, version = dataset_id.partition("@")
+    if not DATASET_NAME.fullmatch(name):
+        raise ValueError(f"Invalid dataset name '{name}', allowed: letters, digits, '_', '.', '-'")
+    return name, version or None
+
+
+class DatasetRegistry:
+    # Named, versioned datasets stored as Arrow IPC files; a version is the content hash of the file.
+    # Files are read through a memory map on first use and converted to pandas, which copies the data into
+    # pandas-owned memory; converted frames are kept in an LRU bounded by memory_budget bytes.
+
+    def __init__(self, root: str = DATASET_DIR, memory_budget: int = MEMORY_BUDGET, keep_versions: int = KEEP_VERSIONS):
+        self.root = root
+        self.memory_budget = memory_budget
+        self.keep_versions = keep_versions
+        self.index_path = os.path.join(root, "index.json")
+        self.loaded = OrderedDict()  # (name, version) -> (DataFrame, size in bytes)
+        self.memory_used = 0
+        self.lock = threading.RLock()
+        os.makedirs(root, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def save_index(self):
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, f"{version}.arrow")
+
+    def profile_path(self, name: str, version: str) -> str:
+        return os.path.join(self.root, name, f"{version}.profile.json")
+
+    def info(self, dataset_id: str) -> dict:
+        name, version = parse_dataset_id(dataset_id)
+        with self.lock:
+            if name not in self.index:
+                raise KeyError(dataset_id)
+            versions = self.index[name]["versions"]
+            if version is None:
+                return versions[-1]
+            for info in versions:
+                if info["version"].startswith(version):
+                    return info
+        raise KeyError(dataset_id)
+
+    def versions(self, name: str):
+        with self.lock:
+            return [info["version"] for info in self.index.get(name, {"versions": []})["versions"]]
+
+    def list(self):
+        with self.lock:
+            return [{**entry["versions"][-1], "versions": self.versions(name)} for name, entry in self.index.items()]
+
+    def put(self, dataset_id: str, df: pd.DataFrame):
+        # Returns (info, infos of the versions dropped beyond keep_versions), like delete() the latter are
+        # returned so that caches keyed by their dataset ids can be dropped
+        name, version = parse_dataset_id(dataset_id)
+        if version is not None:
+            raise ValueError("A version can not be given on upload, it is derived from the content")
+
+        # Uncompressed Arrow IPC file: reading it back needs no decompression, only the conversion to pandas
+        df, schema = arrow_schema(df)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        os.makedirs(os.path.join(self.root, name), exist_ok=True)
+        tmp_path = os.path.join(self.root, name, f".{uuid.uuid4().hex}.tmp")
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=64 * 1024)
+
+        digest = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                digest.update(block)
+        version = digest.hexdigest()[:16]
+
+        with self.lock:
+            entry = self.index.setdefault(name, {"versions": []})
+            if entry["versions"] and entry["versions"][-1]["version"] == version:
+                os.remove(tmp_path)
+                return entry["versions"][-1], []
+            os.replace(tmp_path, self.path(name, version))
+            info = {
+                "dataset_id": f"{name}@{version}",
+                "name": name,
+                "version": version,
+                "rows": len(df),
+                "columns": list(df.columns),
+                "size_bytes": os.path.getsize(self.path(name, version)),
+                "created_at": time.time(),
+            }
+            entry["versions"] = [old for old in entry["versions"] if old["version"] != version] + [info]
+            removed = entry["versions"][: -self.keep_versions]
+            for old in removed:
+                self.remove_version(name, old["version"])
+            entry["versions"] = entry["versions"][-self.keep_versions :]
+            self.save_index()
+            self.cache(name, version, df)
+        return info, removed
+
+    def get(self, dataset_id: str):
+        # Returns (DataFrame, info); raises KeyError for unknown datasets
+        info = self.info(dataset_id)
+        key = (info["name"], info["version"])
+        with self.lock:
+            if key in self.loaded:
+                self.loaded.move_to_end(key)
+                return self.loaded[key][0], info
+
+        with pa.memory_map(self.path(*key)) as source:
+            df = table_to_dataframe(pa.ipc.open_file(source).read_all(), types_mapper=arrow_types)
+        with self.lock:
+            self.cache(*key, df)
+        return df, info
+
+    def cache(self, name: str, version: str, df: pd.DataFrame):
+        key = (name, version)
+        if key in self.loaded:
+            self.loaded.move_to_end(key)
+            return
+        size = int(df.memory_usage(deep=True).sum())
+        self.loaded[key] = (df, size)
+        self.memory_used += size
+        # The most recently used dataset always stays loaded, even if it alone exceeds the budget
+        while self.memory_used > self.memory_budget and len(self.loaded) > 1:
+            _, (_, evicted_size) = self.loaded.popitem(last=False)
+            self.memory_used -= evicted_size
+
+    def unload(self, name: str, version: str):
+        loaded = self.loaded.pop((name, version), None)
+        if loaded is not None:
+            self.memory_used -= loaded[1]
+
+    def remove_version(self, name: str, version: str):
+        self.unload(name, version)
+        for path in (self.path(name, version), self.profile_path(name, version)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save_profile(self, info: dict, profile: dict):
+        # Stored next to the data file of the same version, so it is dropped together with it
+        path = self.profile_path(info["name"], info["version"])
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+
+    def load_profile(self, info: dict):
+        try:
+            with open(self.profile_path(info["name"], info["version"])) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def delete(self, dataset_id: str):
+        # Returns the infos of the removed versions, so that caches keyed by their dataset ids can be dropped
+        name, version = parse_dataset_id(dataset_id)
+        with self.lock:
+            if name not in self.index:
+                raise KeyError(dataset_id)
+            versions = self.index[name]["versions"]
+            removed = [info for info in versions if version is None or info["version"].startswith(version)]
+            if not removed:
+                raise KeyError(dataset_id)
+            for info in removed:
+                self.remove_version(name, info["version"])
+            self.index[name]["versions"] = [info for info in versions if info not in removed]
+            if not self.index[name]["versions"]:
+                del self.index[name]
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+            self.save_index()
+        return removed
+
+    def stats(self):
+        with self.lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "memory_used": self.memory_used,
+                "loaded": [f"{name}@{version}" for name, version in self.loaded],
+            }
@@ -0,0 +1,181 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from preprocess import PREPROCESSING_VERSION, preprocess_data
+
+# Vacancy id; appended rows with an id already in the dataset are skipped
+ID_COLUMN = "id"
+
+FEATURE_DIR = os.getenv("FEATURE_DIR", "features")
+# Disk space for cached feature matrices; least recently used ones are deleted beyond it
+FEATURE_CACHE_BUDGET = int(os.getenv("FEATURE_CACHE_BUDGET", 2 * 2**30))
+# Order of the preprocess_data_for_model(is_trained=True) output
+SPLITS = ["X_train", "X_val", "X_test", "y_train", "y_val", "y_test"]
+TARGET = "salary"
+
+
+class PreprocessedCache:
+    # preprocess_data output per dataset version, so train_model does not re-run it over every row.
+    # Entries come from training workers that preprocessed a version and from appends to a cached version.
+    # Versions are content hashes and never change, entries only go stale when nothing refers to them anymore.
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, dataset_id: str):
+        with self.lock:
+            if dataset_id not in self.entries:
+                return None
+            self.entries.move_to_end(dataset_id)
+            return self.entries[dataset_id]
+
+    def put(self, dataset_id: str, data: pd.DataFrame):
+        with self.lock:
+            self.entries[dataset_id] = data
+            self.entries.move_to_end(dataset_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, dataset_id: str):
+        with self.lock:
+            self.entries.pop(dataset_id, None)
+
+
+def new_rows(df: pd.DataFrame, rows: pd.DataFrame):
+    # Returns the rows whose id is neither in df nor repeated earlier in rows, and the number of skipped ones
+    if ID_COLUMN not in rows.columns or ID_COLUMN not in df.columns:
+        return rows, 0
+    keep = ~rows[ID_COLUMN].isin(df[ID_COLUMN]) & ~rows[ID_COLUMN].duplicated()
+    return rows[keep.to_numpy()], int((~keep).sum())
+
+
+def append_rows(df: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    # Categoricals with different categories are concatenated as object, compact_dtypes turns them back
+    return pd.concat([df, rows], ignore_index=True)
+
+
+def append_preprocessed(data: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    # preprocess_data works row by row apart from dropping all-empty columns, which a small batch
+    # would do for columns that are only empty in it
+    return pd.concat([data, preprocess_data(rows, drop_empty_columns=False)], ignore_index=True)
+
+
+class DirectoryCache:
+    # Entries are directories under root, written by any of the worker processes and shared between them.
+    # An entry is written to a temporary directory and renamed into place; the directory mtime marks its
+    # last use, least recently used entries are deleted when they take more than budget bytes.
+    def __init__(self, root: str, budget: int):
+        self.root = root
+        self.budget = budget
+        os.makedirs(root, exist_ok=True)
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def touch(self, key: str):
+        os.utime(self.entry_path(key))
+
+    def store(self, key: str, write) -> int:
+        # write(directory) writes the files of the entry; returns the size of the entry in bytes
+        path = self.entry_path(key)
+        tmp_path = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        os.makedirs(tmp_path)
+        try:
+            write(tmp_path)
+            size = directory_size(tmp_path)
+            os.rename(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not os.path.isdir(path):
+                raise
+            # Another process stored the same entry first
+            return directory_size(path)
+        self.evict(keep=key)
+        return size
+
+    def entries(self):
+        # (last use, size, key) of the stored entries, least recently used first
+        entries = []
+        for key in os.listdir(self.root):
+            path = self.entry_path(key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            try:
+                entries.append((os.path.getmtime(path), directory_size(path), key))
+            except FileNotFoundError:
+                continue
+        return sorted(entries)
+
+    def evict(self, keep: str = None):
+        entries = self.entries()
+        used = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if used <= self.budget:
+                break
+            if key == keep:
+                continue
+            # Open memory maps and loaded entries of a running job stay valid after the files are unlinked
+            shutil.rmtree(self.entry_path(key), ignore_errors=True)
+            used -= size
+
+    def invalidate(self, version: str):
+        # Deletes the entries of a dataset version, whatever the preprocessing or quantization they were made with
+        for _, _, key in self.entries():
+            if key.startswith(f"{version}-"):
+                shutil.rmtree(self.entry_path(key), ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        return {"entries": len(entries), "bytes": sum(size for _, size, _ in entries), "budget": self.budget}
+
+
+class FeatureCache(DirectoryCache):
+    # Train / validation / test splits of the feature matrix, stored as .npy files per dataset version and
+    # PREPROCESSING_VERSION. Versions are content hashes, so an entry never goes stale and identical data
+    # uploaded under another name reuses it. Entries are opened memory-mapped, several training processes
+    # share one copy in the page cache.
+    def __init__(self, root: str = FEATURE_DIR, budget: int = FEATURE_CACHE_BUDGET):
+        super().__init__(root, budget)
+
+    def key(self, version: str) -> str:
+        return f"{version}-p{PREPROCESSING_VERSION}"
+
+    def contains(self, version: str) -> bool:
+        return os.path.isdir(self.entry_path(self.key(version)))
+
+    def get(self, version: str):
+        # Returns the splits as in preprocess_data_for_model or None. Arrays are copy-on-write memory maps:
+        # pages are shared until something writes to them, and consumers that reject read-only buffers work
+        path = self.entry_path(self.key(version))
+        try:
+            with open(os.path.join(path, "columns.json")) as f:
+                columns = json.load(f)
+            arrays = {split: np.load(os.path.join(path, f"{split}.npy"), mmap_mode="c") for split in SPLITS}
+            self.touch(self.key(version))
+        except FileNotFoundError:
+            # Not cached, or evicted by another process meanwhile
+            return None
+        return (
+            *(pd.DataFrame(arrays[split], columns=columns, copy=False) for split in SPLITS[:3]),
+            *(pd.Series(arrays[split], name=TARGET, copy=False) for split in SPLITS[3:]),
+        )
+
+    def put(self, version: str, splits) -> int:
+        def write(path):
+            with open(os.path.join(path, "columns.json"), "w") as f:
+                json.dump(list(splits[0].columns), f)
+            for split, values in zip(SPLITS, splits):
+                np.save(os.path.join(path, f"{split}.npy"), np.ascontiguousarray(values, dtype=np.float64))
+
+        return self.store(self.key(version), write)
+
+
+def directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
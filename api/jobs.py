@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+# Jobs running at the same time; each one is a separate process, the rest wait in the queue
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", 2))
+# How often the event loop checks running jobs for progress messages
+POLL_INTERVAL = 0.2
+# Finished jobs kept for GET /jobs; the ones that finished first are dropped beyond it
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", 100))
+
+STATUSES = ["queued", "running", "completed", "failed", "cancelled"]
+
+
+def run_in_process(connection, target, args):
+    # Entry point of a worker process. target(report, *args) sends ("progress", dict) messages through
+    # report; its return value is sent as ("result", value), an exception as ("error", message)
+    try:
+        result = target(lambda progress: connection.send(("progress", progress)), *args)
+        connection.send(("result", result))
+    except Exception as e:
+        connection.send(("error", str(e)))
+    finally:
+        connection.close()
+
+
+class JobQueue:
+    # Every job gets its own process, so cancelling a running job terminates it and frees its slot at once,
+    # which a ProcessPoolExecutor can not do. "spawn" because the API process has threads (threadpool, locks).
+    def __init__(self, workers: int = TRAINING_WORKERS, start_method: str = "spawn", history: int = JOB_HISTORY):
+        self.context = multiprocessing.get_context(start_method)
+        self.workers = workers
+        self.history = history
+        self.slots = None
+        self.jobs = {}
+        self.processes = {}
+        self.tasks = {}
+
+    def submit(self, target, args, on_result, **fields) -> dict:
+        # on_result(job, result) is called in the event loop when the job completes
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "stage": None,
+            "progress": 0.0,
+            "iteration": None,
+            "iterations": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "warning": None,
+            **fields,
+        }
+        self.tasks[job_id] = asyncio.create_task(self.run(job_id, target, args, on_result))
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> dict:
+        job = self.jobs[job_id]
+        elapsed = None
+        if job["started_at"] is not None:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        return {**job, "elapsed": elapsed}
+
+    def list(self):
+        return [self.status(job_id) for job_id in self.jobs]
+
+    def finish(self, job: dict, status: str, error: str = None):
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = time.time()
+        # The job finished just now stays, so its caller can still read its status
+        finished = [other for other in self.jobs.values() if other["finished_at"] is not None and other is not job]
+        finished.sort(key=lambda other: other["finished_at"])
+        for other in finished[: max(len(finished) + 1 - self.history, 0)]:
+            del self.jobs[other["job_id"]]
+
+    async def run(self, job_id: str, target, args, on_result):
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.workers)
+        job = self.jobs[job_id]
+        async with self.slots:
+            if job["status"] == "cancelled":
+                return
+            receiver, sender = self.context.Pipe(duplex=False)
+            process = self.context.Process(target=run_in_process, args=(sender, target, args), daemon=True)
+            process.start()
+            sender.close()
+            self.processes[job_id] = process
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            logger.info(f"Job {job_id} started in process {process.pid}")
+            try:
+                await self.watch(job, process, receiver, on_result)
+            finally:
+                receiver.close()
+                if job["status"] == "failed" and process.is_alive():
+                    # Threads of a failed job, e.g. the remaining folds of a cross-validation, are not waited for
+                    process.terminate()
+                process.join(timeout=5)
+                self.processes.pop(job_id, None)
+                self.tasks.pop(job_id, None)
+        logger.info(f"Job {job_id} {job['status']}")
+
+    async def watch(self, job: dict, process, receiver, on_result):
+        while job["status"] == "running":
+            # poll() instead of a blocking recv(), the event loop keeps serving requests meanwhile
+            if receiver.poll():
+                try:
+                    # A result (the fitted model) can be large, it is read off the event loop
+                    kind, value = await run_in_threadpool(receiver.recv)
+                except EOFError:
+                    kind, value = "error", f"Worker process exited with code {process.exitcode}"
+                if job["status"] != "running":
+                    return
+                if kind == "progress":
+                    job.update(
+                        {key: value[key] for key in ("stage", "iteration", "iterations", "warning") if key in value}
+                    )
+                    if job["iteration"] is not None and job["iterations"]:
+                        job["progress"] = min(job["iteration"] / job["iterations"], 1.0)
+                elif kind == "result":
+                    try:
+                        on_result(job, value)
+                    except Exception as e:
+                        self.finish(job, "failed", f"Error registering the result: {str(e)}")
+                        return
+                    job["progress"] = 1.0
+                    self.finish(job, "completed")
+                else:
+                    self.finish(job, "failed", value)
+            elif not process.is_alive():
+                self.finish(job, "failed", f"Worker process exited with code {process.exitcode}")
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def cancel(self, job_id: str) -> dict:
+        # Raises KeyError for unknown jobs; finished jobs are left as they are
+        job = self.jobs[job_id]
+        if job["status"] in ("queued", "running"):
+            self.finish(job, "cancelled")
+            process = self.processes.get(job_id)
+            if process is not None and process.is_alive():
+                process.terminate()
+                logger.info(f"Job {job_id}: process {process.pid} terminated")
+        return self.status(job_id)
+
+    def shutdown(self):
+        for job_id in [job_id for job_id, job in self.jobs.items() if job["finished_at"] is None]:
+            self.cancel(job_id)
@@ -0,0 +1,43 @@
+# Raw columns of the flattened HH vacancies that preprocessing reads. The parser extracts exactly these
+# columns (parser/flatten.py: MODEL_COLUMNS), so both sides take them from here
+
+raw_cat_columns = [
+    "premium",
+    "has_test",
+    "response_letter_required",
+    "area_name",
+    "salary_currency",
+    "salary_gross",
+    "type_name",
+    "address_city",
+    "address_metro_station_name",
+    "address_metro_line_name",
+    "address_metro_stations_0_line_name",
+    "archived",
+    "employer_name",
+    "employer_accredited_it_employer",
+    "employer_trusted",
+    "schedule_name",
+    "accept_temporary",
+    "professional_roles_0_name",
+    "accept_incomplete_resumes",
+    "experience_name",
+    "employment_name",
+    "address_metro_stations_3_station_name",
+    "address_metro_stations_3_line_name",
+    "working_time_intervals_0_name",
+    "working_time_modes_0_name",
+    "working_days_0_name",
+    "branding_type",
+    "branding_tariff",
+    "department_name",
+    "insider_interview_id",
+    "brand_snippet_logo",
+    "brand_snippet_picture",
+    "brand_snippet_background_color",
+    "brand_snippet_background_gradient_angle",
+    "brand_snippet_background_gradient_color_list_0_position",
+    "brand_snippet_background_gradient_color_list_1_position",
+]
+text_columns = ["name", "snippet_requirement", "snippet_responsibility"]
+salary_columns = ["salary_from", "salary_to"]
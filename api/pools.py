@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+
+from catboost import CatBoostError, Pool
+from features import DirectoryCache
+from preprocess import PREPROCESSING_VERSION
+
+POOL_DIR = os.getenv("POOL_DIR", "pools")
+# Disk space for quantized pools; least recently used ones are deleted beyond it
+POOL_CACHE_BUDGET = int(os.getenv("POOL_CACHE_BUDGET", 2 * 2**30))
+
+# Hyperparameters that decide how float features are quantized, with the CatBoost CPU defaults.
+# They are applied when a pool is built, a model trained on a quantized pool does not get them again.
+QUANTIZATION_DEFAULTS = {"border_count": 254, "feature_border_type": "GreedyLogSum", "nan_mode": "Min"}
+QUANTIZATION_PARAMS = list(QUANTIZATION_DEFAULTS) + ["max_bin", "per_float_feature_quantization"]
+
+
+def quantization_params(hyperparameters: dict) -> dict:
+    # Effective quantization parameters: defaults filled in and aliases resolved, so that equal settings
+    # written differently share a pool
+    params = dict(QUANTIZATION_DEFAULTS)
+    for name in QUANTIZATION_PARAMS:
+        if hyperparameters.get(name) is not None:
+            params["border_count" if name == "max_bin" else name] = hyperparameters[name]
+    return params
+
+
+def training_params(hyperparameters: dict) -> dict:
+    return {name: value for name, value in hyperparameters.items() if name not in QUANTIZATION_PARAMS}
+
+
+class PoolCache(DirectoryCache):
+    # Quantized train and validation Pools per dataset version, PREPROCESSING_VERSION and quantization
+    # parameters, saved with Pool.save and loaded back with "quantized://". The validation pool is quantized
+    # with the borders of the train pool, as CatBoost does for an eval_set. Pools loaded by a process are kept,
+    # so the trials of a search share them.
+    def __init__(self, root: str = POOL_DIR, budget: int = POOL_CACHE_BUDGET):
+        super().__init__(root, budget)
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to worker processes without the pools loaded here
+        return {"root": self.root, "budget": self.budget}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def key(self, version: str, params: dict) -> str:
+        params_hash = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+        return f"{version}-p{PREPROCESSING_VERSION}-q{params_hash}"
+
+    def pools(self, version: str, hyperparameters: dict, splits):
+        # (train pool, validation pool) for the quantization parameters of hyperparameters,
+        # built from the split_data splits on the first use
+        params = quantization_params(hyperparameters)
+        key = self.key(version, params)
+        with self.lock:
+            if key not in self.loaded:
+                self.loaded[key] = self.load(key)
+                if self.loaded[key] is None:
+                    self.loaded[key] = self.build(key, params, splits)
+            return self.loaded[key]
+
+    def load(self, key: str):
+        path = self.entry_path(key)
+        if not os.path.isdir(path):
+            return None
+        try:
+            pools = tuple(Pool(f"quantized://{os.path.join(path, name)}") for name in ("train.bin", "val.bin"))
+            self.touch(key)
+        except (OSError, CatBoostError):
+            # Evicted by another process meanwhile
+            return None
+        return pools
+
+    def build(self, key: str, params: dict, splits):
+        X_train, X_val, _, y_train, y_val, _ = splits
+        train_pool = Pool(X_train, y_train)
+        val_pool = Pool(X_val, y_val)
+
+        def write(path):
+            borders = os.path.join(path, "borders.tsv")
+            train_pool.quantize(**params)
+            train_pool.save_quantization_borders(borders)
+            val_pool.quantize(input_borders=borders)
+            train_pool.save(os.path.join(path, "train.bin"))
+            val_pool.save(os.path.join(path, "val.bin"))
+            with open(os.path.join(path, "params.json"), "w") as f:
+                json.dump(params, f)
+
+        self.store(key, write)
+        return train_pool, val_pool
+
+    def invalidate(self, version: str):
+        super().invalidate(version)
+        with self.lock:
+            for key in [key for key in self.loaded if key.startswith(f"{version}-")]:
+                del self.loaded[key]
@@ -2,6 +2,8 @@ import warnings
 
 import numpy as np
 import pandas as pd
+from compact import restore_dtypes
+from model_columns import raw_cat_columns
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, OneHotEncoder, StandardScaler
 from tqdm import tqdm
@@ -12,47 +14,12 @@ tqdm.pandas()
 
 pd.set_option("display.max_columns", None)
 
+# Part of the key of cached feature matrices (features.FeatureCache): bump it whenever preprocess_data or
+# preprocess_data_for_model start producing different features, so matrices of the old code are not reused
+PREPROCESSING_VERSION = 1
 
-cat_columns = [
-    "premium",
-    "has_test",
-    "response_letter_required",
-    "area_name",
-    "salary_currency",
-    "salary_gross",
-    "type_name",
-    "address_city",
-    "address_metro_station_name",
-    "address_metro_line_name",
-    "address_metro_stations_0_line_name",
-    "archived",
-    "employer_name",
-    "employer_accredited_it_employer",
-    "employer_trusted",
-    "schedule_name",
-    "accept_temporary",
-    "professional_roles_0_name",
-    "accept_incomplete_resumes",
-    "experience_name",
-    "employment_name",
-    "address_metro_stations_3_station_name",
-    "address_metro_stations_3_line_name",
-    "working_time_intervals_0_name",
-    "working_time_modes_0_name",
-    "working_days_0_name",
-    "branding_type",
-    "branding_tariff",
-    "department_name",
-    "insider_interview_id",
-    "brand_snippet_logo",
-    "brand_snippet_picture",
-    "brand_snippet_background_color",
-    "brand_snippet_background_gradient_angle",
-    "brand_snippet_background_gradient_color_list_0_position",
-    "brand_snippet_background_gradient_color_list_1_position",
-    "category",
-]
-text_columns = ["name", "snippet_requirement", "snippet_responsibility"]
+# "category" is derived from the vacancy name in preprocess_data
+cat_columns = raw_cat_columns + ["category"]
 num_columns = ["name_length", "length"]
 
 salary_currency_dict_to_RUR = {
@@ -132,8 +99,12 @@ def categorize(name, categories):
     return "Прочее"
 
 
-def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.dropna(axis=1, how="all")
+def preprocess_data(df: pd.DataFrame, drop_empty_columns: bool = True) -> pd.DataFrame:
+    df = restore_dtypes(df)
+    if drop_empty_columns:
+        df = df.dropna(axis=1, how="all")
+    else:
+        df = df.copy()
     df.drop_duplicates(inplace=True)
 
     try:
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from aggregate import result_to_json
+
+TOP_K = 10
+HISTOGRAM_BINS = 30
+# Salary columns as uploaded (salary_from / salary_to) and after preprocessing (salary)
+HISTOGRAM_COLUMNS = ["salary", "salary_from", "salary_to"]
+
+
+def json_value(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def histogram(values: np.ndarray, bins: int = HISTOGRAM_BINS) -> dict:
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+
+def salary_histograms(column: pd.Series, bins: int = HISTOGRAM_BINS) -> dict:
+    values = column.dropna().to_numpy(dtype=np.float64)
+    if len(values) == 0:
+        return {}
+    # The full range is dominated by a few outliers, so the IQR-clipped range used on the EDA page is added
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    iqr = q3 - q1
+    clipped = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {column.name: histogram(values, bins), f"{column.name}_iqr": histogram(clipped, bins)}
+
+
+def top_values(column: pd.Series, top_k: int = TOP_K):
+    counts = column.value_counts(dropna=True, sort=True).head(top_k)
+    return [[json_value(value), int(count)] for value, count in counts.items() if count > 0]
+
+
+def compute_profile(df: pd.DataFrame, top_k: int = TOP_K, bins: int = HISTOGRAM_BINS) -> dict:
+    nulls = df.isna().sum()
+    columns = [
+        {
+            "name": str(name),
+            "dtype": str(df[name].dtype),
+            "nulls": int(nulls[name]),
+            "nunique": int(df[name].nunique(dropna=True)),
+        }
+        for name in df.columns
+    ]
+
+    numeric = df.select_dtypes(include="number")
+    describe = {"columns": [], "data": []}
+    if not numeric.empty:
+        # float64, so compacted float32 columns give the same statistics as before compaction
+        describe = result_to_json(numeric.astype(np.float64).describe().T.reset_index(names="column"))
+
+    categorical = [name for name in df.columns if isinstance(df[name].dtype, pd.CategoricalDtype)]
+    categorical += list(df.select_dtypes(include="bool").columns)
+
+    histograms = {}
+    for name in HISTOGRAM_COLUMNS:
+        if name in numeric.columns:
+            histograms.update(salary_histograms(df[name], bins))
+
+    return {
+        "rows": len(df),
+        "memory_bytes": int(df.memory_usage(deep=True, index=False).sum()),
+        "columns": columns,
+        "describe": describe,
+        "top_values": {str(name): top_values(df[name], top_k) for name in categorical},
+        "histograms": histograms,
+    }
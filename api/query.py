@@ -0,0 +1,134 @@
+import base64
+import hashlib
+import json
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+
+COMPARISONS = {
+    "==": lambda column, value: column == value,
+    "!=": lambda column, value: column != value,
+    "<": lambda column, value: column < value,
+    "<=": lambda column, value: column <= value,
+    ">": lambda column, value: column > value,
+    ">=": lambda column, value: column >= value,
+}
+OPERATORS = list(COMPARISONS) + ["between", "in", "not_in", "is_null", "not_null"]
+
+MAX_LIMIT = 100_000
+
+
+# Request models of /query, also used by /aggregate
+class Predicate(BaseModel):
+    column: str
+    op: str
+    value: Any = None
+
+
+class SortKey(BaseModel):
+    column: str
+    descending: bool = False
+
+
+class QueryRequest(BaseModel):
+    columns: Optional[List[str]] = None
+    filters: List[Predicate] = []
+    sort: List[SortKey] = []
+    offset: int = Field(0, ge=0)
+    limit: int = Field(1000, ge=0, le=MAX_LIMIT)
+    cursor: Optional[str] = None
+
+
+def check_columns(df: pd.DataFrame, columns):
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise KeyError(f"Columns {missing} not found")
+
+
+def predicate_mask(column: pd.Series, op: str, value) -> np.ndarray:
+    if isinstance(column.dtype, pd.CategoricalDtype) and op in ("<", "<=", ">", ">=", "between"):
+        # Unordered categoricals only support equality, range predicates compare the values themselves
+        column = column.astype(column.cat.categories.dtype)
+    if op in COMPARISONS:
+        mask = COMPARISONS[op](column, value)
+    elif op == "between":
+        low, high = value
+        mask = column.between(low, high)
+    elif op == "in":
+        mask = column.isin(value)
+    elif op == "not_in":
+        mask = ~column.isin(value)
+    elif op == "is_null":
+        mask = column.isna()
+    elif op == "not_null":
+        mask = column.notna()
+    else:
+        raise ValueError(f"Unsupported operator '{op}', expected one of {OPERATORS}")
+    # Comparisons with NaN are False and nullable dtypes give NA, so nulls never match a range or equality predicate
+    return pd.Series(mask).to_numpy(dtype=bool, na_value=False)
+
+
+def filter_positions(df: pd.DataFrame, filters) -> np.ndarray:
+    # Predicates are evaluated only on the columns they reference; no filtered copy of the frame is built
+    mask = np.ones(len(df), dtype=bool)
+    for predicate in filters:
+        mask &= predicate_mask(df[predicate.column], predicate.op, predicate.value)
+    return np.flatnonzero(mask)
+
+
+def sort_positions(df: pd.DataFrame, positions: np.ndarray, sort) -> np.ndarray:
+    if not sort or len(positions) == 0:
+        return positions
+    keys = df.iloc[positions][[key.column for key in sort]].reset_index(drop=True)
+    order = keys.sort_values(
+        by=list(keys.columns),
+        ascending=[not key.descending for key in sort],
+        kind="stable",
+        na_position="last",
+    ).index.to_numpy()
+    return positions[order]
+
+
+def query_fingerprint(query) -> str:
+    # A cursor is only valid for the query it was issued for
+    payload = json.dumps(query.model_dump(exclude={"offset", "limit", "cursor"}), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def encode_cursor(query, offset: int) -> str:
+    payload = json.dumps({"query": query_fingerprint(query), "offset": offset})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(query, cursor: str) -> int:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("offset"), int) or payload["offset"] < 0:
+        raise ValueError("Invalid cursor")
+    if payload.get("query") != query_fingerprint(query):
+        raise ValueError("Cursor was issued for a different query")
+    return payload["offset"]
+
+
+def run_query(df: pd.DataFrame, query):
+    # Returns (page DataFrame, total matching rows, cursor of the next page or None)
+    columns = query.columns or list(df.columns)
+    check_columns(df, columns)
+    check_columns(df, [predicate.column for predicate in query.filters])
+    check_columns(df, [key.column for key in query.sort])
+
+    offset = decode_cursor(query, query.cursor) if query.cursor else query.offset
+    limit = min(query.limit, MAX_LIMIT)
+
+    positions = filter_positions(df, query.filters)
+    positions = sort_positions(df, positions, query.sort)
+    page = positions[offset : offset + limit]
+
+    result = df.iloc[page, [df.columns.get_loc(column) for column in columns]].reset_index(drop=True)
+    next_offset = offset + len(page)
+    next_cursor = encode_cursor(query, next_offset) if next_offset < len(positions) else None
+    return result, len(positions), next_cursor
@@ -0,0 +1,111 @@
+import zlib
+from typing import Any
+
+import numpy as np
+import orjson
+import zstandard
+from serialization import negotiate_encoding
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+# Smaller bodies are sent as they are, compression would not pay for its framing
+MINIMUM_SIZE = 1024
+# Every response is compressed on the fly; on 100k float predictions the fastest levels cost 5x-10x less time
+# than the defaults for 5% (gzip) larger and even smaller (zstd) bodies
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 1
+
+
+def json_default(value):
+    # orjson handles ndarrays and NumPy scalars itself; pandas objects go through NumPy
+    if hasattr(value, "to_numpy"):
+        return value.to_numpy()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    # NumPy arrays are serialized directly, without a .tolist() round trip through Python floats.
+    # Unlike fastapi.responses.ORJSONResponse, NaN/inf are sent as null instead of failing.
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self.compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+            self.block_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.block_flush = zlib.Z_SYNC_FLUSH
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        # Streamed bodies are flushed per message, so the client can decode what has arrived
+        if more_body:
+            return self.compressor.compress(data) + self.compressor.flush(self.block_flush)
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+class CompressionMiddleware:
+    # gzip / zstd negotiated from Accept-Encoding for every response that is not already encoded
+    # (the Arrow endpoints compress their streams themselves) and is larger than minimum_size
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if "content-encoding" in headers or (not more_body and len(body) < self.minimum_size):
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                compressor = Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    # Streamed: the length is unknown, the server falls back to chunked transfer encoding
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                else:
+                    body = compressor.compress(body, more_body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    start_message = None
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+                await send(start_message)
+                start_message = None
+
+            if compressor is None:
+                await send(message)
+                return
+            body = compressor.compress(body, more_body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
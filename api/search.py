@@ -0,0 +1,240 @@
+import itertools
+import logging
+import math
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from training import ITERATION_PARAMS, TrainingError, fit_model, load_pools, load_splits, total_iterations
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ["grid", "random", "halving"]
+# Upper bound of configurations in one search, a grid grows as the product of its value lists
+MAX_TRIALS = 200
+DEFAULT_TRIALS = 20
+# Successive halving keeps the best 1/eta configurations of every rung and gives them eta times more iterations
+DEFAULT_ETA = 3
+
+
+def cpu_count() -> int:
+    # Cores this process may run on, which can be less than os.cpu_count() in a container
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def is_distribution(values) -> bool:
+    return isinstance(values, dict)
+
+
+def check_space(space: dict, strategy: str):
+    # A parameter is either a list of values or a {"low", "high", "log", "type"} distribution;
+    # raises ValueError for anything else
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unsupported strategy '{strategy}', expected one of {STRATEGIES}")
+    if not space:
+        raise ValueError("Search space is empty")
+    for name, values in space.items():
+        if is_distribution(values):
+            if strategy == "grid":
+                raise ValueError(f"Grid search needs a list of values for '{name}', not a distribution")
+            if "low" not in values or "high" not in values or values["low"] > values["high"]:
+                raise ValueError(f"Distribution of '{name}' needs low <= high")
+            if values.get("log") and values["low"] <= 0:
+                raise ValueError(f"Log-uniform distribution of '{name}' needs low > 0")
+            if values.get("type", "float") not in ("float", "int"):
+                raise ValueError(f"Distribution of '{name}' has type 'float' or 'int'")
+        elif not isinstance(values, list) or not values:
+            raise ValueError(f"Values of '{name}' must be a non-empty list or a distribution")
+        if strategy == "halving" and name in ITERATION_PARAMS:
+            raise ValueError(f"Successive halving sets the number of iterations itself, '{name}' can not be searched")
+
+
+def sample(values, rng: random.Random):
+    if not is_distribution(values):
+        return rng.choice(values)
+    low, high = values["low"], values["high"]
+    if values.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    if values.get("type") == "int":
+        return int(round(value))
+    return value
+
+
+def configurations(space: dict, strategy: str, n_trials: int = None, seed: int = 0) -> list:
+    # Hyperparameter sets to try, without the fixed hyperparameters
+    check_space(space, strategy)
+    if strategy == "grid":
+        size = math.prod(len(values) for values in space.values())
+        if size > MAX_TRIALS:
+            raise ValueError(f"Grid has {size} configurations, at most {MAX_TRIALS} are allowed")
+        return [dict(zip(space, values)) for values in itertools.product(*space.values())]
+
+    n_trials = n_trials or DEFAULT_TRIALS
+    if n_trials > MAX_TRIALS:
+        raise ValueError(f"At most {MAX_TRIALS} trials are allowed")
+    rng = random.Random(seed)
+    result = []
+    # Duplicates of small discrete spaces are dropped, so fewer than n_trials configurations may come out
+    for _ in range(n_trials * 10):
+        configuration = {name: sample(values, rng) for name, values in space.items()}
+        if configuration not in result:
+            result.append(configuration)
+        if len(result) == n_trials:
+            break
+    return result
+
+
+def halving_rungs(n_configurations: int, max_iterations: int, eta: int = DEFAULT_ETA, min_iterations: int = None):
+    # Iterations of every rung: the last rung trains the survivors with max_iterations,
+    # each earlier one with eta times fewer, but not less than min_iterations
+    rungs = math.floor(math.log(n_configurations, eta) + 1e-9) + 1
+    min_iterations = min_iterations or 1
+    iterations = [max(min_iterations, max_iterations // eta ** (rungs - 1 - rung)) for rung in range(rungs)]
+    # Rungs that would train with the same number of iterations twice are merged
+    return sorted(set(iterations))
+
+
+class Search:
+    # Trials of one search share the feature matrix and split and run in threads of the worker process:
+    # CatBoost releases the GIL while fitting, so parallel trials use several cores without copying the data.
+    # Every trial is pinned to cores // parallel threads with thread_count. Trials with the same quantization
+    # parameters train on the same quantized Pools from pool_cache.
+    def __init__(self, report, splits, hyperparameters: dict, parallel: int = None, pool_cache=None, dataset_id=None):
+        self.send = report
+        self.report_lock = threading.Lock()
+        self.splits = splits
+        self.pool_cache = pool_cache
+        self.dataset_id = dataset_id
+        self.hyperparameters = hyperparameters
+        self.cores = cpu_count()
+        self.parallel = max(1, parallel or self.cores)
+        self.trials = []
+        self.done = 0
+        self.total = 0
+
+    def report(self, progress: dict):
+        # Trials report pool warnings from their threads, messages must not interleave on the worker pipe
+        with self.report_lock:
+            self.send(progress)
+
+    def thread_count(self, running: int) -> int:
+        return max(1, self.cores // min(self.parallel, running))
+
+    def fit(self, trial: dict, threads: int, iterations: int = None):
+        # iterations overrides the number of boosting iterations, whichever alias the request used
+        hyperparameters = {**self.hyperparameters, **trial["hyperparameters"]}
+        if iterations is not None:
+            hyperparameters = {key: value for key, value in hyperparameters.items() if key not in ITERATION_PARAMS}
+            hyperparameters["iterations"] = iterations
+        hyperparameters.setdefault("thread_count", threads)
+        pools = None
+        if self.pool_cache is not None:
+            pools = load_pools(self.report, self.pool_cache, self.dataset_id, self.splits, hyperparameters)
+        try:
+            model, metrics, learning_curves = fit_model(self.splits, hyperparameters, verbose=False, pools=pools)
+        except TrainingError as e:
+            logger.warning(f"Trial {trial['trial']} failed: {str(e)}")
+            trial.update({"status": "failed", "error": str(e)})
+            for key in ("validation_rmse", "metrics", "model", "learning_curves"):
+                trial.pop(key, None)
+            return trial
+        trial.update(
+            {
+                "status": "completed",
+                "iterations": total_iterations(hyperparameters),
+                "validation_rmse": min(learning_curves["test_rmse"], default=math.inf),
+                "metrics": metrics,
+                "model": model,
+                "learning_curves": learning_curves,
+            }
+        )
+        return trial
+
+    def run_rung(self, trials: list, iterations: int = None):
+        threads = self.thread_count(len(trials))
+        with ThreadPoolExecutor(max_workers=min(self.parallel, len(trials))) as executor:
+            futures = [executor.submit(self.fit, trial, threads, iterations) for trial in trials]
+            for future in as_completed(futures):
+                future.result()
+                self.done += 1
+                self.report({"iteration": self.done, "iterations": self.total})
+
+    def start(self, configurations: list):
+        self.trials = [
+            {"trial": number, "hyperparameters": configuration, "status": "queued", "rung": 0, "error": None}
+            for number, configuration in enumerate(configurations)
+        ]
+
+    def evaluate(self, configurations: list):
+        self.start(configurations)
+        self.total = len(self.trials)
+        self.run_rung(self.trials)
+
+    def halving(self, configurations: list, eta: int = DEFAULT_ETA, min_iterations: int = None):
+        self.start(configurations)
+        rungs = halving_rungs(len(self.trials), total_iterations(self.hyperparameters), eta, min_iterations)
+        self.total = sum(max(1, len(self.trials) // eta**rung) for rung in range(len(rungs)))
+        alive = self.trials
+        for rung, iterations in enumerate(rungs):
+            for trial in alive:
+                trial["rung"] = rung
+            self.run_rung(alive, iterations)
+            completed = sorted((trial for trial in alive if trial["status"] == "completed"), key=self.score)
+            if rung == len(rungs) - 1 or not completed:
+                break
+            # The weakest configurations stop here, their last rung stays registered
+            alive = completed[: max(1, len(completed) // eta)]
+            for trial in completed[len(alive) :]:
+                trial["status"] = "pruned"
+            logger.info(f"Rung {rung}: {len(alive)} of {len(completed)} configurations go on")
+
+    @staticmethod
+    def score(trial: dict) -> float:
+        return trial.get("validation_rmse", math.inf)
+
+    def rank(self, trial: dict):
+        # Configurations that got further in successive halving first, then by validation RMSE, failed last
+        return math.isinf(self.score(trial)), -trial["rung"], self.score(trial)
+
+    def result(self) -> dict:
+        # The test metrics stay untouched by the selection
+        trials = sorted(self.trials, key=self.rank)
+        models = {}
+        for trial in trials:
+            if "model" in trial:
+                models[trial["trial"]] = {
+                    "model": trial.pop("model"),
+                    "learning_curves": trial.pop("learning_curves"),
+                }
+        return {"trials": trials, "models": models}
+
+
+def search_job(
+    report,
+    dataset_root: str,
+    feature_cache,
+    pool_cache,
+    dataset_id: str,
+    data,
+    strategy: str,
+    configurations: list,
+    hyperparameters: dict,
+    parallel: int = None,
+    eta: int = DEFAULT_ETA,
+    min_iterations: int = None,
+) -> dict:
+    # Runs in a worker process; all trials share one split feature matrix
+    splits, preprocessed = load_splits(report, dataset_root, feature_cache, dataset_id, data)
+    report({"stage": "search", "iteration": 0, "iterations": len(configurations)})
+    search = Search(report, splits, hyperparameters, parallel, pool_cache, dataset_id)
+    if strategy == "halving":
+        search.halving(configurations, eta, min_iterations)
+    else:
+        search.evaluate(configurations)
+    return {**search.result(), "preprocessed": preprocessed}
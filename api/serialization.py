@@ -0,0 +1,147 @@
+import tempfile
+import zlib
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import zstandard
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+
+# Record batch / row group size for streamed responses
+BATCH_ROWS = 50_000
+
+# Content-Encoding values the server can produce, in order of preference
+ENCODINGS = ["zstd", "gzip"]
+
+# The request body is kept in memory up to this size and spilled to a temporary file on disk beyond it
+SPOOL_MAX_SIZE = 64 * 2**20
+
+
+def media_type(content_type: str) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+async def spool_request(request: Request, max_size: int = SPOOL_MAX_SIZE):
+    # Consume the body chunk by chunk instead of request.body(), so it is never held in memory as a whole
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def read_table(source, content_type: str) -> pa.Table:
+    # Both formats are decoded record batch by record batch from the spooled file, so the encoded body is never
+    # read into memory as a whole; the decoded batches make up the returned table.
+    # Arrow IPC buffers compressed with zstd (IpcWriteOptions(compression="zstd")) are decompressed transparently.
+    content_type = media_type(content_type)
+    if content_type == ARROW_STREAM:
+        reader = pa.ipc.open_stream(source)
+        return pa.Table.from_batches(reader, schema=reader.schema)
+    if content_type == PARQUET:
+        parquet_file = pq.ParquetFile(source)
+        return pa.Table.from_batches(parquet_file.iter_batches(batch_size=BATCH_ROWS), schema=parquet_file.schema_arrow)
+    raise ValueError(f"Unsupported content type '{content_type}', expected {ARROW_STREAM} or {PARQUET}")
+
+
+def table_to_dataframe(table: pa.Table, types_mapper=None) -> pd.DataFrame:
+    # self_destruct releases Arrow buffers column by column, so the peak stays close to a single copy
+    return table.to_pandas(split_blocks=True, self_destruct=True, types_mapper=types_mapper)
+
+
+def decode_dataframe(source, content_type: str) -> pd.DataFrame:
+    return table_to_dataframe(read_table(source, content_type))
+
+
+async def read_dataframe(request: Request) -> pd.DataFrame:
+    with await spool_request(request) as spool:
+        # Decoding is CPU-bound, keep it off the event loop
+        return await run_in_threadpool(decode_dataframe, spool, request.headers.get("content-type"))
+
+
+def arrow_schema(df: pd.DataFrame):
+    # Object columns with mixed types (e.g. numbers and strings in one CSV column) are sent as strings
+    try:
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        mixed = {}
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                mixed[column] = df[column].where(df[column].isna(), df[column].astype(str))
+        df = df.assign(**mixed)
+        return df, pa.Schema.from_pandas(df, preserve_index=False)
+
+
+def iter_record_batches(df: pd.DataFrame, batch_rows: int = BATCH_ROWS):
+    df, schema = arrow_schema(df)
+    yield schema
+    for start in range(0, len(df), batch_rows):
+        yield pa.RecordBatch.from_pandas(df.iloc[start : start + batch_rows], schema=schema, preserve_index=False)
+
+
+class _Drain(BytesIO):
+    # Writers append to the buffer, drain() hands out what was written since the last call
+    def drain(self) -> bytes:
+        data = self.getvalue()
+        self.seek(0)
+        self.truncate()
+        return data
+
+
+def iter_arrow_stream(df: pd.DataFrame, batch_rows: int = BATCH_ROWS):
+    batches = iter_record_batches(df, batch_rows)
+    buffer = _Drain()
+    with pa.ipc.new_stream(buffer, next(batches)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def iter_parquet(df: pd.DataFrame, batch_rows: int = BATCH_ROWS):
+    # One row group per batch; the footer is written last, so Parquet can only be decoded once fully received
+    batches = iter_record_batches(df, batch_rows)
+    buffer = _Drain()
+    with pq.ParquetWriter(buffer, next(batches)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def negotiate_encoding(accept_encoding: str):
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = [encoding for encoding in ENCODINGS if accepted.get(encoding, 0) > 0]
+    return max(candidates, key=lambda encoding: accepted[encoding]) if candidates else None
+
+
+def compress_stream(chunks, encoding):
+    if encoding is None:
+        yield from chunks
+        return
+    # Every chunk is flushed as a complete block, so the client can decode a record batch as soon as it arrives
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        block_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        block_flush = zlib.Z_SYNC_FLUSH
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(block_flush)
+    yield compressor.flush()
@@ -0,0 +1,141 @@
+import logging
+import time
+
+from catboost import CatBoostError, CatBoostRegressor
+from datasets import DatasetRegistry, parse_dataset_id
+from pools import training_params
+from preprocess import preprocess_data, preprocess_data_for_model
+from sklearn.metrics import r2_score, root_mean_squared_error
+
+logger = logging.getLogger(__name__)
+
+# CatBoost default and the aliases its constructor accepts for the number of boosting iterations
+DEFAULT_ITERATIONS = 1000
+ITERATION_PARAMS = ["iterations", "num_boost_round", "n_estimators", "num_trees"]
+
+
+class TrainingError(Exception):
+    pass
+
+
+class ProgressCallback:
+    # CatBoost calls after_iteration once per boosting iteration; returning True continues training.
+    # Progress is reported at most once per interval seconds.
+    def __init__(self, report, iterations: int, interval: float = 1.0):
+        self.report = report
+        self.iterations = iterations
+        self.interval = interval
+        self.last_report = 0.0
+
+    def after_iteration(self, info) -> bool:
+        now = time.monotonic()
+        if now - self.last_report >= self.interval:
+            self.report({"iteration": info.iteration, "iterations": self.iterations})
+            self.last_report = now
+        return True
+
+
+def total_iterations(hyperparameters: dict) -> int:
+    for name in ITERATION_PARAMS:
+        if hyperparameters.get(name) is not None:
+            return int(hyperparameters[name])
+    return DEFAULT_ITERATIONS
+
+
+def split_data(data):
+    # Feature matrix and train / validation / test split of the preprocess_data output, modified in place
+    try:
+        return preprocess_data_for_model(data, is_trained=True)
+    except Exception as e:
+        raise TrainingError(f"Error during preprocessing data for model: {str(e)}")
+
+
+def fit_model(splits, hyperparameters: dict, callbacks=None, verbose=True, pools=None):
+    # Returns (model, metrics, learning curves); splits is the split_data output and is only read,
+    # so one split can be shared by several models. pools are quantized (train, validation) Pools of
+    # the same split, the quantization parameters in hyperparameters are already applied to them
+    X_train, X_val, X_test, y_train, y_val, y_test = splits
+
+    try:
+        model = CatBoostRegressor(**(hyperparameters if pools is None else training_params(hyperparameters)))
+    except Exception as e:
+        raise TrainingError(f"Invalid hyperparameters: {str(e)}")
+
+    try:
+        if pools is None:
+            model.fit(X_train, y_train, eval_set=(X_val, y_val), verbose=verbose, plot=False, callbacks=callbacks)
+        else:
+            model.fit(pools[0], eval_set=pools[1], verbose=verbose, plot=False, callbacks=callbacks)
+    except Exception as e:
+        raise TrainingError(f"Error during model training: {str(e)}")
+
+    try:
+        y_pred = model.predict(X_test)
+        metrics = {"RMSE": root_mean_squared_error(y_test, y_pred), "R2": r2_score(y_test, y_pred)}
+    except Exception as e:
+        raise TrainingError(f"Error during model evaluation: {str(e)}")
+
+    learning_curves = {
+        "iterations": list(range(len(model.evals_result_["validation"]["RMSE"]))),
+        "train_rmse": model.evals_result_["learn"]["RMSE"],
+        "test_rmse": model.evals_result_["validation"]["RMSE"],
+    }
+    return model, metrics, learning_curves
+
+
+def load_data(report, dataset_root: str, dataset_id: str, data):
+    # data is the cached preprocess_data output of the API, if it had one;
+    # otherwise the dataset version is read from its Arrow file and preprocessed here
+    if data is None:
+        report({"stage": "preprocessing"})
+        df, _ = DatasetRegistry(dataset_root).get(dataset_id)
+        try:
+            data = preprocess_data(df)
+        except Exception as e:
+            raise TrainingError(f"Error during preprocessing: {str(e)}")
+    return data
+
+
+def load_splits(report, dataset_root: str, feature_cache, dataset_id: str, data):
+    # Split feature matrix of the dataset version: memory-mapped from feature_cache (a features.FeatureCache)
+    # if an earlier job stored it, otherwise computed and stored for the next ones.
+    # Returns (splits, preprocess_data output if it was computed here, else None)
+    _, version = parse_dataset_id(dataset_id)
+    splits = feature_cache.get(version)
+    if splits is not None:
+        report({"stage": "loading features"})
+        return splits, None
+    preprocessed = load_data(report, dataset_root, dataset_id, data)
+    # split_data modifies its input, while a frame computed here is sent back as the preprocess_data output
+    splits = split_data(preprocessed.copy() if data is None else preprocessed)
+    try:
+        feature_cache.put(version, splits)
+    except OSError as e:
+        # Training goes on without the cache, e.g. when the disk is full
+        logger.warning(f"Feature matrix of {dataset_id} not cached: {str(e)}")
+    return splits, preprocessed if data is None else None
+
+
+def load_pools(report, pool_cache, dataset_id: str, splits, hyperparameters: dict):
+    # Quantized Pools from pool_cache (a pools.PoolCache); None trains on the DataFrames instead.
+    # The fallback is reported as the job warning, other errors fail the job
+    _, version = parse_dataset_id(dataset_id)
+    try:
+        return pool_cache.pools(version, hyperparameters, splits)
+    except (OSError, CatBoostError) as e:
+        logger.error(f"Quantized pools of {dataset_id} not available, training on the feature matrix: {str(e)}")
+        report({"warning": f"Quantized pools not available, trained on the feature matrix: {str(e)}"})
+        return None
+
+
+def train_job(
+    report, dataset_root: str, feature_cache, pool_cache, dataset_id: str, data, hyperparameters: dict
+) -> dict:
+    # Runs in a worker process. A preprocess_data output computed here is sent back for the API's PreprocessedCache
+    splits, preprocessed = load_splits(report, dataset_root, feature_cache, dataset_id, data)
+    report({"stage": "quantizing"})
+    pools = load_pools(report, pool_cache, dataset_id, splits, hyperparameters)
+    report({"stage": "training", "iteration": 0, "iterations": total_iterations(hyperparameters)})
+    callback = ProgressCallback(report, total_iterations(hyperparameters))
+    model, metrics, learning_curves = fit_model(splits, hyperparameters, callbacks=[callback], pools=pools)
+    return {"model": model, "metrics": metrics, "learning_curves": learning_curves, "preprocessed": preprocessed}
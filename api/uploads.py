@@ -0,0 +1,163 @@
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+
+import pandas as pd
+from fastapi import Request
+from serialization import ARROW_STREAM, PARQUET, read_table, table_to_dataframe
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHUNK_SIZE = 8 * 2**20
+# Sessions that were neither committed nor aborted are removed after this many seconds
+SESSION_TTL = 24 * 3600
+
+FORMATS = ["csv", "arrow", "parquet"]
+
+SESSION_ID = re.compile("[0-9a-f]{32}")
+CHUNK_NAME = re.compile(r"chunk-(\d+)")
+
+
+class ChunkReader(io.RawIOBase):
+    # Reads the chunk files of a session one after another as a single stream, without assembling them
+    def __init__(self, paths):
+        self.paths = iter(paths)
+        self.file = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.file is None:
+                path = next(self.paths, None)
+                if path is None:
+                    return 0
+                self.file = open(path, "rb")
+            size = self.file.readinto(buffer)
+            if size:
+                return size
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        super().close()
+
+
+class UploadStore:
+    def __init__(self, root: str = UPLOAD_DIR, ttl: float = SESSION_TTL):
+        self.root = root
+        self.ttl = ttl
+        os.makedirs(root, exist_ok=True)
+
+    def session_dir(self, session_id: str) -> str:
+        if not SESSION_ID.fullmatch(session_id) or not os.path.isdir(os.path.join(self.root, session_id)):
+            raise KeyError(session_id)
+        return os.path.join(self.root, session_id)
+
+    def chunk_path(self, session_id: str, index: int) -> str:
+        return os.path.join(self.session_dir(session_id), f"chunk-{index:06d}")
+
+    def open(
+        self, filename: str, format: str, total_size=None, chunk_size: int = CHUNK_SIZE, dataset_id: str = "default"
+    ) -> dict:
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported format '{format}', expected one of {FORMATS}")
+        self.cleanup()
+        session_id = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.root, session_id))
+        meta = {
+            "session_id": session_id,
+            "filename": filename,
+            "format": format,
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "dataset_id": dataset_id,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(self.root, session_id, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return meta
+
+    def meta(self, session_id: str) -> dict:
+        with open(os.path.join(self.session_dir(session_id), "meta.json")) as f:
+            return json.load(f)
+
+    def received(self, session_id: str) -> dict:
+        chunks = {}
+        for name in os.listdir(self.session_dir(session_id)):
+            match = CHUNK_NAME.fullmatch(name)
+            if match:
+                chunks[int(match.group(1))] = os.path.getsize(os.path.join(self.root, session_id, name))
+        return dict(sorted(chunks.items()))
+
+    def status(self, session_id: str) -> dict:
+        chunks = self.received(session_id)
+        return {
+            **self.meta(session_id),
+            "received_chunks": list(chunks),
+            "received_bytes": sum(chunks.values()),
+        }
+
+    async def write_chunk(self, session_id: str, index: int, request: Request, checksum: str) -> int:
+        # The chunk is streamed to a temporary file and renamed only after the SHA-256 matches,
+        # so a retried or interrupted PUT never leaves a partial chunk behind
+        path = self.chunk_path(session_id, index)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                async for data in request.stream():
+                    digest.update(data)
+                    f.write(data)
+                    size += len(data)
+            if digest.hexdigest() != checksum.lower():
+                raise ValueError(f"Checksum mismatch for chunk {index}")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return size
+
+    def chunk_paths(self, session_id: str, total_chunks: int):
+        chunks = self.received(session_id)
+        missing = [index for index in range(total_chunks) if index not in chunks]
+        if missing:
+            raise ValueError(f"Missing chunks: {missing}")
+        meta = self.meta(session_id)
+        received_bytes = sum(chunks[index] for index in range(total_chunks))
+        if meta["total_size"] is not None and received_bytes != meta["total_size"]:
+            raise ValueError(f"Received {received_bytes} bytes, expected {meta['total_size']}")
+        return [self.chunk_path(session_id, index) for index in range(total_chunks)]
+
+    def read_dataframe(self, session_id: str, total_chunks: int) -> pd.DataFrame:
+        paths = self.chunk_paths(session_id, total_chunks)
+        format = self.meta(session_id)["format"]
+        if format == "parquet":
+            # Parquet keeps its footer at the end and needs a seekable file, so the chunks are assembled on disk
+            data_path = os.path.join(self.session_dir(session_id), "data.parquet")
+            with open(data_path, "wb") as output, io.BufferedReader(ChunkReader(paths)) as source:
+                shutil.copyfileobj(source, output)
+            with open(data_path, "rb") as source:
+                return table_to_dataframe(read_table(source, PARQUET))
+        with io.BufferedReader(ChunkReader(paths), buffer_size=2**20) as source:
+            if format == "arrow":
+                return table_to_dataframe(read_table(source, ARROW_STREAM))
+            return pd.read_csv(source)
+
+    def remove(self, session_id: str):
+        shutil.rmtree(self.session_dir(session_id))
+
+    def cleanup(self):
+        now = time.time()
+        for session_id in os.listdir(self.root):
+            path = os.path.join(self.root, session_id)
+            if SESSION_ID.fullmatch(session_id) and now - os.path.getmtime(path) > self.ttl:
+                shutil.rmtree(path, ignore_errors=True)
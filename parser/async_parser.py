@@ -0,0 +1,237 @@
+import asyncio
+import json
+import random
+import time
+from parser import Parser
+
+import aiohttp
+
+
+class TokenBucket:
+    """Token bucket для ограничения частоты запросов к API HH.
+
+    При 403 скорость уменьшается вдвое (но не ниже min_rate), после каждого
+    успешного ответа умножается на (1 + recovery), пока не вернётся к исходной rate.
+    Восстановление мультипликативное: при recovery=0.1 вдвое сниженная скорость
+    восстанавливается за ~7 успешных ответов, поэтому редкие 403 (порядка 5%)
+    не роняют скорость до min_rate, как при аддитивном шаге.
+    """
+
+    def __init__(self, rate: float = 5.0, capacity: int = 10, min_rate: float = 0.5, recovery: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.sleep_time = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.sleep_time += delay
+                await asyncio.sleep(delay)
+
+    def penalize(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+
+    def reward(self):
+        self.rate = min(self.max_rate, self.rate * (1 + self.recovery))
+
+
+class AsyncParser(Parser):
+    """Асинхронный режим парсера: общий пул keep-alive соединений, ограничение
+    числа одновременных запросов и адаптивный token bucket вместо глобального time.sleep.
+    Обрывы соединения и таймауты (timeout сек на запрос) повторяются с откатом, как ответы 5xx;
+    после max_retries попыток пропускается только эта страница, а не весь обход."""
+
+    def __init__(
+        self,
+        url=None,
+        max_concurrency: int = 8,
+        rate: float = 5.0,
+        burst: int = 10,
+        max_retries: int = 5,
+        backoff: float = 2.0,
+        timeout: float = 30.0,
+        **kwargs,
+    ):
+        # kwargs (frontier_path, adaptive, seen_index_path, parquet_path, columns, cache_path) передаются в Parser
+        super().__init__(url, **kwargs)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.limiter = TokenBucket(rate=rate, capacity=burst)
+
+    def vacancies_params(self, date_from, date_to, area, metro, page: int = 0, per_page: int = 100):
+        params = super().vacancies_params(date_from, date_to, area, metro, page=page, per_page=per_page)
+        # aiohttp принимает только строки и числа
+        return {key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()}
+
+    async def fetch_json(self, session, path, params=None):
+        """Функция для запроса с учётом лимитов. Выход - (json | None, status)."""
+        url = self.url + path
+        entry = None
+        headers = {}
+        if self.cache is not None:
+            entry = self.cache.lookup(url, params)
+            if entry is not None and entry.fresh:
+                self.cache.hits += 1
+                return entry.json(), 200
+            headers = self.cache.conditional_headers(entry)
+
+        status = None
+        for attempt in range(self.max_retries):
+            start = time.perf_counter()
+            await self.limiter.acquire()
+            # Ожидание суммируется по запросам, поэтому при параллельном обходе может превышать время обхода
+            self.metrics.record_sleep("rate_limit", time.perf_counter() - start)
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.get(url, params=params, headers=headers) as response:
+                        status = response.status
+                        body = await response.read()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    # Обрыв соединения или таймаут: статус None, запрос повторяется как при 5xx
+                    status = None
+                    self.metrics.record_request(url, "error", time.perf_counter() - start)
+                    print(f"Сетевая ошибка при запросе {path}: {type(e).__name__} {e}")
+                else:
+                    self.metrics.record_request(url, status, time.perf_counter() - start)
+                if status == 304 and entry is not None:
+                    self.limiter.reward()
+                    self.cache.revalidated += 1
+                    self.cache.refresh(url, entry)
+                    return entry.json(), 200
+                if status == 200:
+                    self.limiter.reward()
+                    if self.cache is not None:
+                        self.cache.misses += 1
+                        self.cache.store(url, params, body, response.headers)
+                    return json.loads(body), status
+
+            # 400 (конец выдачи) и прочие 4xx повторять бессмысленно
+            if status is not None and status < 500 and status != 403:
+                return None, status
+
+            # Откатываем только этот запрос, остальные продолжают работать (при 403 - на сниженной скорости)
+            if status == 403:
+                self.limiter.penalize()
+            delay = self.backoff * 2**attempt * (1 + random.random())
+            self.limiter.sleep_time += delay
+            self.metrics.record_sleep("403" if status == 403 else "retry", delay)
+            await asyncio.sleep(delay)
+        print(f"Запрос {path} {params} не выполнен после {self.max_retries} попыток (статус {status}).")
+        return None, status
+
+    async def fetch_unit(self, session, date_from, date_to, area, metro):
+        """Функция для парсинга всех страниц одной единицы работы (дата, регион, метро).
+        Уже сохранённые во фронтире страницы повторно не запрашиваются."""
+        pages = {}
+        total_pages = None
+        if self.frontier is not None:
+            pages = self.frontier.done_pages(date_from, area, metro)
+            total_pages = self.frontier.unit_pages(date_from, area, metro)
+
+        statuses = []
+        if 0 not in pages:
+            params = self.vacancies_params(date_from, date_to, area, metro, page=0)
+            data, status = await self.fetch_json(session, "/vacancies", params)
+            statuses.append(status)
+            if data:
+                self.metrics.record_page(len(data["items"]))
+                pages[0] = self.ingest_page(data["items"])
+                total_pages = data.get("pages", 1) if data["items"] else 0
+                self.commit_page(date_from, area, metro, 0, pages[0], total_pages)
+
+        if 0 in pages:
+
+            async def fetch_page(page):
+                params = self.vacancies_params(date_from, date_to, area, metro, page=page)
+                data, status = await self.fetch_json(session, "/vacancies", params)
+                statuses.append(status)
+                if data:
+                    self.metrics.record_page(len(data["items"]))
+                    pages[page] = self.ingest_page(data["items"])
+                    self.commit_page(date_from, area, metro, page, pages[page])
+
+            await asyncio.gather(*(fetch_page(page) for page in range(1, total_pages or 1) if page not in pages))
+
+        # Единицы, прерванные ошибкой сервера, остаются pending и будут дообработаны при перезапуске
+        if not all(status in (200, 400) for status in statuses):
+            self.failed_units.append((date_from, date_to, area, metro))
+        elif self.frontier is not None:
+            self.frontier.finish_unit(date_from, area, metro)
+
+        # Страницы за пределом глубины выдачи отвечают 400 — на них останавливаемся, как и в __call__
+        vacancies = []
+        for page in range(len(pages)):
+            if page not in pages:
+                break
+            vacancies.extend(pages[page])
+        return vacancies
+
+    def commit_page(self, date_from, area, metro, page, items, pages=None):
+        if self.frontier is not None:
+            self.frontier.commit_page(date_from, area, metro, page, items, pages=pages)
+
+    async def crawl(self, work_units, all_units=None):
+        """Функция для параллельного обхода единиц работы. Порядок вакансий совпадает с последовательным обходом.
+        - all_units: все единицы запуска, включая завершённые ранее (для сборки результата из фронтира)."""
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        results = {}
+        queue = asyncio.Queue(maxsize=self.max_concurrency * 4)
+
+        timeout = aiohttp.ClientTimeout(total=self.timeout, sock_connect=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+
+            async def worker():
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        queue.task_done()
+                        return
+                    index, unit = item
+                    vacancies = await self.fetch_unit(session, *unit)
+                    if self.frontier is None:
+                        self.accept_page(results.setdefault(index, []), vacancies)
+                    self.metrics.maybe_export(**self.metrics_extra())
+                    queue.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+            for index, unit in enumerate(work_units):
+                await queue.put((index, unit))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+        vacancies_list = [vacancy for index in sorted(results) for vacancy in results[index]]
+        return self.collect_vacancies(all_units or work_units, vacancies_list)
+
+    def crawl_units(self, work_units):
+        work_units = list(work_units)
+        pending_units = list(self.pending_work_units(work_units))
+        print(
+            f"Асинхронный парсинг {len(pending_units)} единиц работы, {self.max_concurrency} параллельных запросов..."
+        )
+
+        self.failed_units = []
+        vacancies_list = asyncio.run(self.crawl(pending_units, work_units))
+        print(f"Время ожидания лимитов: {self.limiter.sleep_time:.1f} сек.")
+        return vacancies_list
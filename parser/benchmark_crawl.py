@@ -0,0 +1,68 @@
+"""Бенчмарк пропускной способности парсера на локальном mock API HH (без сети, подходит для CI).
+
+Запуск:
+    python benchmark_crawl.py --synthetic 20000 --days 3 --latency 0.02 --forbidden-rate 0.01
+    python benchmark_crawl.py --payloads ../dataset/frontier.sqlite --mode async --metrics ../dataset/metrics.jsonl
+"""
+
+import argparse
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from parser import Parser
+
+from aiohttp import web
+from async_parser import AsyncParser
+from mock_hh import MockHH
+from payloads import load_payloads, synthetic_vacancies
+
+
+def serve(mock, host="127.0.0.1", port=0):
+    """Функция для запуска mock-сервера в фоновом потоке. Выход - URL сервера."""
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(mock.app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, host, port)
+    loop.run_until_complete(site.start())
+    port = runner.addresses[0][1]
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://{host}:{port}"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--payloads", help="SQLite фронтира, JSON-файл или директория с ответами /vacancies")
+    arg_parser.add_argument("--synthetic", type=int, default=20000, help="Число синтетических вакансий")
+    arg_parser.add_argument("--days", type=int, default=3, help="Сколько дней с первой вакансии обходить")
+    arg_parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    arg_parser.add_argument("--latency", type=float, default=0.02)
+    arg_parser.add_argument("--jitter", type=float, default=0.005)
+    arg_parser.add_argument("--forbidden-rate", type=float, default=0.0)
+    arg_parser.add_argument("--metrics", default=None, help="Файл для срезов метрик (JSON lines)")
+    args = arg_parser.parse_args()
+
+    if args.payloads:
+        vacancies = [vacancy for vacancy in load_payloads(args.payloads) if "published_at" in vacancy]
+    else:
+        vacancies = synthetic_vacancies(args.synthetic)
+    mock = MockHH(vacancies, latency=args.latency, jitter=args.jitter, forbidden_rate=args.forbidden_rate)
+    url = serve(mock)
+
+    start = datetime.fromisoformat(mock.published[0][:10])
+    windows = [(start + timedelta(days=i), start + timedelta(days=i + 1)) for i in range(args.days)]
+    print(f"Mock HH: {len(vacancies)} вакансий, {url}, окна {windows[0][0].date()} - {windows[-1][1].date()}")
+
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        parser_class = AsyncParser if mode == "async" else Parser
+        # Откат после 403 в бенчмарке короткий: меряем пропускную способность, а не ожидание
+        parser = parser_class(url, metrics_path=args.metrics, **({"backoff": 0.1} if mode == "async" else {}))
+        print(f"\n--- {mode} ---")
+        vacancies_list = parser.crawl_units(parser.iter_window_units(windows))
+        parser.json_list_to_dataframe(vacancies_list)
+        parser.metrics.report(mode=mode)
+    print(f"\nСервер: {dict(mock.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Бенчмарк разворачивания вакансий: прежний рекурсивный flatten против Flattener.
+
+Запуск:
+    python benchmark_flatten.py --payloads ../dataset/frontier.sqlite
+    python benchmark_flatten.py --synthetic 100000
+"""
+
+import argparse
+import time
+
+import pandas as pd
+from flatten import MODEL_COLUMNS, Flattener, flatten_recursive
+from payloads import load_payloads, synthetic_vacancies
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("--payloads", help="SQLite фронтира, JSON-файл или директория с ответами /vacancies")
+    arg_parser.add_argument("--synthetic", type=int, default=50000, help="Число синтетических вакансий")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    vacancies = load_payloads(args.payloads) if args.payloads else synthetic_vacancies(args.synthetic)
+    print(f"Вакансий: {len(vacancies)}")
+
+    old_time, old_df = best_of(lambda: pd.DataFrame([flatten_recursive(item) for item in vacancies]), args.repeat)
+    new_time, new_df = best_of(lambda: Flattener().to_dataframe(vacancies), args.repeat)
+    flattener = Flattener()
+    flattener.to_dataframe(vacancies[:1000])
+    warm_time, _ = best_of(lambda: flattener.to_dataframe(vacancies), args.repeat)
+
+    projected_time, projected_df = best_of(
+        lambda: Flattener(columns=MODEL_COLUMNS).to_dataframe(vacancies), args.repeat
+    )
+
+    pd.testing.assert_frame_equal(old_df, new_df, check_dtype=False)
+    pd.testing.assert_frame_equal(
+        old_df.reindex(columns=MODEL_COLUMNS), projected_df, check_dtype=False, check_column_type=False
+    )
+    print(f"Колонок: {new_df.shape[1]}, результаты совпадают")
+    print(f"flatten_recursive + pd.DataFrame: {old_time:.3f} сек")
+    print(f"Flattener (схема с нуля):         {new_time:.3f} сек (x{old_time / new_time:.1f})")
+    print(f"Flattener (схема выучена):        {warm_time:.3f} сек (x{old_time / warm_time:.1f})")
+    print(f"Flattener (MODEL_COLUMNS):        {projected_time:.3f} сек (x{old_time / projected_time:.1f})")
+
+    old_memory = old_df.memory_usage(deep=True).sum() / 2**20
+    projected_memory = projected_df.memory_usage(deep=True).sum() / 2**20
+    print(
+        f"Память: {old_memory:.1f} MiB, {old_df.shape[1]} колонок -> {projected_memory:.1f} MiB, "
+        f"{projected_df.shape[1]} колонок (x{old_memory / projected_memory:.1f})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Список колонок модели лежит в api/: парсер и API запускаются как отдельные наборы модулей верхнего уровня
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from model_columns import raw_cat_columns, salary_columns, text_columns  # noqa: E402
+
+# Значение для отсутствующего пути, как у pd.DataFrame(list_of_dicts)
+MISSING = np.nan
+
+# Сырые колонки, которые использует модель, берутся из общего с API списка (api/model_columns.py),
+# плюс id и published_at для дедупликации и партиционирования. Производные category, name_length
+# и length считаются в preprocess_data.
+MODEL_COLUMNS = ["id", "published_at"] + text_columns + salary_columns + raw_cat_columns
+
+
+def flatten_recursive(json_object, prefix=""):
+    """Прежняя рекурсивная реализация разворачивания (эталон для сравнения и бенчмарка)."""
+    flat_dict = {}
+    for key, value in json_object.items():
+        if isinstance(value, dict):
+            # Если это словарь, вызываем flatten рекурсивно
+            flat_dict.update(flatten_recursive(value, prefix + key + "_"))
+        elif isinstance(value, list):
+            # Если это список, обрабатываем каждый элемент
+            for i, item in enumerate(value):
+                if isinstance(item, dict):
+                    # Обрабатываем вложенные словари
+                    flat_dict.update(flatten_recursive(item, prefix + key + f"_{i}_"))
+                else:
+                    # Обработка неисков в списке (меньше встречается в данном контексте)
+                    flat_dict[prefix + key + f"_{i}"] = item
+        else:
+            # Базовый случай, добавляем значение в плоский словарь
+            flat_dict[prefix + key] = value
+    return flat_dict
+
+
+class _Node:
+    __slots__ = ("keys", "indices", "leaf", "column", "pruned")
+
+    def __init__(self, pruned=False):
+        self.keys = {}  # ключ словаря -> _Node
+        self.indices = {}  # индекс списка -> _Node
+        self.leaf = False  # по этому пути встречалось скалярное значение
+        self.column = None  # номер колонки, если путь попадает в выход
+        self.pruned = pruned  # под этим путём нет ни одной нужной колонки
+
+
+class Flattener:
+    """Разворачивание вакансий в DataFrame по схеме путей ключей.
+
+    Схема (дерево путей) выучивается по данным и компилируется в Python-функцию, которая
+    без рекурсии и промежуточных словарей раскладывает значения по спискам-колонкам.
+    Если вакансия содержит путь, которого нет в схеме, функция останавливается на ней,
+    схема дополняется только по этой вакансии и компилируется заново. Схема переживает
+    вызовы to_dataframe, поэтому при потоковой обработке выучивается один раз.
+
+    Имена колонок и их порядок совпадают с flatten_recursive + pd.DataFrame.
+
+    columns - проекция: извлекаются только эти колонки, а ветки JSON, под которыми нет ни одной
+    из них, не обходятся вовсе. Выход тогда содержит ровно columns в заданном порядке.
+    """
+
+    def __init__(self, columns=None):
+        self.root = _Node()
+        self.columns = []
+        self.column_index = {}
+        self._extract = None
+
+        self.projection = list(columns) if columns is not None else None
+        if self.projection is not None:
+            self.projection_set = set(self.projection)
+            self.prefixes = {column[:i] for column in self.projection for i in range(1, len(column) + 1)}
+
+    def wanted(self, name):
+        return self.projection is None or name in self.prefixes
+
+    def projected(self, name):
+        return self.projection is None or name in self.projection_set
+
+    def add_column(self, name):
+        if name not in self.column_index:
+            self.column_index[name] = len(self.columns)
+            self.columns.append(name)
+        return self.column_index[name]
+
+    def learn(self, json_object):
+        """Функция для дополнения схемы путями одной вакансии."""
+        self._extract = None
+        self._learn_dict(self.root, json_object, "")
+
+    def _child(self, children, key, name):
+        child = children.get(key)
+        if child is None:
+            child = children[key] = _Node(pruned=not self.wanted(name))
+        return child
+
+    def _learn_dict(self, node, json_object, prefix):
+        for key, value in json_object.items():
+            name = prefix + key
+            child = self._child(node.keys, key, name)
+            if not child.pruned:
+                self._learn_value(child, value, name, in_list=False)
+
+    def _learn_value(self, node, value, name, in_list):
+        if isinstance(value, dict):
+            self._learn_dict(node, value, name + "_")
+        elif isinstance(value, list) and not in_list:
+            for i, item in enumerate(value):
+                child = self._child(node.indices, i, f"{name}_{i}")
+                if not child.pruned:
+                    self._learn_value(child, item, f"{name}_{i}", in_list=True)
+        elif not node.leaf:
+            node.leaf = True
+            if self.projected(name):
+                node.column = self.add_column(name)
+
+    def compile(self):
+        """Функция для генерации функции extract(items, start, columns) по текущей схеме."""
+        lines = []
+        namespace = {"MISSING": MISSING, "dict": dict, "list": list}
+        counter = iter(range(10**9))
+
+        def emit_dict(node, var, depth):
+            keys_name = f"K{next(counter)}"
+            namespace[keys_name] = frozenset(node.keys)
+            lines.append("    " * depth + f"if not ({var}.keys() <= {keys_name}): return i")
+            for key, child in node.keys.items():
+                if child.pruned:
+                    continue
+                value = f"v{next(counter)}"
+                lines.append("    " * depth + f"{value} = {var}.get({key!r}, MISSING)")
+                emit_value(child, value, depth, in_list=False)
+
+        def emit_list(node, var, depth):
+            size = f"n{next(counter)}"
+            lines.append("    " * depth + f"{size} = len({var})")
+            lines.append("    " * depth + f"if {size} > {len(node.indices)}: return i")
+            for index, child in sorted(node.indices.items()):
+                if child.pruned:
+                    continue
+                value = f"v{next(counter)}"
+                lines.append("    " * depth + f"if {size} > {index}:")
+                lines.append("    " * (depth + 1) + f"{value} = {var}[{index}]")
+                emit_value(child, value, depth + 1, in_list=True)
+
+        def emit_value(node, var, depth, in_list):
+            kind = f"t{next(counter)}"
+            lines.append("    " * depth + f"{kind} = {var}.__class__")
+            lines.append("    " * depth + f"if {kind} is dict:")
+            emit_dict(node, var, depth + 1)
+            if not in_list:
+                lines.append("    " * depth + f"elif {kind} is list:")
+                emit_list(node, var, depth + 1)
+            lines.append("    " * depth + "else:")
+            if not node.leaf:
+                lines.append("    " * (depth + 1) + f"if {var} is not MISSING: return i")
+            elif node.column is not None:
+                lines.append("    " * (depth + 1) + f"c{node.column}[i] = {var}")
+            else:
+                lines.append("    " * (depth + 1) + "pass")
+
+        header = ["def extract(items, start, columns):"]
+        header += [f"    c{index} = columns[{index}]" for index in range(len(self.columns))]
+        lines.append("    for i in range(start, len(items)):")
+        lines.append("        o = items[i]")
+        emit_dict(self.root, "o", 2)
+        lines.append("    return len(items)")
+
+        exec("\n".join(header + lines), namespace)
+        self._extract = namespace["extract"]
+
+    def extract_columns(self, json_list):
+        """Функция для раскладки вакансий по колонкам. Выход - List[List] в порядке self.columns."""
+        n = len(json_list)
+        columns = [[MISSING] * n for _ in self.columns]
+        i, stopped = 0, None
+        while True:
+            if self._extract is None:
+                self.compile()
+            i = self._extract(json_list, i, columns)
+            if i == n:
+                return columns
+            if i == stopped:
+                raise RuntimeError(f"Схема не покрывает вакансию {json_list[i].get('id')}")
+            stopped = i
+
+            # Новый путь: дополняем схему по этой вакансии и продолжаем с неё же
+            known = len(self.columns)
+            self.learn(json_list[i])
+            columns.extend([MISSING] * n for _ in range(len(self.columns) - known))
+
+    def to_dataframe(self, json_list):
+        if not json_list:
+            return pd.DataFrame(columns=self.projection)
+        columns = self.extract_columns(json_list)
+        df = pd.DataFrame(dict(zip(self.columns, columns)), columns=self.columns)
+        if self.projection is not None:
+            df = df.reindex(columns=self.projection)
+        return df
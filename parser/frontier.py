@@ -0,0 +1,129 @@
+import json
+import os
+import sqlite3
+
+PENDING = "pending"
+DONE = "done"
+
+
+class CrawlFrontier:
+    """Персистентный фронтир обхода в SQLite.
+
+    Единица работы - (date_from, area, metro), у каждой её страницы свой статус.
+    Страницы коммитятся сразу после получения, поэтому после падения или Ctrl-C
+    повторный запуск продолжает с первой необработанной страницы.
+    """
+
+    def __init__(self, path: str = "../dataset/frontier.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS units (
+                date_from TEXT NOT NULL,
+                date_to TEXT NOT NULL,
+                area TEXT NOT NULL,
+                metro TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                pages INTEGER,
+                PRIMARY KEY (date_from, area, metro)
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                date_from TEXT NOT NULL,
+                area TEXT NOT NULL,
+                metro TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                items TEXT,
+                PRIMARY KEY (date_from, area, metro, page)
+            );
+            """
+        )
+        self.conn.commit()
+
+    def add_units(self, work_units):
+        """Функция для регистрации единиц работы. Уже известные единицы (и их статусы) не перезаписываются."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO units (date_from, date_to, area, metro) VALUES (?, ?, ?, ?)",
+                ((date_from, date_to, str(area), str(metro)) for date_from, date_to, area, metro in work_units),
+            )
+
+    def pending_units(self):
+        """Функция для получения незавершённых единиц работы в порядке регистрации."""
+        return self.conn.execute(
+            "SELECT date_from, date_to, area, metro FROM units WHERE status = ? ORDER BY rowid", (PENDING,)
+        ).fetchall()
+
+    def is_done(self, date_from, area, metro):
+        row = self.conn.execute(
+            "SELECT status FROM units WHERE date_from = ? AND area = ? AND metro = ?",
+            (date_from, str(area), str(metro)),
+        ).fetchone()
+        return row is not None and row[0] == DONE
+
+    def done_pages(self, date_from, area, metro):
+        """Функция для получения Dict page -> List[vacancy] уже сохранённых страниц единицы работы."""
+        rows = self.conn.execute(
+            "SELECT page, items FROM pages WHERE date_from = ? AND area = ? AND metro = ? AND status = ?",
+            (date_from, str(area), str(metro), DONE),
+        )
+        return {page: json.loads(items) for page, items in rows}
+
+    def unit_pages(self, date_from, area, metro):
+        """Функция для получения общего числа страниц единицы работы (если уже известно)."""
+        row = self.conn.execute(
+            "SELECT pages FROM units WHERE date_from = ? AND area = ? AND metro = ?",
+            (date_from, str(area), str(metro)),
+        ).fetchone()
+        return row[0] if row else None
+
+    def commit_page(self, date_from, area, metro, page, items, pages=None):
+        """Функция для сохранения полученной страницы. Коммит происходит сразу."""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (date_from, area, metro, page, status, items) VALUES (?, ?, ?, ?, ?, ?)",
+                (date_from, str(area), str(metro), page, DONE, json.dumps(items, ensure_ascii=False)),
+            )
+            if pages is not None:
+                self.conn.execute(
+                    "UPDATE units SET pages = ? WHERE date_from = ? AND area = ? AND metro = ?",
+                    (pages, date_from, str(area), str(metro)),
+                )
+
+    def finish_unit(self, date_from, area, metro):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE units SET status = ? WHERE date_from = ? AND area = ? AND metro = ?",
+                (DONE, date_from, str(area), str(metro)),
+            )
+
+    def iter_vacancies(self, work_units=None):
+        """Генератор сохранённых вакансий в порядке обхода (только по work_units, если они переданы)."""
+        if work_units is None:
+            rows = self.conn.execute(
+                """
+                SELECT pages.items FROM pages
+                JOIN units USING (date_from, area, metro)
+                WHERE pages.status = ?
+                ORDER BY units.rowid, pages.page
+                """,
+                (DONE,),
+            )
+            for (items,) in rows:
+                yield from json.loads(items)
+            return
+
+        for date_from, _, area, metro in work_units:
+            pages = self.done_pages(date_from, area, metro)
+            for page in sorted(pages):
+                yield from pages[page]
+
+    def progress(self):
+        """Функция для получения Dict status -> количество единиц работы."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM units GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+# Время жизни ответа по первому сегменту пути. Справочники меняются редко, выдача поиска - часто
+DEFAULT_TTLS = {
+    "areas": 7 * 24 * 3600,
+    "metro": 7 * 24 * 3600,
+    "vacancies": 3600,
+}
+
+
+class CacheEntry:
+    def __init__(self, key, body, etag, last_modified, expires_at):
+        self.key = key
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+
+    @property
+    def fresh(self):
+        return self.expires_at > time.time()
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpCache:
+    """Дисковый кэш ответов HH в SQLite.
+
+    Ключ - URL и отсортированные параметры запроса. Свежие ответы (моложе TTL ручки) отдаются без сети,
+    устаревшие перепроверяются по ETag / Last-Modified: на 304 тело берётся из кэша и TTL продлевается.
+    При превышении max_bytes вытесняются давно не использованные записи (LRU).
+    """
+
+    def __init__(self, path: str = "../dataset/http_cache.sqlite", max_bytes: int = 2 * 2**30, ttls=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+            """
+        )
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def make_key(self, url, params=None):
+        params = sorted((str(key), str(value)) for key, value in (params or {}).items())
+        return url + "?" + json.dumps(params, ensure_ascii=False)
+
+    def ttl(self, url):
+        segment = urlparse(url).path.strip("/").split("/")[0]
+        return self.ttls.get(segment, 0)
+
+    def lookup(self, url, params=None):
+        key = self.make_key(url, params)
+        row = self.conn.execute(
+            "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(key, *row)
+
+    def conditional_headers(self, entry):
+        """Функция для заголовков перепроверки устаревшей записи."""
+        headers = {}
+        if entry is not None and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry is not None and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, params, body: bytes, headers):
+        key = self.make_key(url, params)
+        now = time.time()
+        old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        self.total_bytes += len(body) - (old[0] if old else 0)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, headers.get("ETag"), headers.get("Last-Modified"), now + self.ttl(url), now, len(body)),
+            )
+        self.evict()
+
+    def refresh(self, url, entry):
+        """Функция для продления TTL записи после ответа 304 Not Modified."""
+        entry.expires_at = time.time() + self.ttl(url)
+        with self.conn:
+            self.conn.execute("UPDATE responses SET expires_at = ? WHERE key = ?", (entry.expires_at, entry.key))
+
+    def evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if self.total_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self.total_bytes -= size
+        with self.conn:
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from urllib.parse import urlparse
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class CrawlMetrics:
+    """Метрики обхода: задержки запросов по ручкам, счётчики статусов, страницы и вакансии в секунду,
+    время ожидания (лимиты и откаты после 403) и время разворачивания JSON.
+
+    snapshot() отдаёт словарь, export() дописывает его JSON-строкой в path - по этим строкам видно,
+    во что упирается обход: в API, в ограничение частоты или во flatten.
+    """
+
+    def __init__(self, path=None, export_interval: float = 60):
+        self.path = path
+        self.export_interval = export_interval
+        self.started = time.monotonic()
+        self.exported = self.started
+        self.latencies = defaultdict(list)  # ручка -> задержки запросов, сек
+        self.statuses = Counter()  # HTTP-статус -> число ответов
+        self.pages = 0
+        self.vacancies = 0
+        self.sleep = Counter()  # причина ожидания -> сек
+        self.flatten_time = 0.0
+        self.flatten_rows = 0
+
+    def endpoint(self, url):
+        return urlparse(url).path.strip("/").split("/")[0]
+
+    def record_request(self, url, status, latency: float):
+        self.latencies[self.endpoint(url)].append(latency)
+        self.statuses[status] += 1
+
+    def record_page(self, items: int):
+        self.pages += 1
+        self.vacancies += items
+
+    def record_sleep(self, reason, seconds: float):
+        self.sleep[reason] += seconds
+
+    def record_flatten(self, rows: int, seconds: float):
+        self.flatten_rows += rows
+        self.flatten_time += seconds
+
+    def snapshot(self, **extra):
+        """Функция для текущего среза метрик. Выход - Dict, сериализуемый в JSON.
+        - extra: дополнительные поля (например, статистика кэша)."""
+        elapsed = time.monotonic() - self.started
+        latency = {}
+        for endpoint, values in self.latencies.items():
+            latency[endpoint] = {
+                "count": len(values),
+                "mean": sum(values) / len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": max(values),
+            }
+        return {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed": elapsed,
+            "requests": sum(self.statuses.values()),
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "latency": latency,
+            "pages": self.pages,
+            "vacancies": self.vacancies,
+            "pages_per_sec": self.pages / elapsed if elapsed else 0.0,
+            "vacancies_per_sec": self.vacancies / elapsed if elapsed else 0.0,
+            "sleep": dict(self.sleep),
+            "flatten": {
+                "rows": self.flatten_rows,
+                "seconds": self.flatten_time,
+                "rows_per_sec": self.flatten_rows / self.flatten_time if self.flatten_time else 0.0,
+            },
+            **extra,
+        }
+
+    def export(self, **extra):
+        """Функция для записи среза метрик строкой JSON в path (если он задан). Выход - срез."""
+        snapshot = self.snapshot(**extra)
+        self.exported = time.monotonic()
+        if self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot, ensure_ascii=False) + "\n")
+        return snapshot
+
+    def maybe_export(self, **extra):
+        """Функция для периодической выгрузки метрик во время долгого обхода (не чаще export_interval)."""
+        if self.path is not None and time.monotonic() - self.exported >= self.export_interval:
+            self.export(**extra)
+
+    def report(self, **extra):
+        """Функция для выгрузки итоговых метрик и их краткой печати."""
+        snapshot = self.export(**extra)
+        print(
+            f"Запросов: {snapshot['requests']} {snapshot['statuses']}, "
+            f"{snapshot['pages_per_sec']:.1f} стр/сек, {snapshot['vacancies_per_sec']:.1f} вакансий/сек"
+        )
+        for endpoint, latency in snapshot["latency"].items():
+            print(f"  /{endpoint}: p50 {latency['p50'] * 1000:.0f} мс, p95 {latency['p95'] * 1000:.0f} мс")
+        sleep = ", ".join(f"{reason} {seconds:.1f} сек" for reason, seconds in snapshot["sleep"].items())
+        print(f"  Ожидание: {sleep or 'нет'}; flatten: {snapshot['flatten']['seconds']:.2f} сек")
+        return snapshot
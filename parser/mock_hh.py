@@ -0,0 +1,218 @@
+"""Локальный mock API HH для офлайн-бенчмарка парсера.
+
+Отдаёт /vacancies, /areas и /metro по записанным ответам (load_payloads) или синтетическим вакансиям,
+с настраиваемой задержкой и долей ответов 403. Справочники /areas и /metro берутся из areas.json / metro.json
+рядом с payloads, а если их нет - строятся по самим вакансиям. GET /mock/stats - счётчики сервера.
+
+    python mock_hh.py --synthetic 50000 --latency 0.05 --forbidden-rate 0.01 --port 8080
+
+Парсер направляется на него через Parser(url="http://127.0.0.1:8080"); см. также benchmark_crawl.py.
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import math
+import os
+import random
+from collections import Counter
+
+from aiohttp import web
+from payloads import load_payloads, synthetic_vacancies
+from planner import RESULTS_CAP
+
+
+def build_areas(vacancies):
+    """Функция для справочника /areas по вакансиям: один корневой регион со всеми встреченными."""
+    areas = {vacancy["area"]["id"]: vacancy["area"]["name"] for vacancy in vacancies if vacancy.get("area")}
+    children = [
+        {"id": area_id, "parent_id": "113", "name": name, "areas": []} for area_id, name in sorted(areas.items())
+    ]
+    return [{"id": "113", "parent_id": None, "name": "Россия", "areas": children}]
+
+
+def build_metro(vacancies):
+    """Функция для справочника /metro по станциям, встреченным в адресах вакансий."""
+    cities = {}
+    for vacancy in vacancies:
+        address = vacancy.get("address") or {}
+        for station in address.get("metro_stations") or []:
+            city = cities.setdefault(vacancy["area"]["id"], {"name": vacancy["area"]["name"], "lines": {}})
+            line = city["lines"].setdefault(station["line_id"], {"name": station["line_name"], "stations": {}})
+            line["stations"][station["station_id"]] = station["station_name"]
+    return [
+        {
+            "id": city_id,
+            "name": city["name"],
+            "lines": [
+                {
+                    "id": line_id,
+                    "name": line["name"],
+                    "stations": [{"id": station_id, "name": name} for station_id, name in line["stations"].items()],
+                }
+                for line_id, line in city["lines"].items()
+            ],
+        }
+        for city_id, city in cities.items()
+    ]
+
+
+def area_descendants(areas, result=None):
+    """Функция для Dict area_id -> множество id региона и всех вложенных."""
+    result = {} if result is None else result
+    for area in areas:
+        area_descendants(area.get("areas") or [], result)
+        ids = {area["id"]}
+        for child in area.get("areas") or []:
+            ids |= result[child["id"]]
+        result[area["id"]] = ids
+    return result
+
+
+class MockHH:
+    """Mock API HH. Задержка каждого ответа ~ N(latency, jitter), доля forbidden_rate ответов /vacancies - 403.
+    Фильтры date_from/date_to, area (с вложенными регионами), metro и only_with_salary, пагинация
+    и ограничение глубины выдачи cap повторяют поведение HH."""
+
+    def __init__(
+        self,
+        vacancies,
+        areas=None,
+        metro=None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        forbidden_rate: float = 0.0,
+        cap: int = RESULTS_CAP,
+        seed: int = 12345,
+    ):
+        # Вакансии сортируются по published_at: окно date_from/date_to выбирается бинарным поиском
+        self.vacancies = sorted(vacancies, key=lambda vacancy: vacancy["published_at"][:19])
+        self.published = [vacancy["published_at"][:19] for vacancy in self.vacancies]
+        self.areas = areas if areas is not None else build_areas(self.vacancies)
+        self.metro = metro if metro is not None else build_metro(self.vacancies)
+        self.descendants = area_descendants(self.areas)
+        self.latency = latency
+        self.jitter = jitter
+        self.forbidden_rate = forbidden_rate
+        self.cap = cap
+        self.random = random.Random(seed)
+        self.stats = Counter()
+
+    async def delay(self):
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.random.gauss(self.latency, self.jitter)))
+
+    def forbidden(self):
+        return self.forbidden_rate and self.random.random() < self.forbidden_rate
+
+    def search(self, query):
+        start = bisect.bisect_left(self.published, query.get("date_from", "")[:19])
+        date_to = query.get("date_to")
+        end = bisect.bisect_right(self.published, date_to[:19]) if date_to else len(self.published)
+        window = self.vacancies[start:end]
+
+        if query.get("only_with_salary", "").lower() == "true":
+            window = [vacancy for vacancy in window if vacancy.get("salary")]
+        if query.get("area"):
+            area_ids = self.descendants.get(query["area"], {query["area"]})
+            window = [vacancy for vacancy in window if (vacancy.get("area") or {}).get("id") in area_ids]
+        if query.get("metro"):
+            window = [
+                vacancy
+                for vacancy in window
+                if any(
+                    station["station_id"] == query["metro"]
+                    for station in ((vacancy.get("address") or {}).get("metro_stations") or [])
+                )
+            ]
+        return window
+
+    async def vacancies_handler(self, request):
+        self.stats["/vacancies"] += 1
+        await self.delay()
+        if self.forbidden():
+            self.stats["403"] += 1
+            return web.json_response({"errors": [{"type": "forbidden"}]}, status=403)
+
+        page = int(request.query.get("page", 0))
+        per_page = int(request.query.get("per_page", 20))
+        # Как и HH, глубже cap вакансий по одному запросу выдача не листается
+        if (page + 1) * per_page > self.cap:
+            self.stats["400"] += 1
+            return web.json_response({"errors": [{"type": "bad_argument", "value": "page"}]}, status=400)
+
+        found = self.search(request.query)
+        self.stats["200"] += 1
+        return web.json_response(
+            {
+                "items": found[page * per_page : (page + 1) * per_page],
+                "found": len(found),
+                "pages": math.ceil(min(len(found), self.cap) / per_page),
+                "page": page,
+                "per_page": per_page,
+            }
+        )
+
+    def dictionary_handler(self, name):
+        async def handler(request):
+            self.stats[f"/{name}"] += 1
+            await self.delay()
+            self.stats["200"] += 1
+            return web.json_response(getattr(self, name))
+
+        return handler
+
+    async def stats_handler(self, request):
+        return web.json_response(dict(self.stats))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/vacancies", self.vacancies_handler)
+        app.router.add_get("/areas", self.dictionary_handler("areas"))
+        app.router.add_get("/metro", self.dictionary_handler("metro"))
+        app.router.add_get("/mock/stats", self.stats_handler)
+        return app
+
+
+def load_dictionary(payloads, name):
+    """Функция для загрузки записанного справочника name.json из директории payloads (если он есть)."""
+    if payloads is None or not os.path.isdir(payloads):
+        return None
+    path = os.path.join(payloads, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--payloads", help="SQLite фронтира, JSON-файл или директория с ответами /vacancies")
+    arg_parser.add_argument("--synthetic", type=int, default=50000, help="Число синтетических вакансий")
+    arg_parser.add_argument("--latency", type=float, default=0.0, help="Средняя задержка ответа, сек")
+    arg_parser.add_argument("--jitter", type=float, default=0.0, help="Стандартное отклонение задержки, сек")
+    arg_parser.add_argument("--forbidden-rate", type=float, default=0.0, help="Доля ответов 403 на /vacancies")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8080)
+    args = arg_parser.parse_args()
+
+    if args.payloads:
+        # В директории рядом с ответами /vacancies могут лежать areas.json и metro.json
+        vacancies = [vacancy for vacancy in load_payloads(args.payloads) if "published_at" in vacancy]
+    else:
+        vacancies = synthetic_vacancies(args.synthetic)
+    mock = MockHH(
+        vacancies,
+        areas=load_dictionary(args.payloads, "areas"),
+        metro=load_dictionary(args.payloads, "metro"),
+        latency=args.latency,
+        jitter=args.jitter,
+        forbidden_rate=args.forbidden_rate,
+    )
+    print(f"Mock HH: {len(mock.vacancies)} вакансий на http://{args.host}:{args.port}")
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
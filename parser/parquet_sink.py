@@ -0,0 +1,127 @@
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+def grow_schema(schema, other):
+    """Функция для расширения schema колонками и типами из other. Конфликты типов решаются в пользу строки."""
+    fields = {field.name: field for field in schema}
+    for field in other:
+        if field.name not in fields:
+            fields[field.name] = field
+            continue
+        try:
+            fields[field.name] = pa.unify_schemas(
+                [pa.schema([fields[field.name]]), pa.schema([field])], promote_options="permissive"
+            ).field(0)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+class ParquetSink:
+    """Потоковая запись вакансий в Parquet, партиционированный по дате публикации.
+
+    Вакансии копятся в буфере до batch_size, затем батч разворачивается в плоскую таблицу
+    и дописывается row group'ом в открытый файл своей партиции (published_date=YYYY-MM-DD).
+    Если в батче появились новые колонки, для партиции начинается новый файл с расширенной схемой,
+    а общая схема всех файлов сохраняется в _common_metadata. Память ограничена одним батчем.
+    """
+
+    def __init__(self, to_dataframe, root: str = "../dataset/vacancies", batch_size: int = 10000):
+        self.to_dataframe = to_dataframe
+        self.root = root
+        self.batch_size = batch_size
+        self.buffer = []
+        self.schema = pa.schema([])
+        self.writers = {}
+        self.parts = 0
+        self.rows = 0
+        os.makedirs(root, exist_ok=True)
+
+    def write(self, items):
+        for item in items:
+            self.buffer.append(item)
+            if len(self.buffer) >= self.batch_size:
+                self.flush()
+
+    def to_table(self, df):
+        columns = {}
+        for column in df.columns:
+            try:
+                columns[column] = pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Смешанные типы в колонке (например, число и строка) храним строкой
+                columns[column] = pa.array(
+                    df[column].where(df[column].isna(), df[column].astype(str)), from_pandas=True
+                )
+        return pa.table(columns)
+
+    def grow_schema(self, table):
+        """Функция для расширения общей схемы колонками и типами из table."""
+        self.schema = grow_schema(self.schema, table.schema)
+
+    def align(self, table, schema):
+        arrays = []
+        for field in schema:
+            if field.name in table.column_names:
+                arrays.append(table[field.name].cast(field.type, safe=False))
+            else:
+                arrays.append(pa.nulls(len(table), field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def flush(self):
+        if not self.buffer:
+            return
+        df = self.to_dataframe(self.buffer)
+        self.buffer = []
+
+        if "published_at" in df.columns:
+            dates = df["published_at"].fillna("unknown").astype(str).str[:10]
+        else:
+            dates = ["unknown"] * len(df)
+        table = self.to_table(df)
+        old_schema = self.schema
+        self.grow_schema(table)
+        table = self.align(table, self.schema)
+
+        for date in sorted(set(dates)):
+            part = table.filter(pa.array([value == date for value in dates]))
+            writer = self.writers.get(date)
+            if writer is None or self.schema != old_schema:
+                if writer is not None:
+                    writer.close()
+                writer = self.open_writer(date)
+            writer.write_table(part)
+            self.rows += len(part)
+
+        if self.schema != old_schema:
+            pq.write_metadata(self.schema, os.path.join(self.root, "_common_metadata"))
+
+    def open_writer(self, date):
+        path = os.path.join(self.root, f"published_date={date}")
+        os.makedirs(path, exist_ok=True)
+        writer = pq.ParquetWriter(os.path.join(path, f"part-{self.parts:05d}.parquet"), self.schema)
+        self.parts += 1
+        self.writers[date] = writer
+        return writer
+
+    def close(self):
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+        print(f"В {self.root} записано {self.rows} вакансий в {self.parts} файлах, {len(self.schema)} колонок.")
+        return self.root
+
+
+def read_vacancies(root: str = "../dataset/vacancies", columns=None, filter=None):
+    """Функция для колоночного чтения результата ParquetSink в DataFrame.
+    - columns: List[str] - читаются только нужные колонки;
+    - filter: pyarrow.compute.Expression, например ds.field("published_date") == "2024-11-20"."""
+    partitioning = ds.partitioning(pa.schema([("published_date", pa.string())]), flavor="hive")
+    schema = pq.read_schema(os.path.join(root, "_common_metadata")).append(pa.field("published_date", pa.string()))
+    dataset = ds.dataset(root, format="parquet", partitioning=partitioning, schema=schema)
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
@@ -1,27 +1,74 @@
 import os
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 
-import pandas as pd
 import requests
+from flatten import MODEL_COLUMNS, Flattener
+from frontier import CrawlFrontier
+from http_cache import HttpCache
+from metrics import CrawlMetrics
+from parquet_sink import ParquetSink
+from planner import QueryPlanner
+from seen_index import SeenIndex
 
 
 class Parser:
-    def __init__(self, url=None):
+    def __init__(
+        self,
+        url=None,
+        frontier_path=None,
+        adaptive: bool = False,
+        seen_index_path=None,
+        parquet_path=None,
+        columns=MODEL_COLUMNS,
+        cache_path=None,
+        metrics_path=None,
+    ):
         if url is None:
             self.url = "https://api.hh.ru"
         else:
             self.url = url
 
-    def get_vacancies_with_salary(self, date_from, date_to, area, metro, page: int = 0, per_page: int = 100):
-        """
-        Функция для парсинга вакансий с HH.
-            - page (int): номер страницы, с которой начинается парсинг (необходимо для обхода блокировки по лимиту);
-            - per_page (int): Количество вакансий на одной странице.
-        Выход - List Json-файлов с данными.
-        """
+        # Одна сессия на весь обход: соединения с API переиспользуются (keep-alive)
+        self.session = requests.Session()
+
+        # Если указан cache_path, ответы API кэшируются на диске и перепроверяются по ETag / Last-Modified
+        self.cache = None
+        if cache_path is not None:
+            self.cache = HttpCache(cache_path)
+
+        # Метрики обхода; если указан metrics_path, срезы пишутся туда строками JSON
+        self.metrics = CrawlMetrics(metrics_path)
 
-        params = {
+        # Схема путей ключей выучивается один раз и переиспользуется между вызовами json_list_to_dataframe.
+        # По умолчанию извлекаются только колонки, нужные модели; columns=None - все колонки
+        self.flattener = Flattener(columns=columns)
+
+        # Если указан путь к фронтиру, прогресс обхода сохраняется в SQLite и переживает перезапуск
+        self.frontier = None
+        if frontier_path is not None:
+            self.frontier = CrawlFrontier(frontier_path)
+
+        # adaptive=True - окна по датам делятся планировщиком, вместо перебора регион x метро
+        self.adaptive = adaptive
+        self.planner = None
+
+        # Индекс виденных вакансий и водяных знаков для инкрементального режима
+        self.seen_index = None
+        if seen_index_path is not None:
+            self.seen_index = SeenIndex(seen_index_path)
+
+        # Если указан parquet_path, вакансии не копятся в памяти, а потоково пишутся в Parquet
+        self.sink = None
+        if parquet_path is not None:
+            self.sink = ParquetSink(self.json_list_to_dataframe, root=parquet_path)
+
+        # Единицы работы последнего обхода, прерванные ошибкой сервера или сети
+        self.failed_units = []
+
+    def vacancies_params(self, date_from, date_to, area, metro, page: int = 0, per_page: int = 100):
+        """Функция для формирования параметров запроса к ручке /vacancies."""
+        return {
             "text": "",  # Параметр запроса поиска. Пусто, чтобы смотреть все ваки
             "page": page,  # Номер страницы, стандарт = 0
             "per_page": per_page,  # Количество ваков на одной стр
@@ -31,46 +78,59 @@ class Parser:
             "area": area,
             "metro": metro,
         }
-        response = requests.get(self.url + "/vacancies", params=params)
 
+    def get_vacancies_with_salary(self, date_from, date_to, area, metro, page: int = 0, per_page: int = 100):
+        """
+        Функция для парсинга вакансий с HH.
+            - page (int): номер страницы, с которой начинается парсинг (необходимо для обхода блокировки по лимиту);
+            - per_page (int): Количество вакансий на одной странице.
+        Выход - List Json-файлов с данными.
+        """
+
+        params = self.vacancies_params(date_from, date_to, area, metro, page=page, per_page=per_page)
+        return self.http_get("/vacancies", params=params)
+
+    def http_get(self, path, params=None):
+        """Функция для GET-запроса к API через дисковый кэш (если он включён).
+        Выход - (json | None, status)."""
+        url = self.url + path
+        entry = None
+        headers = {}
+        if self.cache is not None:
+            entry = self.cache.lookup(url, params)
+            if entry is not None and entry.fresh:
+                self.cache.hits += 1
+                return entry.json(), 200
+            headers = self.cache.conditional_headers(entry)
+
+        start = time.perf_counter()
+        response = self.session.get(url, params=params, headers=headers)
+        self.metrics.record_request(url, response.status_code, time.perf_counter() - start)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated += 1
+            self.cache.refresh(url, entry)
+            return entry.json(), 200
         if response.status_code == 200:
-            vacancies = response.json()
-            return vacancies, response.status_code
-        else:
-            return None, response.status_code
+            if self.cache is not None:
+                self.cache.misses += 1
+                self.cache.store(url, params, response.content, response.headers)
+            return response.json(), response.status_code
+        return None, response.status_code
 
     def json_list_to_dataframe(self, json_list):
-        def flatten(json_object, prefix=""):
-            flat_dict = {}
-            for key, value in json_object.items():
-                if isinstance(value, dict):
-                    # Если это словарь, вызываем flatten рекурсивно
-                    flat_dict.update(flatten(value, prefix + key + "_"))
-                elif isinstance(value, list):
-                    # Если это список, обрабатываем каждый элемент
-                    for i, item in enumerate(value):
-                        if isinstance(item, dict):
-                            # Обрабатываем вложенные словари
-                            flat_dict.update(flatten(item, prefix + key + f"_{i}_"))
-                        else:
-                            # Обработка неисков в списке (меньше встречается в данном контексте)
-                            flat_dict[prefix + key + f"_{i}"] = item
-                else:
-                    # Базовый случай, добавляем значение в плоский словарь
-                    flat_dict[prefix + key] = value
-            return flat_dict
-
-        flat_list = [flatten(item) for item in json_list]
-        df = pd.DataFrame(flat_list)
+        """Функция для разворачивания списка вакансий в плоский DataFrame (вложенные ключи через "_")."""
+        start = time.perf_counter()
+        df = self.flattener.to_dataframe(json_list)
+        self.metrics.record_flatten(len(json_list), time.perf_counter() - start)
         return df
 
     def get_openapi_fields(self, handle):
         """Функция для получения всех возможных полей по ручке handle.
         - handle: str"""
 
-        response = requests.get(f"{self.url}/{handle}")
-        if response.status_code == 200:
-            data = response.json()
+        data, status = self.http_get(f"/{handle}")
+        if status == 200:
             return data
         else:
             print("Ошибка при запросе справочника")
@@ -97,7 +157,13 @@ class Parser:
 
         return metro_dict
 
-    def __call__(self, month_from: int, month_to: int, day_from: int, day_to: int):
+    def iter_window_units(self, windows):
+        """Генератор единиц работы (date_from, date_to, area, metro) для окон [(start, end), ...]."""
+        if self.adaptive:
+            self.planner = QueryPlanner(self)
+            yield from self.planner(windows)
+            return
+
         # Спарсим наименования всех регионов поиска
         areas_data = self.get_openapi_fields("areas")
         area_names = self.extract_area_names(areas_data)
@@ -107,50 +173,25 @@ class Parser:
         metro_dict = self.extract_metro_data(metro_data)
         metro_areas = set(metro_dict.keys())
 
-        # Парсинг данных
-        vacancies_list = []
-        current_vac_counter = 0
-        sleep_time = 20
+        for start, end in windows:
+            date_from = start.isoformat()
+            date_to = (end - timedelta(seconds=1)).isoformat()
+            for area in area_names:
+                metro_values = metro_areas if area in metro_areas else [""]
+                for metro in metro_values:
+                    yield date_from, date_to, area, metro
 
-        for month in range(month_from, month_to):
-            for day in range(day_from, day_to):
-                print(f"Парсинг {day}/{month}/{day}...")
-                for area in area_names:
-                    metro_values = metro_areas if area in metro_areas else [""]
-                    for metro in metro_values:
-                        current_page = 0
-
-                        while True:
-                            date_from = datetime(2024, month, day).isoformat()
-                            date_to = datetime(2024, month, day, 23, 59, 59).isoformat()
-
-                            data, status = self.get_vacancies_with_salary(
-                                page=current_page, date_from=date_from, date_to=date_to, area=area, metro=metro
-                            )
-
-                            if status == 400:
-                                if current_page != 0:
-                                    print(f"Парсинг данных на {date_from}, {area}, metro: {metro} завершён.")
-                                    print(f"Добыта информация из {current_page} страниц!")
-                                    print()
-                                    break
-                            elif status == 403:
-                                print(f"Парсинг прекращён по причине блокировки. Откат: {sleep_time} сек.")
-                                time.sleep(sleep_time)
-                                continue
-
-                            if data:
-                                for vacancy in data["items"]:
-                                    vacancies_list.append(vacancy)
-                                current_page += 1
-                            else:
-                                break
-
-                            if len(vacancies_list) == current_vac_counter:
-                                break
-                            else:
-                                current_vac_counter = len(vacancies_list)
+    def iter_work_units(self, month_from: int, month_to: int, day_from: int, day_to: int):
+        """Генератор единиц работы (date_from, date_to, area, metro) в порядке обхода __call__."""
+        windows = [
+            (datetime(2024, month, day), datetime(2024, month, day) + timedelta(days=1))
+            for month in range(month_from, month_to)
+            for day in range(day_from, day_to)
+        ]
+        return self.iter_window_units(windows)
 
+    def save_dataframe(self, vacancies_list, path: str = "../dataset/vacancies.csv"):
+        """Функция для преобразования собранных вакансий в DataFrame и сохранения в path."""
         print("\nПарсинг завершен.")
         print()
         print("*" * 70)
@@ -163,8 +204,163 @@ class Parser:
         print(f"Было найдено {df.shape[0]} вакансий с появлением {df.duplicated().sum()} строк-дубликатов.")
         print(f"В каждой вакансии {df.shape[1]} переменных.")
 
-        if not os.path.exists("../dataset"):
-            os.makedirs("../dataset")
-        df.to_csv("../dataset/vacancies.csv", index=False)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        df.to_csv(path, index=False)
 
         return df
+
+    def pending_work_units(self, work_units):
+        """Функция для получения единиц работы с учётом фронтира: завершённые единицы пропускаются."""
+        if self.frontier is None:
+            return work_units
+
+        self.frontier.add_units(work_units)
+        print(f"Состояние фронтира: {self.frontier.progress()}")
+        return self.frontier.pending_units()
+
+    def ingest_page(self, items):
+        """Функция для приёма страницы вакансий: в инкрементальном режиме уже виденные вакансии отбрасываются."""
+        if self.seen_index is None:
+            return items
+        return self.seen_index.filter_new(items)
+
+    def accept_page(self, vacancies_list, items):
+        """Функция для приёма страницы без фронтира: в Parquet-режиме страница сразу уходит в sink."""
+        if self.sink is not None:
+            self.sink.write(items)
+        else:
+            vacancies_list.extend(items)
+
+    def collect_vacancies(self, work_units, vacancies_list):
+        """Функция для сборки результата обхода. С фронтиром вакансии берутся из него,
+        в Parquet-режиме дописываются в sink, и результатом будет None."""
+        if self.frontier is not None:
+            vacancies_list = self.frontier.iter_vacancies(work_units)
+            if self.sink is None:
+                return list(vacancies_list)
+            self.sink.write(vacancies_list)
+        if self.sink is not None:
+            return None
+        return vacancies_list
+
+    def save_result(self, vacancies_list, path: str = "../dataset/vacancies.csv"):
+        """Функция для сохранения результата: CSV по path либо закрытие Parquet sink (выход - путь к датасету)."""
+        if self.cache is not None:
+            print(f"Кэш ответов API: {self.cache.stats()}")
+        if self.sink is not None:
+            result = self.sink.close()
+        else:
+            result = self.save_dataframe(vacancies_list, path=path)
+        self.metrics.report(**self.metrics_extra())
+        return result
+
+    def metrics_extra(self):
+        """Функция для дополнительных полей среза метрик (статистика кэша)."""
+        return {"cache": self.cache.stats()} if self.cache is not None else {}
+
+    def crawl_units(self, work_units):
+        """Функция для последовательного обхода единиц работы. Выход - List вакансий."""
+        work_units = list(work_units)
+        vacancies_list = []
+        self.failed_units = []
+        sleep_time = 20
+        current_date = None
+
+        for date_from, date_to, area, metro in self.pending_work_units(work_units):
+            if date_from[:10] != current_date:
+                current_date = date_from[:10]
+                print(f"Парсинг {current_date}...")
+            current_page = 0
+            if self.frontier is not None:
+                done_pages = self.frontier.done_pages(date_from, area, metro)
+                current_page = max(done_pages) + 1 if done_pages else 0
+
+            while True:
+                data, status = self.get_vacancies_with_salary(
+                    page=current_page, date_from=date_from, date_to=date_to, area=area, metro=metro
+                )
+
+                if status == 400:
+                    if current_page != 0:
+                        print(f"Парсинг данных на {date_from}, {area}, metro: {metro} завершён.")
+                        print(f"Добыта информация из {current_page} страниц!")
+                        print()
+                        break
+                elif status == 403:
+                    print(f"Парсинг прекращён по причине блокировки. Откат: {sleep_time} сек.")
+                    time.sleep(sleep_time)
+                    self.metrics.record_sleep("403", sleep_time)
+                    continue
+
+                if data:
+                    self.metrics.record_page(len(data["items"]))
+                    items = self.ingest_page(data["items"])
+                    if self.frontier is not None:
+                        self.frontier.commit_page(date_from, area, metro, current_page, items, pages=data.get("pages"))
+                    else:
+                        self.accept_page(vacancies_list, items)
+                    current_page += 1
+                else:
+                    break
+
+                # Пустая страница - выдача по единице работы закончилась
+                if not data["items"]:
+                    break
+
+            # Единицы, прерванные ошибкой сервера, остаются pending и будут дообработаны при перезапуске
+            if status not in (200, 400):
+                self.failed_units.append((date_from, date_to, area, metro))
+            elif self.frontier is not None:
+                self.frontier.finish_unit(date_from, area, metro)
+            self.metrics.maybe_export(**self.metrics_extra())
+
+        return self.collect_vacancies(work_units, vacancies_list)
+
+    def incremental(
+        self, date_from: datetime = None, date_to: datetime = None, overlap: timedelta = timedelta(hours=1)
+    ):
+        """Функция для инкрементального (дельта) парсинга.
+        Окно начинается с водяного знака published_at последнего успешного запуска (с запасом overlap),
+        уже виденные вакансии отбрасываются при приёме. Дельта сохраняется в ../dataset/delta_<date_to>.csv.
+            - date_from (datetime): начало окна для первого запуска, когда водяного знака ещё нет;
+            - date_to (datetime): конец окна, по умолчанию - текущее время.
+        """
+        if self.seen_index is None:
+            raise ValueError("Для инкрементального парсинга нужно указать seen_index_path")
+
+        watermark = self.seen_index.watermark()
+        if watermark is not None:
+            date_from = watermark - overlap
+        elif date_from is None:
+            raise ValueError("Водяной знак ещё не сохранён, укажите date_from для первого запуска")
+        date_to = date_to or datetime.now().replace(microsecond=0)
+        print(f"Инкрементальный парсинг {date_from.isoformat()} - {date_to.isoformat()}...")
+
+        windows = []
+        current = date_from
+        while current < date_to:
+            windows.append((current, min(current + timedelta(days=1), date_to)))
+            current += timedelta(days=1)
+
+        work_units = list(self.iter_window_units(windows))
+        vacancies_list = self.crawl_units(work_units)
+        result = self.save_result(vacancies_list, path=f"../dataset/delta_{date_to.strftime('%Y%m%dT%H%M%S')}.csv")
+
+        # В Parquet-режиме списка нет: с фронтиром вакансии перечитываются из него, иначе индекс помнит их сам
+        if vacancies_list is None and self.frontier is not None:
+            vacancies_list = self.frontier.iter_vacancies(work_units)
+
+        # Водяной знак не уходит дальше начала самой ранней недообработанной единицы: следующий запуск её повторит
+        until = min((datetime.fromisoformat(unit[0]) for unit in self.failed_units), default=None)
+        if until is not None:
+            print(
+                f"{len(self.failed_units)} единиц работы прервано ошибкой, водяной знак не дальше {until.isoformat()}"
+            )
+        self.seen_index.finish_run(date_from, date_to, vacancies_list, until=until)
+        return result
+
+    def __call__(self, month_from: int, month_to: int, day_from: int, day_to: int):
+        # Парсинг данных
+        vacancies_list = self.crawl_units(self.iter_work_units(month_from, month_to, day_from, day_to))
+        return self.save_result(vacancies_list)
@@ -0,0 +1,161 @@
+import glob
+import json
+import os
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+AREAS = [("1", "Москва"), ("2", "Санкт-Петербург"), ("3", "Екатеринбург"), ("4", "Новосибирск"), ("88", "Казань")]
+METRO = [("Сокольническая", "Сокольники"), ("Кольцевая", "Курская"), ("Арбатско-Покровская", "Бауманская")]
+CURRENCIES = ["RUR", "RUR", "RUR", "USD", "KZT"]
+NAMES = ["Менеджер по продажам", "Программист Python", "Курьер", "Бухгалтер", "Водитель", "Продавец-консультант"]
+SCHEDULES = [("fullDay", "Полный день"), ("shift", "Сменный график"), ("remote", "Удаленная работа")]
+
+
+def load_payloads(path):
+    """Функция для загрузки записанных ответов HH. Выход - List вакансий.
+    - path: SQLite-файл фронтира (CrawlFrontier), JSON-файл ответа /vacancies (или списка вакансий)
+      либо директория с такими JSON-файлами."""
+    if os.path.isdir(path):
+        return [vacancy for file in sorted(glob.glob(os.path.join(path, "*.json"))) for vacancy in load_payloads(file)]
+
+    if path.endswith((".sqlite", ".db")):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT items FROM pages ORDER BY rowid").fetchall()
+        conn.close()
+        return [vacancy for (items,) in rows for vacancy in json.loads(items)]
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return data["items"] if isinstance(data, dict) else data
+
+
+def synthetic_vacancies(n: int, seed: int = 12345):
+    """Функция для генерации n вакансий в формате ответа /vacancies (когда записанных ответов под рукой нет).
+    Набор полей, вложенность и доля пропусков повторяют реальную выдачу HH."""
+    rng = random.Random(seed)
+    start = datetime(2024, 11, 1)
+    vacancies = []
+    for i in range(n):
+        area_id, area_name = rng.choice(AREAS)
+        salary_from = rng.choice([None, rng.randrange(20000, 200000, 1000)])
+        salary_to = (
+            rng.randrange(salary_from or 30000, 400000, 1000) if salary_from is None or rng.random() < 0.5 else None
+        )
+        published = start + timedelta(minutes=rng.randrange(60 * 24 * 30))
+        stations = [
+            {
+                "station_name": station,
+                "line_name": line,
+                "station_id": f"{j + 1}.{j}",
+                "line_id": str(j + 1),
+                "lat": 55.7,
+                "lng": 37.6,
+            }
+            for j, (line, station) in enumerate(rng.sample(METRO, rng.randint(0, len(METRO))))
+        ]
+        address = None
+        if rng.random() < 0.6:
+            address = {
+                "city": area_name,
+                "street": "улица Ленина",
+                "building": str(rng.randint(1, 100)),
+                "lat": 55.75,
+                "lng": 37.62,
+                "description": None,
+                "raw": f"{area_name}, улица Ленина",
+                "metro": stations[0] if stations else None,
+                "metro_stations": stations,
+                "id": str(rng.randint(1, 10**7)),
+            }
+        schedule_id, schedule_name = rng.choice(SCHEDULES)
+        vacancy = {
+            "id": str(90000000 + i),
+            "premium": rng.random() < 0.05,
+            "name": rng.choice(NAMES),
+            "department": {"id": "dep-1", "name": "Розница"} if rng.random() < 0.1 else None,
+            "has_test": rng.random() < 0.1,
+            "response_letter_required": rng.random() < 0.1,
+            "area": {"id": area_id, "name": area_name, "url": f"https://api.hh.ru/areas/{area_id}"},
+            "salary": {
+                "from": salary_from,
+                "to": salary_to,
+                "currency": rng.choice(CURRENCIES),
+                "gross": rng.random() < 0.5,
+            },
+            "type": {"id": "open", "name": "Открытая"},
+            "address": address,
+            "response_url": None,
+            "sort_point_distance": None,
+            "published_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300"),
+            "created_at": published.strftime("%Y-%m-%dT%H:%M:%S+0300"),
+            "archived": False,
+            "apply_alternate_url": f"https://hh.ru/applicant/vacancy_response?vacancyId={90000000 + i}",
+            "branding": {"type": "CONSTRUCTOR", "tariff": "BASIC"} if rng.random() < 0.05 else None,
+            "show_logo_in_search": rng.choice([None, True]),
+            "insider_interview": {"id": "1", "url": "https://hh.ru/interview/1"} if rng.random() < 0.01 else None,
+            "url": f"https://api.hh.ru/vacancies/{90000000 + i}?host=hh.ru",
+            "alternate_url": f"https://hh.ru/vacancy/{90000000 + i}",
+            "relations": [],
+            "employer": {
+                "id": str(rng.randint(1, 50000)),
+                "name": f"ООО Работодатель {rng.randint(1, 5000)}",
+                "url": "https://api.hh.ru/employers/1",
+                "alternate_url": "https://hh.ru/employer/1",
+                "logo_urls": {
+                    "original": "https://img.hhcdn.ru/1.png",
+                    "90": "https://img.hhcdn.ru/90.png",
+                    "240": "https://img.hhcdn.ru/240.png",
+                }
+                if rng.random() < 0.7
+                else None,
+                "vacancies_url": "https://api.hh.ru/vacancies?employer_id=1",
+                "accredited_it_employer": rng.random() < 0.1,
+                "trusted": rng.random() < 0.9,
+            },
+            "snippet": {
+                "requirement": "Опыт работы от 1 года. Ответственность." if rng.random() < 0.95 else None,
+                "responsibility": "Работа с клиентами, ведение отчётности.",
+            },
+            "contacts": None,
+            "schedule": {"id": schedule_id, "name": schedule_name},
+            "working_days": [{"id": "only_saturday_and_sunday", "name": "По субботам и воскресеньям"}]
+            if rng.random() < 0.05
+            else [],
+            "working_time_intervals": [
+                {"id": "from_four_to_six_hours_in_a_day", "name": "Можно сменами по 4-6 часов в день"}
+            ]
+            if rng.random() < 0.05
+            else [],
+            "working_time_modes": [{"id": "start_after_sixteen", "name": "С началом дня после 16:00"}]
+            if rng.random() < 0.05
+            else [],
+            "accept_temporary": rng.random() < 0.2,
+            "professional_roles": [{"id": str(rng.randint(1, 170)), "name": rng.choice(NAMES)}],
+            "accept_incomplete_resumes": rng.random() < 0.3,
+            "experience": {"id": "between1And3", "name": "От 1 года до 3 лет"},
+            "employment": {"id": "full", "name": "Полная занятость"},
+            "adv_response_url": None,
+            "is_adv_vacancy": False,
+            "adv_context": None,
+        }
+        if rng.random() < 0.05:
+            vacancy["brand_snippet"] = {
+                "logo": None,
+                "logo_xs": None,
+                "logo_scalable": None,
+                "picture": None,
+                "picture_xs": None,
+                "picture_scalable": None,
+                "background": {
+                    "color": "#ffffff" if rng.random() < 0.5 else None,
+                    "gradient": {
+                        "angle": 90,
+                        "color_list": [{"position": 0, "color": "#000000"}, {"position": 100, "color": "#ffffff"}],
+                    }
+                    if rng.random() < 0.5
+                    else None,
+                },
+            }
+        vacancies.append(vacancy)
+    return vacancies
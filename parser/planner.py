@@ -0,0 +1,161 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+# Поиск HH отдаёт не больше 2000 вакансий (20 страниц по 100) на один запрос
+RESULTS_CAP = 2000
+PER_PAGE = 100
+
+SPLIT_STEPS = [timedelta(days=1), timedelta(hours=1), timedelta(minutes=1)]
+
+
+class QueryPlanner:
+    """Планировщик запросов: вместо перебора всех регионов и станций метро рекурсивно
+    делит окно date_from/date_to (день -> час -> минута), а по регионам - только если
+    даже минутное окно содержит больше RESULTS_CAP вакансий.
+
+    Выход - список единиц работы (date_from, date_to, area, metro) в формате Parser.iter_work_units.
+
+    Окно, число вакансий в котором не удалось узнать (5xx, сетевые ошибки), не отбрасывается и не делится:
+    оно обходится целиком одной единицей работы. Деление при недоступном API умножило бы число
+    неудачных пробных запросов вплоть до минутных окон.
+    """
+
+    def __init__(
+        self,
+        parser,
+        cap: int = RESULTS_CAP,
+        per_page: int = PER_PAGE,
+        sleep_time: int = 20,
+        max_retries: int = 3,
+        backoff: float = 2.0,
+    ):
+        self.parser = parser
+        self.cap = cap
+        self.per_page = per_page
+        self.sleep_time = sleep_time
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.area_children = {}
+        self.probes = 0
+        self.planned_pages = 0
+        self.unknown_windows = 0
+
+    def found(self, start: datetime, end: datetime, area):
+        """Функция для получения числа найденных вакансий в окне [start, end) по региону.
+        Ошибки сервера и сети повторяются с откатом; выход - None, если после max_retries попыток
+        число так и не получено."""
+        attempt = 0
+        while True:
+            try:
+                data, status = self.parser.get_vacancies_with_salary(
+                    date_from=start.isoformat(),
+                    date_to=(end - timedelta(seconds=1)).isoformat(),
+                    area=area,
+                    metro="",
+                    page=0,
+                    per_page=1,
+                )
+            except requests.RequestException as e:
+                print(f"Сетевая ошибка при планировании: {type(e).__name__} {e}")
+                data, status = None, None
+            self.probes += 1
+            if status == 403:
+                print(f"Планирование прекращено по причине блокировки. Откат: {self.sleep_time} сек.")
+                time.sleep(self.sleep_time)
+                self.parser.metrics.record_sleep("403", self.sleep_time)
+                continue
+            if status == 200 and data is not None:
+                return data["found"]
+
+            attempt += 1
+            if attempt >= self.max_retries:
+                print(f"Число вакансий в окне {start.isoformat()}, {area} не получено (статус {status}).")
+                self.unknown_windows += 1
+                return None
+            delay = self.backoff * 2 ** (attempt - 1)
+            time.sleep(delay)
+            self.parser.metrics.record_sleep("retry", delay)
+
+    def split_window(self, start: datetime, end: datetime):
+        """Функция для деления окна на следующий по мелкости шаг. Выход - None, если делить уже некуда."""
+        for step in SPLIT_STEPS:
+            if end - start > step:
+                windows = []
+                current = start
+                while current < end:
+                    windows.append((current, min(current + step, end)))
+                    current += step
+                return windows
+        return None
+
+    def plan_window(self, start: datetime, end: datetime, area=""):
+        found = self.found(start, end, area)
+        if found == 0:
+            return []
+        if found is None:
+            # Окно обходится целиком, а ошибки обхода оставят его незавершённым во фронтире
+            print(f"Окно {start.isoformat()}, {area} будет обойдено без оценки числа вакансий.")
+            self.planned_pages += 1
+            return [(start.isoformat(), (end - timedelta(seconds=1)).isoformat(), area, "")]
+        if found <= self.cap:
+            self.planned_pages += math.ceil(found / self.per_page)
+            return [(start.isoformat(), (end - timedelta(seconds=1)).isoformat(), area, "")]
+
+        # Больше cap: окно делится, по более мелким окнам запросы повторяются
+        windows = self.split_window(start, end)
+        if windows is not None:
+            return [unit for window in windows for unit in self.plan_window(*window, area)]
+
+        children = self.area_children.get(area, [])
+        if children:
+            return [unit for child in children for unit in self.plan_window(start, end, child)]
+
+        print(f"В окне {start.isoformat()}, {area} найдено {found} вакансий, будет получено только {self.cap}.")
+        self.planned_pages += math.ceil(self.cap / self.per_page)
+        return [(start.isoformat(), (end - timedelta(seconds=1)).isoformat(), area, "")]
+
+    def exhaustive_requests(self, days: int, areas_data, metro_data) -> int:
+        """Функция для оценки числа запросов при полном переборе регион x метро (минимум один на единицу)."""
+        area_names = self.parser.extract_area_names(areas_data)
+        metro_dict = self.parser.extract_metro_data(metro_data)
+        units_per_day = sum(len(metro_dict[area]) if area in metro_dict else 1 for area in area_names)
+        return days * units_per_day
+
+    def __call__(self, windows):
+        """Функция для планирования списка окон [(start, end), ...]."""
+        areas_data = self.parser.get_openapi_fields("areas")
+        metro_data = self.parser.get_openapi_fields("metro")
+
+        # Дерево регионов: "" (весь поиск) -> страны -> регионы -> города
+        self.area_children = {"": [area["id"] for area in areas_data]}
+        stack = list(areas_data)
+        while stack:
+            area = stack.pop()
+            self.area_children[area["id"]] = [child["id"] for child in area.get("areas") or []]
+            stack.extend(area.get("areas") or [])
+
+        self.probes = 0
+        self.planned_pages = 0
+        self.unknown_windows = 0
+        units = [unit for start, end in windows for unit in self.plan_window(start, end)]
+
+        days = sum(math.ceil((end - start) / timedelta(days=1)) for start, end in windows)
+        planned = self.probes + self.planned_pages
+        exhaustive = self.exhaustive_requests(days, areas_data, metro_data)
+        self.report = {
+            "units": len(units),
+            "probe_requests": self.probes,
+            "page_requests": self.planned_pages,
+            "planned_requests": planned,
+            "exhaustive_requests": exhaustive,
+            "saved_requests": exhaustive - planned,
+            "unknown_windows": self.unknown_windows,
+        }
+        print(
+            f"План: {len(units)} единиц работы, {planned} запросов вместо {exhaustive} "
+            f"при полном переборе (экономия {exhaustive - planned})."
+        )
+        return units
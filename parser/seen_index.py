@@ -0,0 +1,93 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# Даты в запросах к HH указываются по московскому времени
+MSK = timezone(timedelta(hours=3))
+
+
+def parse_published_at(value: str) -> str:
+    """Функция для приведения published_at HH (2024-11-20T12:34:56+0300) к наивному ISO по МСК."""
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z").astimezone(MSK).replace(tzinfo=None).isoformat()
+
+
+class SeenIndex:
+    """Персистентный индекс виденных вакансий (id -> published_at) и водяных знаков успешных запусков в SQLite."""
+
+    def __init__(self, path: str = "../dataset/seen_index.sqlite"):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS seen (
+                id TEXT PRIMARY KEY,
+                published_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                date_from TEXT NOT NULL,
+                date_to TEXT NOT NULL,
+                watermark TEXT,
+                vacancies INTEGER NOT NULL,
+                finished_at TEXT NOT NULL
+            );
+            """
+        )
+        self.conn.commit()
+        # id -> published_at вакансий, принятых в текущем запуске (в индекс попадают только после finish_run)
+        self.pending = {}
+
+    def watermark(self):
+        """Функция для получения водяного знака published_at последнего запуска (или None).
+        Берётся знак именно последнего запуска: после сбоя он может оказаться раньше предыдущего."""
+        row = self.conn.execute("SELECT watermark FROM runs ORDER BY rowid DESC LIMIT 1").fetchone()
+        return datetime.fromisoformat(row[0]) if row and row[0] else None
+
+    def seen_ids(self, ids):
+        seen = set()
+        ids = list(ids)
+        # SQLite ограничивает число параметров в одном запросе
+        for i in range(0, len(ids), 900):
+            chunk = ids[i : i + 900]
+            placeholders = ", ".join("?" * len(chunk))
+            seen.update(row[0] for row in self.conn.execute(f"SELECT id FROM seen WHERE id IN ({placeholders})", chunk))
+        return seen
+
+    def filter_new(self, items):
+        """Функция для отбрасывания уже виденных вакансий (в прошлых запусках и ранее в текущем)."""
+        seen = self.seen_ids(item["id"] for item in items)
+        new_items = []
+        for item in items:
+            if item["id"] not in seen and item["id"] not in self.pending:
+                self.pending[item["id"]] = item["published_at"]
+                new_items.append(item)
+        return new_items
+
+    def finish_run(self, date_from: datetime, date_to: datetime, vacancies_list=None, until: datetime = None):
+        """Функция для фиксации запуска: вакансии попадают в индекс, водяной знак сдвигается.
+        Если vacancies_list не передан, фиксируются вакансии, принятые через filter_new.
+        Если передан until (начало самой ранней единицы работы, прерванной ошибкой), знак не сдвигается дальше него."""
+        if vacancies_list is None:
+            rows = [(vacancy_id, parse_published_at(value)) for vacancy_id, value in self.pending.items()]
+        else:
+            rows = [(item["id"], parse_published_at(item["published_at"])) for item in vacancies_list]
+        watermark = max((published_at for _, published_at in rows), default=None)
+        watermark = watermark or (self.watermark() or date_to).isoformat()
+        if until is not None:
+            watermark = min(watermark, until.isoformat())
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (id, published_at) VALUES (?, ?)", rows)
+            self.conn.execute(
+                "INSERT INTO runs (date_from, date_to, watermark, vacancies, finished_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    date_from.isoformat(),
+                    date_to.isoformat(),
+                    watermark,
+                    len(rows),
+                    datetime.now().isoformat(),
+                ),
+            )
+        self.pending.clear()
+
+    def close(self):
+        self.conn.close()
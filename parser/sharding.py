@@ -0,0 +1,266 @@
+"""Шардированный обход HH несколькими процессами / машинами с общей файловой системой.
+
+Координатор раскладывает единицы работы по шардам (дата x регион) в очередь - директорию
+lease-файлов. Воркеры атомарно (rename) берут шард в аренду, парсят его, пишут свою часть
+в output/part-<shard>.parquet и отмечают шард выполненным. Аренда продлевается после каждой
+единицы работы; просроченные аренды (упавший воркер) возвращаются в очередь. Шард, часть единиц
+работы которого завершилась ошибкой HTTP, не отмечается выполненным: его аренда истекает, и шард
+обходит заново любой воркер. Шаг merge склеивает части в один файл, удаляя дубликаты по id вакансии.
+
+    python sharding.py plan --queue ../dataset/queue 11 12 1 31
+    python sharding.py worker --queue ../dataset/queue --output ../dataset/parts --processes 4
+    python sharding.py merge --output ../dataset/parts --result ../dataset/vacancies.parquet
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from parser import Parser
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from async_parser import AsyncParser
+from parquet_sink import grow_schema
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+
+
+class LeaseQueue:
+    """Очередь шардов в виде директории lease-файлов: pending/ -> leased/ -> done/."""
+
+    def __init__(self, root: str = "../dataset/queue", lease_timeout: float = 600):
+        self.root = root
+        self.lease_timeout = lease_timeout
+        for state in (PENDING, LEASED, DONE):
+            os.makedirs(os.path.join(root, state), exist_ok=True)
+
+    def path(self, state, shard_id):
+        return os.path.join(self.root, state, f"{shard_id}.json")
+
+    def put(self, shard_id, work_units):
+        if any(os.path.exists(self.path(state, shard_id)) for state in (PENDING, LEASED, DONE)):
+            return False
+        tmp_path = os.path.join(self.root, f".{shard_id}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(work_units, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path(PENDING, shard_id))
+        return True
+
+    def lease(self):
+        """Функция для аренды следующего шарда. Выход - (shard_id, work_units) или None, если очередь пуста."""
+        for _ in range(2):
+            for path in sorted(glob.glob(os.path.join(self.root, PENDING, "*.json"))):
+                shard_id = os.path.basename(path)[: -len(".json")]
+                try:
+                    # rename атомарен: шард достанется ровно одному воркеру
+                    os.rename(path, self.path(LEASED, shard_id))
+                except FileNotFoundError:
+                    continue
+                # Просроченный по mtime файл мог успеть вернуть в очередь другой воркер
+                if not self.heartbeat(shard_id):
+                    continue
+                with open(self.path(LEASED, shard_id), encoding="utf-8") as f:
+                    return shard_id, [tuple(unit) for unit in json.load(f)]
+            if not self.reclaim_expired():
+                return None
+        return None
+
+    def heartbeat(self, shard_id):
+        """Функция для продления аренды шарда. Выход - False, если аренда просрочена и шард возвращён в очередь."""
+        try:
+            os.utime(self.path(LEASED, shard_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def complete(self, shard_id):
+        """Функция для отметки шарда выполненным. Выход - False, если аренда просрочена и шард возвращён в очередь."""
+        try:
+            os.rename(self.path(LEASED, shard_id), self.path(DONE, shard_id))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def reclaim_expired(self):
+        """Функция для возврата в очередь шардов, аренда которых просрочена. Выход - число возвращённых шардов."""
+        reclaimed = 0
+        now = time.time()
+        for path in glob.glob(os.path.join(self.root, LEASED, "*.json")):
+            try:
+                if now - os.path.getmtime(path) < self.lease_timeout:
+                    continue
+                os.rename(path, os.path.join(self.root, PENDING, os.path.basename(path)))
+                reclaimed += 1
+            except FileNotFoundError:
+                continue
+        return reclaimed
+
+    def progress(self):
+        return {state: len(glob.glob(os.path.join(self.root, state, "*.json"))) for state in (PENDING, LEASED, DONE)}
+
+
+def plan(queue, parser, month_from: int, month_to: int, day_from: int, day_to: int):
+    """Координатор: раскладывает единицы работы парсера по шардам день x регион.
+    Повторный запуск не дублирует шарды, уже стоящие в очереди или выполненные."""
+    shards = {}
+    for unit in parser.iter_work_units(month_from, month_to, day_from, day_to):
+        date_from, _, area, _ = unit
+        # Имя региона может содержать пробелы и слэши, поэтому в имени файла - его хэш
+        area_key = hashlib.sha1(area.encode("utf-8")).hexdigest()[:12]
+        shards.setdefault(f"{date_from[:10]}_{area_key}", []).append(unit)
+
+    added = sum(queue.put(shard_id, units) for shard_id, units in shards.items())
+    print(f"В очередь добавлено {added} шардов: {queue.progress()}")
+
+
+def keep_alive(queue, shard_id, stop, lost):
+    while not stop.wait(queue.lease_timeout / 3):
+        if not queue.heartbeat(shard_id):
+            lost.set()
+            return
+
+
+def work(queue, output_dir: str, parser):
+    """Воркер: берёт шарды в аренду, пока очередь не опустеет, и пишет по части Parquet на шард."""
+    os.makedirs(output_dir, exist_ok=True)
+    worker_id = f"{socket.gethostname()}-{os.getpid()}"
+    shards = 0
+    while True:
+        leased = queue.lease()
+        if leased is None:
+            break
+        shard_id, work_units = leased
+
+        # Аренда продлевается в фоне, пока шард парсится
+        stop = threading.Event()
+        lost = threading.Event()
+        heartbeat = threading.Thread(target=keep_alive, args=(queue, shard_id, stop, lost), daemon=True)
+        heartbeat.start()
+        try:
+            vacancies_list = parser.crawl_units(work_units)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        # Шард с потерянной арендой уже отдан другому воркеру: результат отбрасывается
+        if lost.is_set() or not queue.heartbeat(shard_id):
+            print(f"[{worker_id}] Аренда шарда {shard_id} просрочена, результат отброшен")
+            continue
+
+        if parser.failed_units:
+            # Аренда больше не продлевается: по её истечении шард вернётся в очередь целиком
+            print(
+                f"[{worker_id}] Шард {shard_id}: {len(parser.failed_units)} единиц работы с ошибками, "
+                f"шард будет обойден повторно после истечения аренды"
+            )
+            continue
+
+        df = parser.json_list_to_dataframe(vacancies_list)
+        # Часть пишется под временным именем и переименовывается: повторная обработка шарда её просто перезапишет
+        tmp_path = os.path.join(output_dir, f".part-{shard_id}.{worker_id}.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(output_dir, f"part-{shard_id}.parquet"))
+        if not queue.complete(shard_id):
+            # Часть того же шарда перезапишет другой воркер, дубликаты отбросит merge
+            print(f"[{worker_id}] Аренда шарда {shard_id} просрочена до завершения, шард обработает другой воркер")
+            continue
+        shards += 1
+        print(f"[{worker_id}] Шард {shard_id}: {len(df)} вакансий. Очередь: {queue.progress()}")
+    print(f"[{worker_id}] Очередь пуста, обработано шардов: {shards}")
+
+
+def merge(output_dir: str, result_path: str, key: str = "id"):
+    """Функция для склейки частей в один Parquet с удалением дубликатов по key. Части читаются по одной.
+    Схемы частей объединяются как в ParquetSink: при конфликте типов (например, колонка из одних NaN в одной части
+    и строки в другой) колонка хранится строкой."""
+    paths = sorted(glob.glob(os.path.join(output_dir, "part-*.parquet")))
+    if not paths:
+        raise FileNotFoundError(f"В {output_dir} нет частей part-*.parquet")
+    schema = pa.schema([])
+    for path in paths:
+        schema = grow_schema(schema, pq.read_schema(path).remove_metadata())
+
+    seen = set()
+    rows = total = 0
+    with pq.ParquetWriter(result_path, schema) as writer:
+        for path in paths:
+            table = pq.read_table(path)
+            ids = table[key].to_pylist()
+            total += len(ids)
+            mask = []
+            for vacancy_id in ids:
+                mask.append(vacancy_id not in seen)
+                seen.add(vacancy_id)
+            table = table.filter(pa.array(mask, type=pa.bool_()))
+            columns = [
+                table[field.name].cast(field.type)
+                if field.name in table.column_names
+                else pa.nulls(len(table), field.type)
+                for field in schema
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            rows += len(table)
+    print(f"Склеено {len(paths)} частей: {rows} уникальных вакансий из {total}.")
+    return result_path
+
+
+def _run_worker(queue_root, output_dir, lease_timeout, parser_kwargs, use_async):
+    parser_class = AsyncParser if use_async else Parser
+    work(LeaseQueue(queue_root, lease_timeout), output_dir, parser_class(**parser_kwargs))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--url", default=None)
+    arg_parser.add_argument("--queue", default="../dataset/queue")
+    arg_parser.add_argument("--lease-timeout", type=float, default=600)
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = commands.add_parser("plan")
+    plan_parser.add_argument("--adaptive", action="store_true")
+    for name in ("month_from", "month_to", "day_from", "day_to"):
+        plan_parser.add_argument(name, type=int)
+
+    worker_parser = commands.add_parser("worker")
+    worker_parser.add_argument("--output", default="../dataset/parts")
+    worker_parser.add_argument("--processes", type=int, default=1)
+    worker_parser.add_argument("--use-async", action="store_true")
+    worker_parser.add_argument("--cache", default=None, help="Путь к HttpCache (на воркер добавляется суффикс)")
+
+    merge_parser = commands.add_parser("merge")
+    merge_parser.add_argument("--output", default="../dataset/parts")
+    merge_parser.add_argument("--result", default="../dataset/vacancies.parquet")
+
+    args = arg_parser.parse_args()
+    queue = LeaseQueue(args.queue, args.lease_timeout)
+
+    if args.command == "plan":
+        parser = Parser(args.url, adaptive=args.adaptive)
+        plan(queue, parser, args.month_from, args.month_to, args.day_from, args.day_to)
+    elif args.command == "worker":
+        processes = []
+        for i in range(args.processes):
+            parser_kwargs = {"url": args.url}
+            if args.cache:
+                parser_kwargs["cache_path"] = f"{args.cache}.{socket.gethostname()}.{i}"
+            process = multiprocessing.Process(
+                target=_run_worker, args=(args.queue, args.output, args.lease_timeout, parser_kwargs, args.use_async)
+            )
+            process.start()
+            processes.append(process)
+        for process in processes:
+            process.join()
+    else:
+        merge(args.output, args.result)
+
+
+if __name__ == "__main__":
+    main()
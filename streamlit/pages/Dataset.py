@@ -3,7 +3,7 @@ import os
 
 import pandas as pd
 import streamlit as st
-from utils import get_dataFrame, send_csv_to_backend, set_logo_md, FASTAPI_HOST, headers
+from utils import get_dataFrame, get_profile, send_file_to_backend, set_logo_md, FASTAPI_HOST, headers
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,8 @@ if st.button("Использовать наш датасет"):
     file_path = os.path.abspath(".") + "/base_datassets/final_data_converted.csv"
 
     df = pd.read_csv(file_path)
-    send_csv_to_backend(df)
+    with open(file_path, "rb") as f:
+        send_file_to_backend(f, os.path.basename(file_path), df)
 
 st.subheader("Загрузка CSV файла на сервер")
 
@@ -42,7 +43,7 @@ if uploaded_file is not None:
     st.write("Первые 5 строк вашего файла:")
     st.write(df.head())
     if st.button("Отправить файл на сервер"):
-        send_csv_to_backend(df)
+        send_file_to_backend(uploaded_file, uploaded_file.name, df)
 
 if not st.session_state.df.empty:
     df = st.session_state.df
@@ -54,14 +55,39 @@ if not st.session_state.df.empty:
     st.write("Датасет:")
     st.dataframe(df)
 
-    # Информация о датасете
-    st.write("Информация о датасете:")
-    st.write(df.info())
-
-    # Статистика
-    st.write("Описательная статистика:")
-    st.write(df.describe())
-
-    # Пропущенные значения
-    st.write("Пропущенные значения в датасете:")
-    st.write(df.isnull().sum())
+    profile = get_profile()
+    if profile is not None:
+        columns_info = pd.DataFrame(profile["columns"]).set_index("name")
+
+        # Информация о датасете
+        st.write("Информация о датасете:")
+        st.write(
+            f"Строк: {profile['rows']}, колонок: {len(columns_info)}, "
+            f"память: {profile['memory_bytes'] / 2**20:.1f} MB"
+        )
+        st.dataframe(columns_info[["dtype", "nunique"]])
+
+        # Статистика
+        st.write("Описательная статистика:")
+        describe = profile["describe"]
+        if describe["data"]:
+            st.write(pd.DataFrame(describe["data"], columns=describe["columns"]).set_index("column").T)
+
+        # Пропущенные значения
+        st.write("Пропущенные значения в датасете:")
+        st.write(columns_info["nulls"])
+
+        # Частые значения категориальных признаков
+        if profile["top_values"]:
+            st.write("Самые частые значения категориальных признаков:")
+            column = st.selectbox("Признак", list(profile["top_values"]))
+            st.write(pd.DataFrame(profile["top_values"][column], columns=[column, "Количество"]))
+
+        # Гистограммы зарплат
+        for name, hist in profile["histograms"].items():
+            st.write(f"Распределение {name}:")
+            edges = hist["edges"]
+            centers = [round((left + right) / 2) for left, right in zip(edges[:-1], edges[1:])]
+            st.bar_chart(pd.DataFrame({"Количество": hist["counts"]}, index=centers))
+    else:
+        st.warning("Профиль датасета недоступен")
@@ -6,11 +6,20 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import plotly.express as px
+import requests
 import seaborn as sns
 import streamlit as st
 from scipy import stats
 from scipy.stats import kruskal, kstest
-from utils import get_dataFrame, send_csv_to_backend, set_logo_md, FASTAPI_HOST, headers
+from utils import (
+    aggregate,
+    aggregate_or_local,
+    get_dataset_info,
+    query_cached,
+    query_dataframe,
+    send_file_to_backend,
+    set_logo_md,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -18,31 +27,68 @@ st.set_page_config(page_title="Аналитика и EDA", page_icon="", layout=
 
 set_logo_md()
 
-if "df" not in st.session_state:
-    get_dataFrame()
+# Колонки, которые строят разделы страницы ниже: датасет целиком не загружается, только они
+EDA_COLUMNS = [
+    "salary",
+    "premium",
+    "has_test",
+    "area_name",
+    "address_city",
+    "address_metro_station_name",
+    "address_metro_line_name",
+    "employer_accredited_it_employer",
+    "schedule_name",
+    "professional_roles_0_name",
+    "experience_name",
+    "employment_name",
+]
+
+dataset = get_dataset_info()
 
 logger.info("EDA page successfully opened")
 
 st.title("ℹ️ EDA Page")
 st.write("Это страница 'Аналитики и EDA'.")
 
-if not st.session_state.df.empty:
+if dataset is not None:
     logger.info("Datasset isn't empty on server")
-    init_df = st.session_state.df
-    st.write("Датасет")
-    st.write(init_df.head())
-
-    if "salary" in init_df.columns:
-        min_salary, max_salary = st.sidebar.slider(
-            "Выберите диапазон зарплат:",
-            int(init_df["salary"].min()),
-            int(init_df["salary"].max()),
-            (int(init_df["salary"].min()), int(init_df["salary"].max())),
-        )
+    dataset_id = dataset["dataset_id"]
+    columns = dataset["columns"]
+
+    def load_rows(names):
+        # Строки выбранного диапазона зарплат, только колонки names
+        try:
+            return query_cached(dataset_id, list(dict.fromkeys(names)), salary_filters)
+        except requests.exceptions.RequestException as e:
+            st.error(f"Ошибка соединения с API: {e}")
+            logger.error(f"An error was received when loading the dataset rows: {e}")
+            st.stop()
+
+    try:
+        st.write("Датасет")
+        st.write(query_dataframe(limit=5, dataset_id=dataset_id)[0])
+
+        # Те же фильтры передаются в /query и /aggregate: строки и статистики берутся по выбранному диапазону
+        salary_filters = []
+        if "salary" in columns:
+            # Границы слайдера считаются на сервере
+            bounds = aggregate(
+                [{"column": "salary", "func": "min"}, {"column": "salary", "func": "max"}], dataset_id=dataset_id
+            )
+            salary_min, salary_max = int(bounds.loc[0, "salary_min"]), int(bounds.loc[0, "salary_max"])
+            min_salary, max_salary = st.sidebar.slider(
+                "Выберите диапазон зарплат:", salary_min, salary_max, (salary_min, salary_max)
+            )
+            if (min_salary, max_salary) != (salary_min, salary_max):
+                salary_filters = [{"column": "salary", "op": "between", "value": [min_salary, max_salary]}]
+    except requests.exceptions.RequestException as e:
+        st.error(f"Ошибка соединения с API: {e}")
+        logger.error(f"An error was received when receiving the dataset summary: {e}")
+        st.stop()
 
-        df = init_df[(init_df["salary"] >= min_salary) & (init_df["salary"] <= max_salary)]
-    else:
-        df = init_df
+    df = load_rows([column for column in EDA_COLUMNS if column in columns])
+    if salary_filters:
+        st.sidebar.write(f"Вакансий в диапазоне: {len(df)}")
 
     # Настройки графиков
     color_palette = st.sidebar.selectbox(
@@ -59,8 +105,8 @@ if not st.session_state.df.empty:
     st.header("Постройте свой график")
     st.write("Выберите свой столбец и тип графика и постройте свой уникальный график")
     # Выбор колонок для графика
-    x_col = st.selectbox("Выберите колонку для оси X", df.columns, index=0)
-    y_col = st.selectbox("Выберите колонку для оси Y", df.columns, index=1)
+    x_col = st.selectbox("Выберите колонку для оси X", columns, index=0)
+    y_col = st.selectbox("Выберите колонку для оси Y", columns, index=1)
 
     # Выбор типа графика
     chart_type = st.selectbox("Выберите тип графика", ["Линейный", "Столбчатый", "Диаграмма рассеяния"])
@@ -69,15 +115,16 @@ if not st.session_state.df.empty:
     color = st.color_picker("Выберите цвет графика", "#3498db")
 
     if x_col and y_col:
+        chart_df = load_rows([x_col, y_col])
         # Построение графика
         fig_your_plot, ax_your_plot = plt.subplots(figsize=(fig_width, fig_height))
 
         if chart_type == "Линейный":
-            ax_your_plot.plot(df[x_col], df[y_col], color=color, label=f"{y_col} vs {x_col}")
+            ax_your_plot.plot(chart_df[x_col], chart_df[y_col], color=color, label=f"{y_col} vs {x_col}")
         elif chart_type == "Столбчатый":
-            ax_your_plot.bar(df[x_col], df[y_col], color=color, label=f"{y_col} vs {x_col}")
+            ax_your_plot.bar(chart_df[x_col], chart_df[y_col], color=color, label=f"{y_col} vs {x_col}")
         elif chart_type == "Диаграмма рассеяния":
-            ax_your_plot.scatter(df[x_col], df[y_col], color=color, label=f"{y_col} vs {x_col}")
+            ax_your_plot.scatter(chart_df[x_col], chart_df[y_col], color=color, label=f"{y_col} vs {x_col}")
 
         # Настройки графика
         ax_your_plot.set_title(f"{chart_type} график")
@@ -90,53 +137,57 @@ if not st.session_state.df.empty:
 
         st.subheader("Диаграмма разброса (Plotly)")
         color = st.color_picker("Выберите цвет точек", "#636EFA")  # Цвет для точек
-        fig_scatter = px.scatter(df, x=x_col, y=y_col, color_discrete_sequence=[color])
+        fig_scatter = px.scatter(chart_df, x=x_col, y=y_col, color_discrete_sequence=[color])
         st.plotly_chart(fig_scatter)
 
         st.subheader("Линейный график (Altair)")
         chart_type = st.radio("Тип линейного графика", ["Обычный", "Шаговый", "Область"])
         if chart_type == "Обычный":
-            line_chart = alt.Chart(df).mark_line().encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
+            line_chart = alt.Chart(chart_df).mark_line().encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
         elif chart_type == "Шаговый":
             line_chart = (
-                alt.Chart(df).mark_line(interpolate="step-after").encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
+                alt.Chart(chart_df).mark_line(interpolate="step-after").encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
             )
         else:  # Область
-            line_chart = alt.Chart(df).mark_area().encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
+            line_chart = alt.Chart(chart_df).mark_area().encode(x=x_col, y=y_col, tooltip=[x_col, y_col])
         st.altair_chart(line_chart, use_container_width=True)
 
         st.subheader("Гистограмма (Plotly)")
         bins = st.slider("Количество интервалов (бинов)", min_value=5, max_value=50, value=20)
-        fig_hist = px.histogram(df, x=x_col, nbins=bins, color_discrete_sequence=[color])
+        fig_hist = px.histogram(chart_df, x=x_col, nbins=bins, color_discrete_sequence=[color])
         st.plotly_chart(fig_hist)
 
         st.subheader("Парные диаграммы (Plotly)")
-        selected_columns = st.multiselect("Выберите колонки для анализа", df.columns, default=df.columns[:3])
+        selected_columns = st.multiselect("Выберите колонки для анализа", columns, default=columns[:3])
         if selected_columns:
-            fig_pair = px.scatter_matrix(df, dimensions=selected_columns, color_discrete_sequence=[color])
+            fig_pair = px.scatter_matrix(
+                load_rows(selected_columns), dimensions=selected_columns, color_discrete_sequence=[color]
+            )
             st.plotly_chart(fig_pair)
 
         st.subheader("Коробчатая диаграмма (Plotly)")
-        fig_box = px.box(df, x=x_col, y=y_col, color_discrete_sequence=[color])
+        fig_box = px.box(chart_df, x=x_col, y=y_col, color_discrete_sequence=[color])
         st.plotly_chart(fig_box)
 
-    if "salary" not in df.columns:
+    if "salary" not in columns:
         st.error(
             "В датасете нет столбца 'salary'. Пожалуйста, загрузите корректный файл. Или воспользуйтесь построением своего графика из вашего датасета"
         )
     else:
         st.subheader("Постройте свой график, но с нашим датасетом")
         chart_type = st.selectbox("Выберите тип графика", options=["Scatterplot", "Boxplot", "Barplot"])
-        columns = [col for col in df.columns if col != "Зарплата"]
-        selected_column = st.selectbox("Выберите столбец для анализа", options=columns)
+        selected_column = st.selectbox(
+            "Выберите столбец для анализа", options=[col for col in columns if col != "Зарплата"]
+        )
         st.subheader(f"График: {chart_type} - Зарплата vs {selected_column}")
+        salary_df = load_rows([selected_column, "salary"])
 
         if chart_type == "Scatterplot":
-            sns.scatterplot(data=df, x=selected_column, y="salary", palette=color_palette, ax=ax)
+            sns.scatterplot(data=salary_df, x=selected_column, y="salary", palette=color_palette, ax=ax)
         elif chart_type == "Boxplot":
-            sns.boxplot(data=df, x=selected_column, y="salary", palette=color_palette, ax=ax)
+            sns.boxplot(data=salary_df, x=selected_column, y="salary", palette=color_palette, ax=ax)
         elif chart_type == "Barplot":
-            sns.barplot(data=df, x=selected_column, y="salary", palette=color_palette, ax=ax)
+            sns.barplot(data=salary_df, x=selected_column, y="salary", palette=color_palette, ax=ax)
 
         st.pyplot(fig)
 
@@ -145,8 +196,13 @@ if not st.session_state.df.empty:
 
         fig, ax = plt.subplots(1, 3, figsize=(fig_width, fig_height))
 
-        Q1 = df["salary"].quantile(0.25)
-        Q3 = df["salary"].quantile(0.75)
+        quartiles = aggregate_or_local(
+            df,
+            [{"column": "salary", "func": "quantile", "q": 0.25}, {"column": "salary", "func": "quantile", "q": 0.75}],
+            filters=salary_filters,
+        )
+        Q1 = quartiles.loc[0, "salary_q0.25"]
+        Q3 = quartiles.loc[0, "salary_q0.75"]
         IQR = Q3 - Q1
 
         df_iqr = df[(df["salary"] >= Q1 - 1.5 * IQR) & (df["salary"] <= Q3 + 1.5 * IQR)]
@@ -202,18 +258,28 @@ if not st.session_state.df.empty:
         st.write(df["premium"].isnull().sum())
         st.write("Уникальные значения")
         st.write(df["premium"].unique())
-        premium_counts = df["premium"].value_counts()
+        # Статистики по группам считаются на сервере, сюда приходят только маленькие таблицы
+        premium_stats = aggregate_or_local(
+            df,
+            [{"func": "size"}, {"column": "salary", "func": "describe"}],
+            group_by=["premium"],
+            filters=salary_filters,
+        ).set_index("premium")
+        premium_counts = premium_stats["size"].sort_values(ascending=False).rename("count")
         st.write(premium_counts)
 
-        premium_salary_stats = df.groupby("premium")["salary"].describe()
+        premium_salary_stats = premium_stats.drop(columns="size")
+        premium_salary_stats.columns = [column.removeprefix("salary_") for column in premium_salary_stats.columns]
         st.write(premium_salary_stats)
 
-        average_salary_premium = df.groupby("premium")["salary"].mean()
+        average_salary_premium = premium_salary_stats["mean"].rename("salary")
         st.write(average_salary_premium)
 
-        mean_salary_by_premium = df.groupby("premium")["salary"].mean().reset_index()
+        mean_salary_by_premium = average_salary_premium.reset_index()
 
-        overall_mean_salary = df["salary"].mean()
+        overall_mean_salary = aggregate_or_local(
+            df, [{"column": "salary", "func": "mean"}], filters=salary_filters
+        ).loc[0, "salary_mean"]
 
         mean_salary_by_premium["difference_from_overall"] = mean_salary_by_premium["salary"] - overall_mean_salary
 
@@ -307,20 +373,27 @@ if not st.session_state.df.empty:
 
         st.write("Уникальные населённые пункты:")
         st.write(df["area_name"].unique())
+        area_stats = aggregate_or_local(
+            df,
+            [{"func": "size"}]
+            + [{"column": "salary", "func": func} for func in ["mean", "median", "min", "max", "std"]],
+            group_by=["area_name"],
+            filters=salary_filters,
+        ).set_index("area_name")
+        city_counts = area_stats["size"].sort_values(ascending=False).rename("count")
         with st.expander("Количество записей по каждому населенному пункту:"):
-            st.write(df["area_name"].value_counts())
+            st.write(city_counts)
 
-        salary_summary = df.groupby("area_name")["salary"].agg(["mean", "median", "min", "max", "std"])
+        salary_summary = area_stats.drop(columns="size")
+        salary_summary.columns = [column.removeprefix("salary_") for column in salary_summary.columns]
         st.write("Статистика по зарплатам:")
         st.write(salary_summary)
 
-        city_counts = df["area_name"].value_counts()
-
         cities_with_enough_data = city_counts[city_counts > 2000].index
 
-        filtered_df = df[df["area_name"].isin(cities_with_enough_data)]
+        average_salary_by_city = salary_summary.loc[cities_with_enough_data, "mean"].rename("salary")
 
-        mean_salary_by_city = filtered_df.groupby("area_name")["salary"].mean().sort_values()
+        mean_salary_by_city = average_salary_by_city.sort_values()
 
         fig_area_name1, ax_area_name1 = plt.subplots(figsize=(fig_width, fig_height))
         mean_salary_by_city.plot(kind="barh", color=plt_color, ax=ax_area_name1)
@@ -329,9 +402,9 @@ if not st.session_state.df.empty:
         ax_area_name1.set_ylabel("Населённый пункт")
         st.pyplot(fig_area_name1)
 
-        average_salary_by_city = filtered_df.groupby("area_name")["salary"].mean()
-
-        overall_average_salary = df["salary"].mean()
+        overall_average_salary = aggregate_or_local(
+            df, [{"column": "salary", "func": "mean"}], filters=salary_filters
+        ).loc[0, "salary_mean"]
 
         deviation = average_salary_by_city - overall_average_salary
 
@@ -1049,7 +1122,8 @@ else:
 
         # Чтение файла
         df = pd.read_csv(file_path)
-        send_csv_to_backend(df)
+        with open(file_path, "rb") as f:
+            send_file_to_backend(f, os.path.basename(file_path), df)
 
     st.subheader("Загрузка CSV файла на сервер")
 
@@ -1061,4 +1135,4 @@ else:
         st.write("Первые 5 строк вашего файла:")
         st.write(df.head())
         if st.button("Отправить файл на сервер"):
-            send_csv_to_backend(df)
+            send_file_to_backend(uploaded_file, uploaded_file.name, df)
@@ -1,34 +1,126 @@
 import json
 import logging
+import time
+
+import pandas as pd
 import requests
 import streamlit as st
-from utils import FASTAPI_HOST
+from utils import DATASET_ID, FASTAPI_HOST
 
 logger = logging.getLogger(__name__)
 
 st.set_page_config(page_title="Модель", page_icon="", layout="wide")
 
 st.title("Страница модели")
-tab1, tab2, tab3 = st.tabs(["✏️ Создание", "📁 Информация", "❌ Удаление"])
+tab1, tab2, tab3, tab4 = st.tabs(["✏️ Создание", "📁 Информация", "❌ Удаление", "🔍 Подбор гиперпараметров"])
 
 
-def train_model(model_id, model_name, hyperparameters):
+def train_model(model_id, model_name, hyperparameters, cv=None):
     logger.info(f"Starting model training")
     param = {
         "model_id": model_id,
         "model_name": model_name,
         "hyperparameters": hyperparameters,
+        "cv": cv,
     }
-    response = requests.post(f"{FASTAPI_HOST}/train_model", json=param)
+    response = requests.post(f"{FASTAPI_HOST}/train_model", params={"dataset_id": DATASET_ID}, json=param)
     if response.status_code == 200:
-        logger.info(f"The model has been successfully trained")
-        st.success(f"Модель {model_name} успешно обучена!")
-        st.json(response.json())
+        job = response.json()
+        logger.info(f"Training job {job['job_id']} submitted")
+        st.session_state.training_job = job["job_id"]
     else:
         logger.error(f"Error when training the model ")
         st.error(f"Ошибка: {response.status_code}, {response.text}")
 
 
+def search_hyperparameters(search):
+    logger.info(f"Starting hyperparameter search")
+    response = requests.post(f"{FASTAPI_HOST}/search_hyperparameters", params={"dataset_id": DATASET_ID}, json=search)
+    if response.status_code == 200:
+        job = response.json()
+        logger.info(f"Search job {job['job_id']} submitted")
+        st.session_state.search_job = job["job_id"]
+    else:
+        logger.error(f"Error when starting the hyperparameter search")
+        st.error(f"Ошибка: {response.status_code}, {response.text}")
+
+
+def show_trials(job, container):
+    # Испытания уже отсортированы: лучшие конфигурации первыми
+    trials = pd.DataFrame(
+        [
+            {
+                "model_id": trial["model_id"],
+                "status": trial["status"],
+                "rung": trial["rung"],
+                "iterations": trial["iterations"],
+                "validation_rmse": trial["validation_rmse"],
+                **(trial["metrics"] or {}),
+                **trial["hyperparameters"],
+                "error": trial["error"],
+            }
+            for trial in job["trials"]
+        ]
+    )
+    container.dataframe(trials)
+    leaders = [trial["model_id"] for trial in job["trials"] if trial["model_id"]][:5]
+    if leaders:
+        container.write(f"Лучшие модели для сравнения кривых обучения: {', '.join(leaders)}")
+
+
+def cancel_training(job_id):
+    logger.info(f"Cancelling training job {job_id}")
+    response = requests.delete(f"{FASTAPI_HOST}/jobs/{job_id}")
+    if response.status_code != 200:
+        logger.error(f"Error cancelling the training job")
+        st.error(f"Ошибка: {response.status_code}, {response.text}")
+
+
+def wait_for_training(job_id, container, session_key="training_job"):
+    # Обучение идет на сервере в фоне, здесь только опрашиваем статус задачи
+    statuses = {"queued": "В очереди", "running": "Обучение"}
+    progress_bar = container.progress(0.0, text="Обучение модели")
+    while True:
+        response = requests.get(f"{FASTAPI_HOST}/jobs/{job_id}")
+        if response.status_code != 200:
+            logger.error(f"Error when getting the training job status")
+            container.error(f"Ошибка: {response.status_code}, {response.text}")
+            break
+        job = response.json()
+        if job["status"] not in statuses:
+            break
+        elapsed = job["elapsed"] or 0
+        progress_bar.progress(
+            job["progress"], text=f"{statuses[job['status']]}: {job['progress']:.0%}, {elapsed:.0f} с"
+        )
+        time.sleep(1)
+    del st.session_state[session_key]
+    progress_bar.empty()
+
+    if response.status_code != 200:
+        return
+    if job["status"] == "completed":
+        logger.info(f"The model has been successfully trained")
+        container.success(f"Модель {job['model_name']} успешно обучена за {job['elapsed']:.0f} с!")
+        if job["warning"]:
+            logger.warning(f"Training job {job_id} warning: {job['warning']}")
+            container.warning(job["warning"])
+        if job["trials"] is not None:
+            show_trials(job, container)
+        elif job["folds"] is not None:
+            container.json({"id": job["model_id"], "name": job["model_name"], "metrics": job["metrics"]})
+            folds = [{"repeat": fold["repeat"], "fold": fold["fold"], **fold["metrics"]} for fold in job["folds"]]
+            container.dataframe(pd.DataFrame(folds))
+        else:
+            container.json({"id": job["model_id"], "name": job["model_name"], "metrics": job["metrics"]})
+    elif job["status"] == "cancelled":
+        logger.info(f"Training job {job_id} cancelled")
+        container.warning("Обучение отменено")
+    else:
+        logger.error(f"Error when training the model: {job['error']}")
+        container.error(f"Ошибка: {job['error']}")
+
+
 def get_model_info(model_id):
     logger.info(f"Getting information about the model {model_id}")
     response = requests.get(f"{FASTAPI_HOST}/get_model_info/{model_id}")
@@ -82,11 +174,19 @@ with tab1:
     container = st.container(border=True)
     model_id = container.text_input("ID модели", key=1)
     model_name = container.text_input("Название модели", key=2)
-    hyperparameters = container.text_area(
-        "Гиперпараметры", value='{"n_estimators": 100, "random_state": 123}'
-    )
+    hyperparameters = container.text_area("Гиперпараметры", value='{"n_estimators": 100, "random_state": 123}')
+    cv = None
+    if container.checkbox("Кросс-валидация"):
+        cv = {
+            "folds": container.number_input("Количество фолдов", min_value=2, max_value=20, value=5),
+            "repeats": container.number_input("Количество повторов", min_value=1, max_value=10, value=1),
+        }
     if container.button("Обучить"):
-        train_model(model_id, model_name, json.loads(hyperparameters))
+        train_model(model_id, model_name, json.loads(hyperparameters), cv)
+    if "training_job" in st.session_state:
+        if container.button("Отменить обучение"):
+            cancel_training(st.session_state.training_job)
+        wait_for_training(st.session_state.training_job, container)
 
 with tab2:
     st.write("Просмотр информации о модели")
@@ -120,3 +220,39 @@ with tab3:
     elif option == "Все":
         if st.button("Удалить все модели"):
             delete_all_models()
+
+with tab4:
+    st.write("Подбор гиперпараметров: все конфигурации обучаются на одной матрице признаков параллельно")
+    container = st.container(border=True)
+    search_id = container.text_input("Префикс ID моделей", key=4)
+    search_name = container.text_input("Название моделей", key=5)
+    strategy = container.selectbox(
+        "Стратегия",
+        ("grid", "random", "halving"),
+        format_func={"grid": "Сетка", "random": "Случайный поиск", "halving": "Successive halving"}.get,
+    )
+    space = container.text_area(
+        "Пространство поиска",
+        value='{"depth": [4, 6, 8], "learning_rate": {"low": 0.01, "high": 0.3, "log": true}}'
+        if strategy != "grid"
+        else '{"depth": [4, 6, 8], "learning_rate": [0.03, 0.1]}',
+    )
+    fixed_hyperparameters = container.text_area("Фиксированные гиперпараметры", value='{"iterations": 500}')
+    n_trials = container.number_input("Количество конфигураций", min_value=1, value=20, disabled=strategy == "grid")
+    parallel = container.number_input("Параллельных обучений (0 - по числу ядер)", min_value=0, value=0)
+    if container.button("Запустить подбор"):
+        search_hyperparameters(
+            {
+                "model_id": search_id,
+                "model_name": search_name,
+                "strategy": strategy,
+                "space": json.loads(space),
+                "hyperparameters": json.loads(fixed_hyperparameters),
+                "n_trials": None if strategy == "grid" else n_trials,
+                "parallel": parallel or None,
+            }
+        )
+    if "search_job" in st.session_state:
+        if container.button("Отменить подбор"):
+            cancel_training(st.session_state.search_job)
+        wait_for_training(st.session_state.search_job, container, "search_job")
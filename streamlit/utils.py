@@ -1,11 +1,14 @@
 import base64
+import hashlib
+import json
 import logging
 import os
-import pickle
 
 import pandas as pd
+import pyarrow as pa
 import requests
 import streamlit as st
+import zstandard
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +19,13 @@ if running_in_docker:
 else:
     FASTAPI_HOST = "http://127.0.0.1:8000/"
 headers = {"Content-Type": "application/octet-stream", "User-Agent": "*"}
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+UPLOAD_CHUNK_SIZE = 8 * 2**20
+UPLOAD_RETRIES = 3
+# /query results kept per Streamlit session
+QUERY_CACHE_ENTRIES = 8
+# Named dataset on the API the app works with; "name@version" pins a specific version
+DATASET_ID = os.getenv("DATASET_ID", "default")
 
 
 def set_logo_md():
@@ -53,45 +63,257 @@ def set_logo_md():
     )
 
 
-def send_csv_to_backend(data_frame):
-    logger.info("Call send_csv_to_backend function")
-    api_url = FASTAPI_HOST + "upload_dataframe"
-    df_serialized = pickle.dumps(data_frame)
+def upload_session(filename, total_size):
+    # A session opened for the same file earlier in this Streamlit session is resumed if the API still has it
+    sessions = st.session_state.setdefault("upload_sessions", {})
+    key = f"{DATASET_ID}:{filename}:{total_size}"
+    if key in sessions:
+        response = requests.get(FASTAPI_HOST + f"uploads/{sessions[key]}")
+        if response.status_code == 200:
+            logger.info(f"Resuming upload session {sessions[key]}")
+            return key, response.json()
+    response = requests.post(
+        FASTAPI_HOST + "uploads",
+        json={
+            "filename": filename,
+            "format": "csv",
+            "total_size": total_size,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "dataset_id": DATASET_ID,
+        },
+    )
+    response.raise_for_status()
+    sessions[key] = response.json()["session_id"]
+    return key, response.json()
+
+
+def put_chunk(session_id, index, chunk):
+    checksum = hashlib.sha256(chunk).hexdigest()
+    for attempt in range(UPLOAD_RETRIES):
+        try:
+            response = requests.put(
+                FASTAPI_HOST + f"uploads/{session_id}/chunks/{index}",
+                data=chunk,
+                headers={**headers, "X-Content-SHA256": checksum},
+            )
+            if response.status_code == 200:
+                return
+            logger.error(f"Chunk {index} was rejected: {response.status_code}, {response.text}")
+        except requests.exceptions.RequestException as e:
+            if attempt == UPLOAD_RETRIES - 1:
+                raise
+            logger.error(f"Chunk {index} upload failed, retrying: {e}")
+    response.raise_for_status()
+
+
+def send_file_to_backend(file, filename, data_frame=None):
+    # file - binary file object (open() or st.file_uploader); sent in chunks through an upload session
+    logger.info("Call send_file_to_backend function")
+    file.seek(0, os.SEEK_END)
+    total_size = file.tell()
+    progress = st.progress(0.0, text="Загрузка файла на сервер...")
     try:
-        logger.info("Call to upload_dataframe")
-        response = requests.post(api_url, data=df_serialized, headers=headers)
+        key, session = upload_session(filename, total_size)
+        session_id, chunk_size = session["session_id"], session["chunk_size"]
+        total_chunks = max(1, -(-total_size // chunk_size))
+        received = set(session["received_chunks"])
+        if received:
+            st.info(f"Продолжаем загрузку: на сервере уже {len(received)} из {total_chunks} частей")
 
+        for index in range(total_chunks):
+            if index not in received:
+                file.seek(index * chunk_size)
+                put_chunk(session_id, index, file.read(chunk_size))
+            progress.progress((index + 1) / total_chunks, text=f"Загружено частей: {index + 1} из {total_chunks}")
+
+        progress.progress(1.0, text="Обработка файла на сервере...")
+        response = requests.post(FASTAPI_HOST + f"uploads/{session_id}/commit", json={"total_chunks": total_chunks})
         if response.status_code == 200:
-            logger.info("Dataframe successfully uploaded")
+            del st.session_state.upload_sessions[key]
+            logger.info("File successfully uploaded")
             st.success("Файл успешно загружен в API")
-            st.session_state.df = data_frame
+            if data_frame is not None:
+                st.session_state.df = data_frame
             st.json(response.json())
         else:
             st.error(f"Ошибка при загрузке файла: {response.status_code}, {response.text}")
-            logger.error(f"An error was received when uplodaing the dataframe: {response.status_code}, {response.text}")
+            logger.error(f"An error was received when committing the upload: {response.status_code}, {response.text}")
     except requests.exceptions.RequestException as e:
-        st.error(f"Ошибка соединения с API: {e}")
+        st.error(f"Ошибка соединения с API: {e}. Повторная отправка продолжит загрузку с места обрыва.")
         logger.error(f"An error was received when connecting to API: {e}")
 
 
-def get_dataFrame():
+def open_response_stream(response):
+    # gzip is decoded by urllib3, zstd by zstandard; both incrementally, while the body is still arriving
+    encoding = response.headers.get("Content-Encoding")
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(response.raw)
+    response.raw.decode_content = True
+    return response.raw
+
+
+def read_arrow_response(response):
+    # Record batches are decoded as they arrive, the body is never buffered as a whole
+    reader = pa.ipc.open_stream(open_response_stream(response))
+    table = pa.Table.from_batches(list(reader), schema=reader.schema)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def get_dataFrame(columns=None, offset=0, limit=None):
     api_url = FASTAPI_HOST + "get_dataframe"
+    params = {"columns": columns, "offset": offset, "limit": limit, "dataset_id": DATASET_ID}
     try:
         logger.info("Call to get_dataframe api method")
-        response = requests.get(api_url, headers=headers)
-
-        if response.status_code == 200:
-            serialized_data = bytes.fromhex(response.json()["df"])
-            df = pickle.loads(serialized_data)
-            st.toast("Датафрейм успешно получен с сервера")
-            st.session_state.df = df
-            logger.info("DataFrame successfully received")
-        else:
-            st.toast(f"Ошибка загрузки данных: {response.status_code}")
-            logger.error(f"An error was received when receiving the dataframe: {response.status_code}")
-            st.session_state.df = pd.DataFrame()
+        with requests.get(
+            api_url,
+            params={key: value for key, value in params.items() if value is not None},
+            headers={**headers, "Accept": ARROW_STREAM, "Accept-Encoding": "zstd, gzip"},
+            stream=True,
+        ) as response:
+            if response.status_code == 200:
+                df = read_arrow_response(response)
+                st.toast("Датафрейм успешно получен с сервера")
+                st.session_state.df = df
+                logger.info("DataFrame successfully received")
+            else:
+                st.toast(f"Ошибка загрузки данных: {response.status_code}")
+                logger.error(f"An error was received when receiving the dataframe: {response.status_code}")
+                st.session_state.df = pd.DataFrame()
 
     except requests.exceptions.RequestException as e:
         st.error(f"Ошибка соединения с API: {e}")
         logger.error(f"An error was received when connecting to API: {e}")
         st.session_state.df = pd.DataFrame()
+
+
+def get_dataset_info():
+    # Metadata of the current dataset version (versioned dataset_id, rows, columns); None if there is none
+    try:
+        response = requests.get(FASTAPI_HOST + f"datasets/{DATASET_ID}", headers={"User-Agent": "*"})
+    except requests.exceptions.RequestException as e:
+        st.error(f"Ошибка соединения с API: {e}")
+        logger.error(f"An error was received when connecting to API: {e}")
+        return None
+    if response.status_code != 200:
+        logger.info(f"Dataset {DATASET_ID} is not available: {response.status_code}")
+        return None
+    return response.json()
+
+
+def get_profile():
+    # Profile of the current dataset version, computed once on the API after upload
+    try:
+        logger.info("Call to dataset profile api method")
+        response = requests.get(FASTAPI_HOST + f"datasets/{DATASET_ID}/profile", headers={"User-Agent": "*"})
+    except requests.exceptions.RequestException as e:
+        st.error(f"Ошибка соединения с API: {e}")
+        logger.error(f"An error was received when connecting to API: {e}")
+        return None
+    if response.status_code != 200:
+        logger.error(f"An error was received when receiving the profile: {response.status_code}, {response.text}")
+        return None
+    return response.json()
+
+
+def query_dataframe(columns=None, filters=None, sort=None, limit=100_000, offset=0, cursor=None, dataset_id=DATASET_ID):
+    # filters: [{"column": "salary", "op": "between", "value": [10000, 50000]}, ...]
+    # Returns (DataFrame, total matching rows, cursor of the next page or None)
+    api_url = FASTAPI_HOST + "query"
+    query = {
+        "columns": columns,
+        "filters": filters or [],
+        "sort": sort or [],
+        "limit": limit,
+        "offset": offset,
+        "cursor": cursor,
+    }
+    logger.info("Call to query api method")
+    with requests.post(
+        api_url,
+        params={"dataset_id": dataset_id},
+        json=query,
+        headers={"User-Agent": "*", "Accept": ARROW_STREAM, "Accept-Encoding": "zstd, gzip"},
+        stream=True,
+    ) as response:
+        if response.status_code != 200:
+            logger.error(f"An error was received when querying the dataframe: {response.status_code}, {response.text}")
+            raise requests.exceptions.HTTPError(f"{response.status_code}: {response.text}", response=response)
+        df = read_arrow_response(response)
+        return df, int(response.headers["X-Total-Rows"]), response.headers.get("X-Next-Cursor")
+
+
+def query_all(columns=None, filters=None, sort=None, page_size=100_000, dataset_id=DATASET_ID):
+    # Follows X-Next-Cursor until every matching row is received
+    pages = []
+    cursor = None
+    while True:
+        page, total_rows, cursor = query_dataframe(
+            columns, filters, sort, limit=page_size, cursor=cursor, dataset_id=dataset_id
+        )
+        pages.append(page)
+        if cursor is None:
+            return pd.concat(pages, ignore_index=True) if len(pages) > 1 else page, total_rows
+
+
+def query_cached(dataset_id, columns, filters=None):
+    # Streamlit reruns the page on every widget change: rows are queried again only for another dataset version,
+    # column set or filter; the oldest results are dropped beyond QUERY_CACHE_ENTRIES
+    cache = st.session_state.setdefault("query_cache", {})
+    key = (dataset_id, tuple(columns), json.dumps(filters or [], sort_keys=True))
+    if key not in cache:
+        if len(cache) >= QUERY_CACHE_ENTRIES:
+            cache.pop(next(iter(cache)))
+        cache[key], _ = query_all(columns, filters, dataset_id=dataset_id)
+    return cache[key]
+
+
+def aggregate(aggregations, group_by=None, filters=None, sort=None, limit=None, dropna=True, dataset_id=DATASET_ID):
+    # aggregations: [{"column": "salary", "func": "mean"}, {"column": "salary", "func": "quantile", "q": 0.25}, ...]
+    # Returns a small DataFrame with group keys first, then one column per aggregate (e.g. "salary_mean")
+    api_url = FASTAPI_HOST + "aggregate"
+    request = {
+        "group_by": group_by or [],
+        "aggregations": aggregations,
+        "filters": filters or [],
+        "sort": sort or [],
+        "limit": limit,
+        "dropna": dropna,
+    }
+    logger.info("Call to aggregate api method")
+    response = requests.post(api_url, params={"dataset_id": dataset_id}, json=request, headers={"User-Agent": "*"})
+    if response.status_code != 200:
+        logger.error(f"An error was received when aggregating the dataframe: {response.status_code}, {response.text}")
+        raise requests.exceptions.HTTPError(f"{response.status_code}: {response.text}", response=response)
+    result = response.json()
+    return pd.DataFrame(result["data"], columns=result["columns"])
+
+
+def aggregate_locally(data_frame, aggregations, group_by=None):
+    # The same statistics and column names as /aggregate, computed on a frame already loaded on the page
+    frame = data_frame.groupby(group_by, observed=True) if group_by else data_frame
+    results = {}
+    for aggregation in aggregations:
+        column, func = aggregation.get("column"), aggregation["func"]
+        if func == "size":
+            results["size"] = frame.size() if group_by else len(data_frame)
+        elif func == "quantile":
+            results[f"{column}_q{aggregation['q']:g}"] = frame[column].quantile(aggregation["q"])
+        elif func == "describe":
+            described = frame[column].describe()
+            for name in ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]:
+                results[f"{column}_{name}"] = described[name]
+        else:
+            results[f"{column}_{func}"] = frame[column].agg(func)
+    if group_by:
+        return pd.DataFrame(results).reset_index()
+    return pd.DataFrame([results])
+
+
+def aggregate_or_local(data_frame, aggregations, group_by=None, filters=None):
+    # /aggregate, or the same statistics of data_frame if the server fails; data_frame must already be filtered
+    try:
+        return aggregate(aggregations, group_by=group_by, filters=filters)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Server-side aggregation failed, computing locally: {e}")
+        st.warning("Не удалось получить статистики с сервера, они посчитаны локально")
+        return aggregate_locally(data_frame, aggregations, group_by)
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# api/ and parser/ are not packages: their modules import each other as top-level modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("api", "parser"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
+
+
+@pytest.fixture
+def vacancies():
+    # Builds flattened vacancies with the raw columns preprocess_data reads, one per id; every one has a salary,
+    # as the parser only requests vacancies with one
+    from model_columns import raw_cat_columns
+
+    def make_vacancies(ids, seed):
+        rng = np.random.default_rng(seed)
+        n = len(ids)
+        df = pd.DataFrame({"id": [str(i) for i in ids]})
+        for column in raw_cat_columns:
+            df[column] = rng.choice(["a", "b", None], n)
+        df["salary_currency"] = rng.choice(["RUR", "USD"], n)
+        df["salary_gross"] = rng.choice([True, False, None], n)
+        df["name"] = rng.choice(["Python разработчик", "Аналитик данных", "Менеджер"], n)
+        df["snippet_requirement"] = rng.choice(["Опыт от 3 лет", "Знание SQL", None], n)
+        df["snippet_responsibility"] = rng.choice(["Писать код", None], n)
+        df["salary_from"] = rng.choice([50000.0, 100000.0], n)
+        df["salary_to"] = rng.choice([200000.0, np.nan], n)
+        return df
+
+    return make_vacancies
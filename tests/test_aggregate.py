@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from aggregate import AggregateCache, AggregateRequest, Aggregation, result_to_json, run_aggregate
+from query import Predicate, SortKey
+
+DF = pd.DataFrame(
+    {
+        "salary": np.array([100, 200, 300, 400, np.nan, 600], dtype=np.float32),
+        "area_name": pd.Categorical(["Москва", "Казань", "Москва", "Казань", "Москва", None]),
+    }
+)
+
+
+def request(aggregations, **kwargs):
+    return AggregateRequest(aggregations=[Aggregation(**aggregation) for aggregation in aggregations], **kwargs)
+
+
+def test_group_statistics_match_pandas():
+    result = run_aggregate(
+        DF,
+        request([{"func": "size"}, {"column": "salary", "func": "mean"}], group_by=["area_name"]),
+    )
+    expected = DF.astype({"salary": float}).groupby("area_name", observed=True)["salary"]
+    assert result["area_name"].tolist() == ["Казань", "Москва"]
+    assert result["size"].tolist() == [2, 3]
+    assert result["salary_mean"].tolist() == expected.mean().tolist()
+
+
+def test_describe_and_quantile_names():
+    result = run_aggregate(
+        DF, request([{"column": "salary", "func": "describe"}, {"column": "salary", "func": "quantile", "q": 0.9}])
+    )
+    described = DF["salary"].astype(float).describe()
+    assert list(result.columns) == [f"salary_{name}" for name in described.index] + ["salary_q0.9"]
+    assert result.loc[0, "salary_50%"] == described["50%"]
+
+
+def test_filters_sort_and_limit():
+    result = run_aggregate(
+        DF,
+        request(
+            [{"func": "size"}, {"column": "salary", "func": "max"}],
+            group_by=["area_name"],
+            filters=[Predicate(column="salary", op=">=", value=200)],
+            sort=[SortKey(column="salary_max", descending=True)],
+            limit=1,
+        ),
+    )
+    assert result.to_dict("records") == [{"area_name": "Казань", "size": 2, "salary_max": 400.0}]
+
+
+def test_invalid_requests():
+    with pytest.raises(ValueError):
+        run_aggregate(DF, request([{"column": "salary", "func": "mode"}]))
+    with pytest.raises(ValueError):
+        run_aggregate(DF, request([{"func": "mean"}]))
+    with pytest.raises(KeyError):
+        run_aggregate(DF, request([{"func": "size"}], group_by=["missing"]))
+
+
+def test_nan_is_sent_as_null():
+    result = run_aggregate(DF, request([{"column": "salary", "func": "mean"}], group_by=["area_name"], dropna=False))
+    assert result_to_json(result)["data"][-1] == [None, 600.0]
+    result = pd.DataFrame({"salary_std": [np.nan]})
+    assert result_to_json(result) == {"columns": ["salary_std"], "data": [[None]]}
+
+
+def test_cache_is_keyed_by_version_and_evicts_least_recently_used():
+    cache = AggregateCache(max_entries=2)
+    first, second = request([{"func": "size"}]), request([{"func": "size"}], group_by=["area_name"])
+    cache.put(cache.key("v1", first), 1)
+    cache.put(cache.key("v1", second), 2)
+    assert cache.get(cache.key("v2", first)) is None
+    assert cache.get(cache.key("v1", first)) == 1
+    cache.put(cache.key("v2", first), 3)
+
+    assert cache.get(cache.key("v1", second)) is None
+    assert cache.get(cache.key("v1", first)) == 1
+    assert (cache.hits, cache.misses) == (2, 2)
@@ -0,0 +1,125 @@
+import asyncio
+import io
+import os
+
+import httpx
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+pytest.importorskip("catboost")
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+DF = pd.DataFrame({"area_name": ["Москва", "Казань", "Москва"], "salary": [150000.0, 90000.0, 120000.0]})
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # app keeps its datasets, uploads and caches in directories relative to the working directory
+    root = tmp_path_factory.mktemp("api")
+    os.makedirs(root / "logs")
+    cwd = os.getcwd()
+    os.chdir(root)
+    try:
+        import app
+        from fastapi.testclient import TestClient
+
+        yield app, TestClient(app.app)
+    finally:
+        os.chdir(cwd)
+
+
+def arrow_body(df):
+    buffer = io.BytesIO()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.ipc.new_stream(buffer, table.schema) as writer:
+        writer.write_table(table)
+    return buffer.getvalue()
+
+
+def upload(client, df, dataset_id):
+    response = client.post(
+        "/upload_dataframe",
+        params={"dataset_id": dataset_id},
+        content=arrow_body(df),
+        headers={"Content-Type": ARROW_STREAM},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["dataset_id"]
+
+
+def test_delete_drops_cached_results(api):
+    app, client = api
+    dataset_id = upload(client, DF, "deleted")
+    request = {"group_by": ["area_name"], "aggregations": [{"column": "salary", "func": "mean"}]}
+    assert not client.post("/aggregate", params={"dataset_id": dataset_id}, json=request).json()["cached"]
+    assert client.post("/aggregate", params={"dataset_id": dataset_id}, json=request).json()["cached"]
+    app.preprocessed.put(dataset_id, DF)
+
+    assert client.delete(f"/datasets/{dataset_id}").status_code == 200
+    assert app.preprocessed.get(dataset_id) is None
+    assert not [key for key in app.aggregate_cache.entries if key[0] == dataset_id]
+    assert client.post("/aggregate", params={"dataset_id": dataset_id}, json=request).status_code == 404
+
+
+def test_pruned_versions_drop_cached_results(api, monkeypatch):
+    app, client = api
+    monkeypatch.setattr(app.datasets, "keep_versions", 1)
+    dataset_id = upload(client, DF, "pruned")
+    request = {"aggregations": [{"column": "salary", "func": "max"}]}
+    assert not client.post("/aggregate", params={"dataset_id": dataset_id}, json=request).json()["cached"]
+    app.preprocessed.put(dataset_id, DF)
+    version = app.datasets.info(dataset_id)["version"]
+    os.makedirs(app.feature_cache.entry_path(app.feature_cache.key(version)))
+
+    upload(client, DF.head(2), "pruned")
+    assert app.datasets.versions("pruned") != [version]
+    assert app.preprocessed.get(dataset_id) is None
+    assert not [key for key in app.aggregate_cache.entries if key[0] == dataset_id]
+    assert not app.feature_cache.contains(version)
+
+
+def test_training_fills_the_preprocessed_cache_for_appends(api, vacancies):
+    app, _ = api
+    from preprocess import preprocess_data
+
+    async def run():
+        # Jobs are asyncio tasks of the app, so all requests go through one event loop
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"Content-Type": ARROW_STREAM}
+            body = arrow_body(vacancies(range(300), seed=0))
+            response = await client.post(
+                "/upload_dataframe", params={"dataset_id": "appended"}, content=body, headers=headers
+            )
+            dataset_id = response.json()["dataset_id"]
+
+            request = {"model_id": "appended", "model_name": "Appended", "hyperparameters": {"iterations": 5}}
+            job = (await client.post("/train_model", params={"dataset_id": dataset_id}, json=request)).json()
+            while job["status"] in ("queued", "running"):
+                await asyncio.sleep(0.1)
+                job = (await client.get(f"/jobs/{job['job_id']}")).json()
+            assert job["status"] == "completed", job["error"]
+            # Trained on quantized pools, without falling back to the feature matrix
+            assert job["warning"] is None
+            assert app.preprocessed.get(dataset_id) is not None
+
+            body = arrow_body(vacancies(range(290, 340), seed=1))
+            response = await client.post("/datasets/appended/append", content=body, headers=headers)
+            return response.json()
+
+    appended = asyncio.run(run())
+    assert (appended["appended"], appended["duplicates"]) == (40, 10)
+    full = preprocess_data(app.datasets.get(appended["dataset_id"])[0])
+    pd.testing.assert_frame_equal(app.preprocessed.get(appended["dataset_id"]), full.reset_index(drop=True))
+
+
+def test_cross_validation_rejects_early_stopping(api, vacancies):
+    app, client = api
+    dataset_id = upload(client, vacancies(range(50), seed=0), "early_stopping")
+    jobs = len(app.training_jobs.jobs)
+    request = {"model_id": "cv", "model_name": "CV", "hyperparameters": {"od_wait": 20}, "cv": {"folds": 3}}
+    response = client.post("/train_model", params={"dataset_id": dataset_id}, json=request)
+    assert response.status_code == 400
+    assert "od_wait" in response.json()["detail"]
+    assert len(app.training_jobs.jobs) == jobs
@@ -0,0 +1,87 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from async_parser import AsyncParser, TokenBucket
+
+
+def run_with_server(handler, check, **parser_kwargs):
+    async def main():
+        app = web.Application()
+        app.router.add_get("/vacancies", handler)
+        async with TestServer(app) as server:
+            parser = AsyncParser(url=str(server.make_url("")).rstrip("/"), backoff=0.01, **parser_kwargs)
+            parser.semaphore = asyncio.Semaphore(4)
+            timeout = aiohttp.ClientTimeout(total=parser.timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                return await check(parser, session)
+
+    return asyncio.run(main())
+
+
+def test_dropped_connection_is_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        if len(calls) == 1:
+            # Обрыв соединения без ответа
+            request.transport.close()
+            await asyncio.sleep(1)
+        return web.json_response({"items": [{"id": "1"}], "pages": 1})
+
+    async def check(parser, session):
+        return await parser.fetch_json(session, "/vacancies", {"page": 0})
+
+    data, status = run_with_server(handler, check)
+    assert status == 200
+    assert data["items"] == [{"id": "1"}]
+    assert len(calls) == 2
+
+
+def test_server_errors_and_timeouts_give_up_on_the_page_only():
+    async def handler(request):
+        if request.query["page"] == "0":
+            await asyncio.sleep(2)
+        elif request.query["page"] == "1":
+            return web.json_response({}, status=503)
+        return web.json_response({"items": [], "pages": 1})
+
+    async def check(parser, session):
+        return await asyncio.gather(*(parser.fetch_json(session, "/vacancies", {"page": page}) for page in range(3)))
+
+    results = run_with_server(handler, check, timeout=0.2, max_retries=2)
+    assert results[0] == (None, None)
+    assert results[1] == (None, 503)
+    assert results[2][1] == 200
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        return web.json_response({}, status=400)
+
+    async def check(parser, session):
+        return await parser.fetch_json(session, "/vacancies", {"page": 50})
+
+    assert run_with_server(handler, check) == (None, 400)
+    assert len(calls) == 1
+
+
+def test_rate_recovers_under_rare_forbidden_responses():
+    limiter = TokenBucket(rate=5.0)
+    # ~5% ответов 403
+    for _ in range(50):
+        limiter.penalize()
+        for _ in range(19):
+            limiter.reward()
+    assert limiter.rate == limiter.max_rate
+
+
+def test_rate_is_not_above_max_rate():
+    limiter = TokenBucket(rate=5.0)
+    limiter.reward()
+    assert limiter.rate == 5.0
@@ -0,0 +1,64 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("catboost")
+
+
+def test_folds_cover_every_row_once_per_repeat():
+    from crossval import fold_indices
+
+    folds = list(fold_indices(23, folds=5, repeats=2))
+    assert [(repeat, fold) for repeat, fold, _, _ in folds] == [(r, f) for r in range(2) for f in range(5)]
+    for repeat in range(2):
+        test_rows = np.concatenate([test for r, _, _, test in folds if r == repeat])
+        assert sorted(test_rows) == list(range(23))
+    for _, _, train, test in folds:
+        assert not set(train) & set(test)
+        assert len(train) + len(test) == 23
+
+
+def test_metrics_and_curves_are_averaged_over_folds():
+    from crossval import aggregate_metrics, average_curves
+
+    metrics = aggregate_metrics([{"RMSE": 1.0, "R2": 0.5}, {"RMSE": 3.0, "R2": 0.7}])
+    assert metrics == pytest.approx({"RMSE": 2.0, "RMSE_std": np.sqrt(2), "R2": 0.6, "R2_std": np.sqrt(0.02)})
+    assert aggregate_metrics([{"RMSE": 1.0}]) == {"RMSE": 1.0, "RMSE_std": 0.0}
+
+    # Curves of different lengths are averaged up to the shortest one
+    curves = [
+        {"train_rmse": [4.0, 2.0, 1.0], "test_rmse": [5.0, 3.0, 2.0]},
+        {"train_rmse": [2.0, 1.0], "test_rmse": [3.0, 2.0]},
+    ]
+    assert average_curves(curves) == {"iterations": [0, 1], "train_rmse": [3.0, 1.5], "test_rmse": [4.0, 2.5]}
+
+
+def test_early_stopping_params():
+    from crossval import early_stopping_params
+
+    assert early_stopping_params({"iterations": 100, "od_type": None}) == []
+    assert early_stopping_params({"od_wait": 20, "early_stopping_rounds": 20}) == ["od_wait", "early_stopping_rounds"]
+
+
+def test_failed_fold_fails_without_waiting_for_the_others():
+    from crossval import CrossValidation
+    from training import TrainingError
+
+    class FailingCrossValidation(CrossValidation):
+        def fit_fold(self, fold, train_index, test_index, threads):
+            if fold["fold"] == 0:
+                raise TrainingError("fold 0")
+            time.sleep(3)
+            return fold
+
+        def fit_final(self, threads):
+            time.sleep(3)
+
+    X = pd.DataFrame({"x": np.arange(20.0)})
+    cross_validation = FailingCrossValidation(lambda progress: None, X, X["x"], {}, parallel=2)
+    start = time.time()
+    with pytest.raises(TrainingError, match="fold 0"):
+        cross_validation.run(folds=5)
+    assert time.time() - start < 2
@@ -0,0 +1,68 @@
+import os
+
+import pandas as pd
+import pytest
+from datasets import DatasetRegistry, parse_dataset_id
+
+DF = pd.DataFrame({"name": ["Python developer", "Analyst"], "salary": [150000.0, 90000.0]})
+
+
+def test_dataset_ids():
+    assert parse_dataset_id("vacancies") == ("vacancies", None)
+    assert parse_dataset_id("vacancies@0123abcd") == ("vacancies", "0123abcd")
+    with pytest.raises(ValueError):
+        parse_dataset_id("../vacancies")
+
+
+def test_versions_are_content_hashes(tmp_path):
+    registry = DatasetRegistry(str(tmp_path))
+    first, _ = registry.put("vacancies", DF)
+    assert registry.put("vacancies", DF) == (first, [])
+    second, _ = registry.put("vacancies", DF.head(1))
+    assert registry.versions("vacancies") == [first["version"], second["version"]]
+
+    # A version prefix and the bare name resolve like in the API
+    assert registry.info(f"vacancies@{first['version'][:6]}") == first
+    assert registry.info("vacancies") == second
+    with pytest.raises(ValueError):
+        registry.put(first["dataset_id"], DF)
+
+
+def test_versions_are_read_back_from_disk(tmp_path):
+    info, _ = DatasetRegistry(str(tmp_path)).put("vacancies", DF)
+    df, loaded_info = DatasetRegistry(str(tmp_path)).get("vacancies")
+    assert loaded_info == info
+    pd.testing.assert_frame_equal(df, DF, check_dtype=False)
+
+
+def test_old_versions_are_dropped(tmp_path):
+    registry = DatasetRegistry(str(tmp_path), keep_versions=2)
+    infos = [registry.put("vacancies", DF.assign(salary=DF["salary"] + i))[0] for i in range(2)]
+    info, removed = registry.put("vacancies", DF.assign(salary=DF["salary"] + 2))
+    assert removed == infos[:1]
+    assert registry.versions("vacancies") == [infos[1]["version"], info["version"]]
+    assert not os.path.exists(registry.path("vacancies", infos[0]["version"]))
+
+
+def test_loaded_frames_stay_within_memory_budget(tmp_path):
+    registry = DatasetRegistry(str(tmp_path), memory_budget=1)
+    registry.put("first", DF)
+    registry.put("second", DF)
+    # The most recently used dataset stays loaded even above the budget
+    assert registry.stats()["loaded"] == [registry.info("second")["dataset_id"]]
+    registry.get("first")
+    assert registry.stats()["loaded"] == [registry.info("first")["dataset_id"]]
+
+
+def test_delete_returns_removed_versions(tmp_path):
+    registry = DatasetRegistry(str(tmp_path))
+    first, _ = registry.put("vacancies", DF)
+    second, _ = registry.put("vacancies", DF.head(1))
+    assert registry.delete(f"vacancies@{first['version']}") == [first]
+    assert registry.versions("vacancies") == [second["version"]]
+
+    assert registry.delete("vacancies") == [second]
+    assert registry.stats()["loaded"] == []
+    assert not os.path.exists(os.path.join(tmp_path, "vacancies"))
+    with pytest.raises(KeyError):
+        registry.get("vacancies")
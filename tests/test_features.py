@@ -0,0 +1,39 @@
+import pandas as pd
+from compact import compact_dtypes
+from datasets import DatasetRegistry
+from features import PreprocessedCache, append_preprocessed, append_rows, new_rows
+from preprocess import preprocess_data
+
+
+def test_new_rows_skips_known_and_repeated_ids(vacancies):
+    df = vacancies(range(5), seed=0)
+    rows = vacancies([3, 4, 5, 5, 6], seed=1)
+    rows, duplicates = new_rows(df, rows)
+    assert rows["id"].tolist() == ["5", "6"]
+    assert duplicates == 3
+
+
+def test_appended_rows_preprocess_like_the_whole_dataset(tmp_path, vacancies):
+    # The same way as /datasets/{dataset_id}/append: the stored version is compacted, the new rows are not
+    registry = DatasetRegistry(str(tmp_path))
+    registry.put("vacancies", compact_dtypes(vacancies(range(300), seed=0))[0])
+    df, info = registry.get("vacancies")
+    cache = PreprocessedCache()
+    cache.put(info["dataset_id"], preprocess_data(df))
+
+    rows, _ = new_rows(df, vacancies(range(290, 340), seed=1))
+    new_info, _ = registry.put("vacancies", compact_dtypes(append_rows(df, rows))[0])
+    cache.put(new_info["dataset_id"], append_preprocessed(cache.get(info["dataset_id"]), rows))
+
+    full = preprocess_data(DatasetRegistry(str(tmp_path)).get(new_info["dataset_id"])[0])
+    pd.testing.assert_frame_equal(cache.get(new_info["dataset_id"]), full.reset_index(drop=True))
+
+
+def test_preprocessed_cache_keeps_most_recently_used():
+    cache = PreprocessedCache(max_entries=2)
+    for dataset_id in ("a@1", "a@2", "b@1"):
+        cache.put(dataset_id, pd.DataFrame())
+    assert cache.get("a@1") is None
+    assert cache.get("a@2") is not None
+    cache.invalidate("a@2")
+    assert cache.get("a@2") is None
@@ -0,0 +1,48 @@
+from frontier import DONE, PENDING, CrawlFrontier
+
+UNITS = [
+    ("2024-01-01T00:00:00", "2024-01-01T23:59:59", "1", ""),
+    ("2024-01-01T00:00:00", "2024-01-01T23:59:59", "2", "5.1"),
+]
+
+
+def test_resume_continues_from_the_first_missing_page(tmp_path):
+    path = str(tmp_path / "frontier.sqlite")
+    frontier = CrawlFrontier(path)
+    frontier.add_units(UNITS)
+    frontier.commit_page(UNITS[0][0], "1", "", 0, [{"id": "a"}], pages=3)
+    frontier.commit_page(UNITS[0][0], "1", "", 1, [{"id": "b"}])
+    frontier.close()
+
+    # Перезапуск: единицы и страницы пережили закрытие соединения
+    frontier = CrawlFrontier(path)
+    frontier.add_units(UNITS)
+    assert frontier.pending_units() == UNITS
+    assert frontier.done_pages(UNITS[0][0], "1", "") == {0: [{"id": "a"}], 1: [{"id": "b"}]}
+    assert frontier.unit_pages(UNITS[0][0], "1", "") == 3
+    assert frontier.progress() == {PENDING: 2}
+
+
+def test_finished_units_are_not_pending_and_not_reset(tmp_path):
+    frontier = CrawlFrontier(str(tmp_path / "frontier.sqlite"))
+    frontier.add_units(UNITS)
+    frontier.finish_unit(UNITS[0][0], "1", "")
+    frontier.add_units(UNITS)
+    assert frontier.pending_units() == UNITS[1:]
+    assert frontier.is_done(UNITS[0][0], "1", "")
+    assert frontier.progress() == {DONE: 1, PENDING: 1}
+
+
+def test_vacancies_come_back_in_crawl_order(tmp_path):
+    frontier = CrawlFrontier(str(tmp_path / "frontier.sqlite"))
+    frontier.add_units(UNITS)
+    frontier.commit_page(UNITS[1][0], "2", "5.1", 0, [{"id": "c"}])
+    frontier.commit_page(UNITS[0][0], "1", "", 1, [{"id": "b"}])
+    frontier.commit_page(UNITS[0][0], "1", "", 0, [{"id": "a"}])
+    # Повторный коммит страницы заменяет её, а не дублирует
+    frontier.commit_page(UNITS[0][0], "1", "", 0, [{"id": "a"}])
+
+    expected = [{"id": "a"}, {"id": "b"}, {"id": "c"}]
+    assert list(frontier.iter_vacancies()) == expected
+    assert list(frontier.iter_vacancies(UNITS)) == expected
+    assert list(frontier.iter_vacancies(UNITS[1:])) == [{"id": "c"}]
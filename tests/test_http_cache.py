@@ -0,0 +1,80 @@
+import json
+from parser import Parser
+
+from http_cache import HttpCache
+
+URL = "https://api.hh.ru"
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode() if body is not None else b""
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeSession:
+    """Отдаёт заранее заданные ответы и запоминает заголовки запросов."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, headers=None):
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def parser_with(tmp_path, *responses, ttls=None):
+    parser = Parser(URL, cache_path=str(tmp_path / "cache.sqlite"))
+    parser.cache.ttls.update(ttls or {})
+    parser.session = FakeSession(*responses)
+    return parser
+
+
+def test_fresh_entry_is_served_without_request(tmp_path):
+    parser = parser_with(tmp_path, FakeResponse(200, {"items": [1]}))
+    assert parser.http_get("/vacancies", {"page": 0, "area": 1}) == ({"items": [1]}, 200)
+    # Порядок параметров не влияет на ключ
+    assert parser.http_get("/vacancies", {"area": 1, "page": 0}) == ({"items": [1]}, 200)
+    assert len(parser.session.requests) == 1
+    assert parser.cache.stats() == {"hits": 1, "revalidated": 0, "misses": 1}
+
+
+def test_stale_entry_is_revalidated_by_etag(tmp_path):
+    parser = parser_with(
+        tmp_path,
+        FakeResponse(200, {"items": [1]}, {"ETag": '"v1"'}),
+        FakeResponse(304),
+        ttls={"vacancies": 0},
+    )
+    parser.http_get("/vacancies", {"page": 0})
+    assert parser.http_get("/vacancies", {"page": 0}) == ({"items": [1]}, 200)
+    assert parser.session.requests[1] == {"If-None-Match": '"v1"'}
+    assert parser.cache.stats() == {"hits": 0, "revalidated": 1, "misses": 1}
+
+
+def test_errors_are_not_cached(tmp_path):
+    parser = parser_with(tmp_path, FakeResponse(503), FakeResponse(200, {"items": []}))
+    assert parser.http_get("/vacancies") == (None, 503)
+    assert parser.http_get("/vacancies") == ({"items": []}, 200)
+    assert parser.cache.lookup(URL + "/vacancies") is not None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = HttpCache(str(tmp_path / "cache.sqlite"), max_bytes=25)
+    cache.store(URL + "/areas", {"a": 1}, b"x" * 10, {})
+    cache.store(URL + "/areas", {"a": 2}, b"x" * 10, {})
+    cache.lookup(URL + "/areas", {"a": 1})
+    cache.store(URL + "/areas", {"a": 3}, b"x" * 10, {})
+
+    assert cache.lookup(URL + "/areas", {"a": 2}) is None
+    assert cache.lookup(URL + "/areas", {"a": 1}) is not None
+    assert cache.total_bytes == 20
+
+    # Размер кэша восстанавливается при повторном открытии
+    cache.close()
+    assert HttpCache(str(tmp_path / "cache.sqlite"), max_bytes=25).total_bytes == 20
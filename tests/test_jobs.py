@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+from jobs import JobQueue
+
+
+# Targets run in spawned worker processes, which import them from this module
+def add(report, a, b):
+    report({"stage": "adding", "iteration": 1, "iterations": 2})
+    return a + b
+
+
+def fail(report):
+    raise ValueError("no data")
+
+
+def sleep(report, seconds):
+    report({"stage": "sleeping"})
+    time.sleep(seconds)
+    return seconds
+
+
+def fail_with_threads_left(report, seconds):
+    # Like a cross-validation whose first fold failed while the others are still fitting
+    threading.Thread(target=time.sleep, args=(seconds,)).start()
+    raise ValueError("fold 0")
+
+
+async def wait(queue, job_id, timeout=60):
+    start = time.time()
+    while queue.status(job_id)["status"] in ("queued", "running"):
+        assert time.time() - start < timeout
+        await asyncio.sleep(0.05)
+    return queue.status(job_id)
+
+
+def test_result_is_registered():
+    results = []
+
+    async def run():
+        queue = JobQueue(workers=1)
+        job = queue.submit(add, (2, 3), lambda job, result: results.append((job["name"], result)), name="sum")
+        assert job["status"] == "queued"
+        return await wait(queue, job["job_id"])
+
+    job = asyncio.run(run())
+    assert results == [("sum", 5)]
+    assert job["status"] == "completed"
+    assert job["stage"] == "adding"
+    assert job["progress"] == 1.0
+    assert job["elapsed"] > 0
+
+
+def test_errors_fail_the_job():
+    def register(job, result):
+        raise KeyError("model")
+
+    async def run():
+        queue = JobQueue(workers=2)
+        failed = queue.submit(fail, (), register)
+        unregistered = queue.submit(add, (1, 1), register)
+        return await wait(queue, failed["job_id"]), await wait(queue, unregistered["job_id"])
+
+    failed, unregistered = asyncio.run(run())
+    assert (failed["status"], failed["error"]) == ("failed", "no data")
+    assert unregistered["status"] == "failed"
+    assert unregistered["error"].startswith("Error registering the result")
+
+
+def test_cancel_frees_the_worker():
+    async def run():
+        queue = JobQueue(workers=1)
+        slow = queue.submit(sleep, (60,), lambda job, result: None)
+        fast = queue.submit(add, (1, 2), lambda job, result: None)
+        while queue.status(slow["job_id"])["stage"] != "sleeping":
+            await asyncio.sleep(0.05)
+        # Only one worker: the second job waits in the queue
+        assert queue.status(fast["job_id"])["status"] == "queued"
+        process = queue.processes[slow["job_id"]]
+
+        start = time.time()
+        assert queue.cancel(slow["job_id"])["status"] == "cancelled"
+        fast = await wait(queue, fast["job_id"])
+        return fast, process, time.time() - start
+
+    fast, process, elapsed = asyncio.run(run())
+    assert fast["status"] == "completed"
+    assert not process.is_alive()
+    assert elapsed < 30
+
+
+def test_failed_job_does_not_wait_for_its_threads():
+    async def run():
+        queue = JobQueue(workers=1)
+        start = time.time()
+        job = queue.submit(fail_with_threads_left, (60,), lambda job, result: None)
+        process = None
+        while process is None:
+            await asyncio.sleep(0.05)
+            process = queue.processes.get(job["job_id"])
+        return await wait(queue, job["job_id"]), process, time.time() - start
+
+    job, process, elapsed = asyncio.run(run())
+    assert (job["status"], job["error"]) == ("failed", "fold 0")
+    assert not process.is_alive()
+    assert elapsed < 30
+
+
+def test_history_keeps_most_recently_finished_jobs():
+    async def run():
+        queue = JobQueue(workers=1, history=2)
+        job_ids = [queue.submit(add, (i, i), lambda job, result: None)["job_id"] for i in range(3)]
+        # A single worker runs the jobs in order; the third one finishes last
+        while job_ids[2] in queue.jobs and queue.jobs[job_ids[2]]["status"] != "completed":
+            await asyncio.sleep(0.05)
+        return queue, job_ids
+
+    queue, job_ids = asyncio.run(run())
+    assert [job["job_id"] for job in queue.list()] == job_ids[1:]
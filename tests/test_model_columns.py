@@ -0,0 +1,26 @@
+from flatten import MODEL_COLUMNS, Flattener
+from model_columns import text_columns
+from preprocess import cat_columns, num_columns
+
+# Колонки, которые preprocess_data считает сам
+DERIVED_COLUMNS = {"category", "salary"} | set(num_columns)
+
+
+def test_parser_extracts_every_column_preprocessing_reads():
+    read_columns = set(cat_columns) | set(text_columns) | {"salary_from", "salary_to"}
+    assert read_columns - DERIVED_COLUMNS <= set(MODEL_COLUMNS)
+    assert not DERIVED_COLUMNS & set(MODEL_COLUMNS)
+
+
+def test_projection_keeps_model_columns_only():
+    vacancy = {
+        "id": "1",
+        "name": "Python developer",
+        "salary": {"from": 100, "to": None, "currency": "RUR", "gross": True},
+        "area": {"id": "1", "name": "Москва"},
+        "contacts": {"email": "hr@example.com"},
+    }
+    df = Flattener(columns=MODEL_COLUMNS).to_dataframe([vacancy])
+    assert list(df.columns) == MODEL_COLUMNS
+    assert df.loc[0, "salary_from"] == 100
+    assert df.loc[0, "area_name"] == "Москва"
@@ -0,0 +1,68 @@
+import glob
+import os
+
+import pandas as pd
+import pyarrow.dataset as ds
+from parquet_sink import ParquetSink, read_vacancies
+
+
+def vacancy(vacancy_id, date, **fields):
+    return {"id": vacancy_id, "published_at": f"{date}T10:00:00+0300", **fields}
+
+
+def test_batches_are_partitioned_by_date(tmp_path):
+    sink = ParquetSink(pd.DataFrame, root=str(tmp_path), batch_size=2)
+    sink.write([vacancy("1", "2024-01-01"), vacancy("2", "2024-01-02"), vacancy("3", "2024-01-01")])
+    assert sink.close() == str(tmp_path)
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "_common_metadata",
+        "published_date=2024-01-01",
+        "published_date=2024-01-02",
+    ]
+    df = read_vacancies(str(tmp_path))
+    assert sorted(df["id"]) == ["1", "2", "3"]
+    assert sink.rows == 3
+
+    df = read_vacancies(str(tmp_path), columns=["id"], filter=ds.field("published_date") == "2024-01-01")
+    assert sorted(df["id"]) == ["1", "3"]
+
+
+def test_new_columns_grow_the_schema(tmp_path):
+    sink = ParquetSink(pd.DataFrame, root=str(tmp_path), batch_size=1)
+    sink.write([vacancy("1", "2024-01-01"), vacancy("2", "2024-01-01", salary_from=100)])
+    sink.close()
+
+    # Партиция продолжается новым файлом с расширенной схемой
+    assert len(glob.glob(os.path.join(tmp_path, "published_date=2024-01-01", "*.parquet"))) == 2
+    df = read_vacancies(str(tmp_path)).sort_values("id")
+    assert df["salary_from"].isna().tolist() == [True, False]
+    assert df["salary_from"].iloc[1] == 100
+
+
+def test_type_conflict_is_stored_as_string(tmp_path):
+    sink = ParquetSink(pd.DataFrame, root=str(tmp_path), batch_size=10)
+    sink.write([vacancy("1", "2024-01-01", code=1), vacancy("2", "2024-01-01", code="A")])
+    sink.close()
+
+    df = read_vacancies(str(tmp_path)).sort_values("id")
+    assert df["code"].tolist() == ["1", "A"]
+
+
+def test_memory_is_bounded_by_one_batch(tmp_path):
+    sink = ParquetSink(pd.DataFrame, root=str(tmp_path), batch_size=3)
+    sink.write([vacancy(str(i), "2024-01-01") for i in range(7)])
+    assert len(sink.buffer) == 1
+    assert sink.rows == 6
+    sink.close()
+    assert len(read_vacancies(str(tmp_path))) == 7
+
+
+def test_type_conflict_across_batches_is_read_as_string(tmp_path):
+    # Первый файл записан с числовой колонкой, общая схема потом расширилась до строки
+    sink = ParquetSink(pd.DataFrame, root=str(tmp_path), batch_size=1)
+    sink.write([vacancy("1", "2024-01-01", code=1), vacancy("2", "2024-01-02", code="A")])
+    sink.close()
+
+    df = read_vacancies(str(tmp_path)).sort_values("id")
+    assert df["code"].tolist() == ["1", "A"]
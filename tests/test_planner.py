@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import requests
+from metrics import CrawlMetrics
+from planner import QueryPlanner
+
+START = datetime(2024, 1, 1)
+
+
+class FakeParser:
+    """Отвечает на пробные запросы планировщика по функции respond(date_from, date_to, area)."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.metrics = CrawlMetrics()
+        self.calls = []
+
+    def get_vacancies_with_salary(self, date_from, date_to, area, metro, page=0, per_page=100):
+        self.calls.append((date_from, date_to, area))
+        return self.respond(date_from, date_to, area)
+
+
+def planner_for(respond, **kwargs):
+    return QueryPlanner(FakeParser(respond), backoff=0, **kwargs)
+
+
+def test_server_error_is_retried():
+    responses = iter([(None, 503), (None, 502), ({"found": 10}, 200)])
+    planner = planner_for(lambda *args: next(responses))
+    units = planner.plan_window(START, START + timedelta(days=1))
+    assert units == [(START.isoformat(), (START + timedelta(days=1, seconds=-1)).isoformat(), "", "")]
+    assert planner.probes == 3
+
+
+def test_window_with_unknown_count_is_kept_whole():
+    planner = planner_for(lambda *args: (None, 503))
+    units = planner.plan_window(START, START + timedelta(days=1))
+    assert units == [(START.isoformat(), (START + timedelta(days=1, seconds=-1)).isoformat(), "", "")]
+    assert planner.unknown_windows == 1
+
+
+def test_outage_is_not_multiplied_by_splitting():
+    # При недоступном API каждое окно стоит max_retries пробных запросов, а не по запросу на каждую минуту
+    planner = planner_for(lambda *args: (None, 503))
+    planner.area_children = {"": ["1", "2"]}
+    units = planner.plan_window(START, START + timedelta(days=7))
+    assert len(units) == 1
+    assert planner.probes == planner.max_retries
+
+
+def test_unknown_subwindow_of_a_split_window_is_kept_whole():
+    # Неделя больше cap, у второго дня число вакансий неизвестно, остальные дни пусты
+    second_day = (START + timedelta(days=1)).isoformat()
+
+    def respond(date_from, date_to, area):
+        if date_from == START.isoformat() and date_to.startswith("2024-01-07"):
+            return {"found": 3000}, 200
+        if date_from == second_day:
+            return None, 503
+        return {"found": 0}, 200
+
+    planner = planner_for(respond)
+    units = planner.plan_window(START, START + timedelta(days=7))
+    assert units == [(second_day, (START + timedelta(days=2, seconds=-1)).isoformat(), "", "")]
+    assert planner.unknown_windows == 1
+
+
+def test_network_errors_count_as_unknown():
+    def respond(*args):
+        raise requests.ConnectionError("connection reset")
+
+    planner = planner_for(respond, max_retries=2)
+    units = planner.plan_window(START, START + timedelta(minutes=1))
+    assert len(units) == 1
+    assert planner.probes == 2
+
+
+def test_empty_window_is_dropped():
+    planner = planner_for(lambda *args: ({"found": 0}, 200))
+    assert planner.plan_window(START, START + timedelta(days=1)) == []
+    assert planner.probes == 1
+
+
+def test_window_over_cap_is_split():
+    def respond(date_from, date_to, area):
+        hours = (datetime.fromisoformat(date_to) - datetime.fromisoformat(date_from)).total_seconds() / 3600
+        return {"found": 3000 if hours > 2 else 100}, 200
+
+    planner = planner_for(respond)
+    units = planner.plan_window(START, START + timedelta(days=1))
+    assert len(units) == 24
+    assert planner.planned_pages == 24
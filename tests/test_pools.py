@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("catboost")
+
+HYPERPARAMETERS = {"iterations": 5, "border_count": 32, "allow_writing_files": False}
+
+
+@pytest.fixture
+def splits(vacancies):
+    from preprocess import preprocess_data
+    from training import split_data
+
+    return split_data(preprocess_data(vacancies(range(300), seed=0)))
+
+
+def test_quantization_params_resolve_aliases():
+    from pools import quantization_params, training_params
+
+    assert quantization_params({"max_bin": 32}) == quantization_params({"border_count": 32})
+    assert training_params({"iterations": 5, "max_bin": 32}) == {"iterations": 5}
+
+
+def test_saved_pools_are_loaded_back_and_trained_on(tmp_path, splits):
+    from pools import PoolCache, quantization_params
+    from training import fit_model
+
+    built = PoolCache(str(tmp_path)).pools("v1", HYPERPARAMETERS, splits)
+    # A new cache, as in another worker process, reads the pools saved by the first one with "quantized://"
+    cache = PoolCache(str(tmp_path))
+    loaded = cache.load(cache.key("v1", quantization_params(HYPERPARAMETERS)))
+    assert loaded is not None
+    assert all(pool.is_quantized() for pool in loaded)
+    assert [pool.num_row() for pool in loaded] == [pool.num_row() for pool in built]
+
+    model, metrics, learning_curves = fit_model(splits, HYPERPARAMETERS, verbose=False, pools=loaded)
+    assert set(metrics) == {"RMSE", "R2"}
+    assert len(learning_curves["test_rmse"]) == HYPERPARAMETERS["iterations"]
+    assert len(model.predict(splits[2])) == len(splits[5])
+
+
+def test_unavailable_pools_fall_back_with_a_warning(tmp_path, splits):
+    from pools import PoolCache
+    from training import fit_model, load_pools
+
+    root = tmp_path / "pools"
+    cache = PoolCache(str(root))
+    # The pools can not be written: a file took the place of the cache directory
+    root.rmdir()
+    root.write_text("")
+    progress = []
+    assert load_pools(progress.append, cache, "vacancies@v1", splits, HYPERPARAMETERS) is None
+    assert progress[0]["warning"].startswith("Quantized pools not available")
+    model, metrics, _ = fit_model(splits, HYPERPARAMETERS, verbose=False)
+    assert set(metrics) == {"RMSE", "R2"}
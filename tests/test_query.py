@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from query import Predicate, QueryRequest, SortKey, run_query
+
+DF = pd.DataFrame(
+    {
+        "name": ["a", "b", "c", "d", "e", "f"],
+        "salary": [100.0, np.nan, 300.0, 200.0, 500.0, 400.0],
+        "area_name": pd.Categorical(["Москва", "Казань", "Москва", "Пермь", "Москва", "Казань"]),
+    }
+)
+
+
+def test_filters_and_projection():
+    query = QueryRequest(
+        columns=["name"],
+        filters=[
+            Predicate(column="salary", op="between", value=[150, 450]),
+            Predicate(column="area_name", op="in", value=["Москва", "Пермь"]),
+        ],
+    )
+    page, total, cursor = run_query(DF, query)
+    assert page.columns.tolist() == ["name"]
+    assert page["name"].tolist() == ["c", "d"]
+    assert total == 2
+    assert cursor is None
+
+
+def test_nulls_never_match_and_sort_last():
+    page, total, _ = run_query(DF, QueryRequest(filters=[Predicate(column="salary", op="<", value=1000)]))
+    assert total == 5
+    page, _, _ = run_query(DF, QueryRequest(sort=[SortKey(column="salary", descending=True)]))
+    assert page["name"].tolist() == ["e", "f", "c", "d", "a", "b"]
+
+
+def test_cursor_pages_cover_every_row_once():
+    query = QueryRequest(sort=[SortKey(column="salary")], limit=4)
+    names = []
+    while True:
+        page, total, cursor = run_query(DF, query)
+        names += page["name"].tolist()
+        if cursor is None:
+            break
+        query = query.model_copy(update={"cursor": cursor})
+    assert names == ["a", "d", "c", "f", "e", "b"]
+    assert total == 6
+
+
+def test_cursor_of_another_query_is_rejected():
+    _, _, cursor = run_query(DF, QueryRequest(limit=2))
+    with pytest.raises(ValueError, match="different query"):
+        run_query(DF, QueryRequest(sort=[SortKey(column="salary")], limit=2, cursor=cursor))
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        run_query(DF, QueryRequest(cursor="not a cursor"))
+
+
+def test_unknown_columns_and_operators():
+    with pytest.raises(KeyError):
+        run_query(DF, QueryRequest(columns=["missing"]))
+    with pytest.raises(ValueError):
+        run_query(DF, QueryRequest(filters=[Predicate(column="salary", op="like", value=1)]))
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from parser import Parser
+
+from seen_index import SeenIndex
+
+START = datetime(2024, 1, 1)
+
+
+def vacancy(vacancy_id, published_at):
+    return {"id": vacancy_id, "published_at": published_at.strftime("%Y-%m-%dT%H:%M:%S+0300")}
+
+
+class FakeParser(Parser):
+    """Один регион без метро; страницы отдаёт функция respond(date_from, page)."""
+
+    def __init__(self, respond, **kwargs):
+        super().__init__(**kwargs)
+        self.respond = respond
+
+    def get_openapi_fields(self, handle):
+        return []
+
+    def get_vacancies_with_salary(self, date_from, date_to, area, metro, page=0, per_page=100):
+        return self.respond(date_from, page)
+
+    def save_result(self, vacancies_list, path=None):
+        return vacancies_list
+
+
+def test_filter_new_drops_seen_vacancies(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.sqlite"))
+    assert index.filter_new([vacancy("1", START), vacancy("1", START)]) == [vacancy("1", START)]
+    index.finish_run(START, START + timedelta(days=1))
+    assert index.filter_new([vacancy("1", START), vacancy("2", START)]) == [vacancy("2", START)]
+
+
+def test_watermark_is_latest_published_at(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.sqlite"))
+    assert index.watermark() is None
+    index.filter_new([vacancy("1", START + timedelta(hours=5)), vacancy("2", START + timedelta(hours=2))])
+    index.finish_run(START, START + timedelta(days=1))
+    assert index.watermark() == START + timedelta(hours=5)
+
+    # Запуск без новых вакансий оставляет знак на месте
+    index.finish_run(START, START + timedelta(days=2))
+    assert index.watermark() == START + timedelta(hours=5)
+
+
+def test_watermark_is_capped_by_until(tmp_path):
+    index = SeenIndex(str(tmp_path / "seen.sqlite"))
+    index.filter_new([vacancy("1", START + timedelta(days=1, hours=5))])
+    index.finish_run(START, START + timedelta(days=2), until=START + timedelta(days=1))
+    assert index.watermark() == START + timedelta(days=1)
+
+
+def test_failed_unit_is_crawled_again_by_next_run(tmp_path):
+    # Второй день окна отвечает 503, первый - одной вакансией
+    def respond(date_from, page):
+        if date_from.startswith("2024-01-02"):
+            return None, 503
+        items = [vacancy("1", START + timedelta(hours=10))] if page == 0 else []
+        return {"items": items, "pages": 1}, 200
+
+    parser = FakeParser(respond, seen_index_path=str(tmp_path / "seen.sqlite"))
+    parser.incremental(date_from=START, date_to=START + timedelta(days=3))
+    assert parser.failed_units == [("2024-01-02T00:00:00", "2024-01-02T23:59:59", "", "")]
+    assert parser.seen_index.watermark() == START + timedelta(hours=10)
+
+    # Сбой прошёл: следующий запуск снова начинается до упавшего окна
+    def recovered(date_from, page):
+        items = [vacancy("2", START + timedelta(days=1, hours=3))] if page == 0 else []
+        return {"items": items, "pages": 1}, 200
+
+    parser.respond = recovered
+    vacancies_list = parser.incremental(date_to=START + timedelta(days=3))
+    assert [item["id"] for item in vacancies_list] == ["2"]
+    assert parser.failed_units == []
+    assert parser.seen_index.watermark() == START + timedelta(days=1, hours=3)
+
+
+def test_failed_unit_before_all_vacancies_caps_watermark(tmp_path):
+    # Первый день упал, а вакансии пришли только за второй: знак не уходит дальше начала первого дня
+    def respond(date_from, page):
+        if date_from.startswith("2024-01-01"):
+            return None, 502
+        items = [vacancy("1", START + timedelta(days=1, hours=10))] if page == 0 else []
+        return {"items": items, "pages": 1}, 200
+
+    parser = FakeParser(respond, seen_index_path=str(tmp_path / "seen.sqlite"))
+    parser.incremental(date_from=START, date_to=START + timedelta(days=2))
+    assert parser.seen_index.watermark() == START
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sharding import DONE, PENDING, LeaseQueue, merge, work
+
+
+def write_part(output_dir, shard_id, df):
+    df.to_parquet(os.path.join(output_dir, f"part-{shard_id}.parquet"), index=False)
+
+
+def test_merge_drops_duplicates_and_fills_missing_columns(tmp_path):
+    write_part(tmp_path, "a", pd.DataFrame({"id": ["1", "2"], "salary_from": [100, 200]}))
+    write_part(tmp_path, "b", pd.DataFrame({"id": ["2", "3"], "area_name": ["Москва", "Казань"]}))
+    result = merge(str(tmp_path), str(tmp_path / "result.parquet"))
+
+    df = pq.read_table(result).to_pandas()
+    assert df["id"].tolist() == ["1", "2", "3"]
+    assert df["salary_from"].tolist()[:2] == [100, 200]
+    assert df["area_name"].isna().tolist() == [True, True, False]
+
+
+def test_merge_stores_conflicting_columns_as_string(tmp_path):
+    # В одной части колонка из одних NaN (double), в другой - строки
+    write_part(tmp_path, "a", pd.DataFrame({"id": ["1"], "department_name": [np.nan], "code": [1]}))
+    write_part(tmp_path, "b", pd.DataFrame({"id": ["2"], "department_name": ["IT"], "code": ["A"]}))
+    result = merge(str(tmp_path), str(tmp_path / "result.parquet"))
+
+    df = pq.read_table(result).to_pandas()
+    assert df["department_name"].tolist() == [None, "IT"]
+    assert df["code"].tolist() == ["1", "A"]
+
+
+def test_lease_lifecycle(tmp_path):
+    queue = LeaseQueue(str(tmp_path), lease_timeout=600)
+    assert queue.put("s1", [["2024-01-01T00:00:00", "2024-01-01T23:59:59", "1", ""]])
+    assert not queue.put("s1", [])
+
+    shard_id, units = queue.lease()
+    assert shard_id == "s1"
+    assert units == [("2024-01-01T00:00:00", "2024-01-01T23:59:59", "1", "")]
+    assert queue.lease() is None
+    assert queue.complete("s1")
+    assert queue.progress() == {PENDING: 0, "leased": 0, DONE: 1}
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = LeaseQueue(str(tmp_path), lease_timeout=0)
+    queue.put("s1", [])
+    queue.lease()
+
+    # Аренда просрочена и возвращена в очередь: воркер узнаёт об этом, а не падает
+    assert queue.reclaim_expired() == 1
+    assert not queue.heartbeat("s1")
+    assert not queue.complete("s1")
+    assert queue.lease()[0] == "s1"
+
+
+class FakeParser:
+    """Парсер, у которого на первом шарде просрочивается аренда."""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.calls = 0
+        self.failed_units = []
+
+    def crawl_units(self, work_units):
+        self.calls += 1
+        if self.calls == 1:
+            self.queue.lease_timeout = 0
+            self.queue.reclaim_expired()
+            self.queue.lease_timeout = 600
+        return [{"id": str(self.calls)}]
+
+    def json_list_to_dataframe(self, vacancies_list):
+        return pd.DataFrame(vacancies_list)
+
+
+def test_worker_drops_result_of_lost_lease(tmp_path):
+    queue = LeaseQueue(str(tmp_path / "queue"), lease_timeout=600)
+    queue.put("s1", [])
+    output_dir = str(tmp_path / "parts")
+    parser = FakeParser(queue)
+    work(queue, output_dir, parser)
+
+    # Первый проход отброшен, шард обработан повторно
+    assert parser.calls == 2
+    assert queue.progress() == {PENDING: 0, "leased": 0, DONE: 1}
+    assert pq.read_table(os.path.join(output_dir, "part-s1.parquet")).to_pandas()["id"].tolist() == ["2"]
+
+
+class FailingParser(FakeParser):
+    """Парсер, у которого первая единица работы каждого шарда получает ошибку HTTP."""
+
+    def crawl_units(self, work_units):
+        self.calls += 1
+        self.failed_units = work_units[:1]
+        return [{"id": str(self.calls)}]
+
+
+def test_shard_with_failed_units_is_not_completed(tmp_path):
+    queue = LeaseQueue(str(tmp_path / "queue"), lease_timeout=600)
+    queue.put("s1", [["2024-01-01T00:00:00", "2024-01-01T23:59:59", "1", ""]])
+    output_dir = str(tmp_path / "parts")
+    work(queue, output_dir, FailingParser(queue))
+
+    assert queue.progress() == {PENDING: 0, "leased": 1, DONE: 0}
+    assert not os.path.exists(os.path.join(output_dir, "part-s1.parquet"))
+    # По истечении аренды шард снова в очереди
+    queue.lease_timeout = 0
+    assert queue.reclaim_expired() == 1
+    assert queue.lease()[0] == "s1"
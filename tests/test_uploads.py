@@ -0,0 +1,96 @@
+import asyncio
+import hashlib
+import io
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+from uploads import UploadStore
+
+DF = pd.DataFrame({"name": ["Python developer", "Analyst", "QA"], "salary": [150000, 90000, 70000]})
+
+
+class FakeRequest:
+    def __init__(self, data: bytes, piece: int = 5):
+        self.data = data
+        self.piece = piece
+
+    async def stream(self):
+        for start in range(0, len(self.data), self.piece):
+            yield self.data[start : start + self.piece]
+
+
+def upload(store, session_id, data: bytes, chunk_size: int, order=None):
+    chunks = [data[start : start + chunk_size] for start in range(0, len(data), chunk_size)]
+    for index in order or range(len(chunks)):
+        checksum = hashlib.sha256(chunks[index]).hexdigest()
+        asyncio.run(store.write_chunk(session_id, index, FakeRequest(chunks[index]), checksum))
+    return len(chunks)
+
+
+def serialize(df, format):
+    buffer = io.BytesIO()
+    if format == "csv":
+        df.to_csv(buffer, index=False)
+    elif format == "parquet":
+        df.to_parquet(buffer, index=False)
+    else:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("format", ["csv", "arrow", "parquet"])
+def test_chunks_out_of_order_are_assembled(tmp_path, format):
+    store = UploadStore(str(tmp_path))
+    data = serialize(DF, format)
+    session_id = store.open("vacancies", format, total_size=len(data), chunk_size=64)["session_id"]
+    chunks = (len(data) + 63) // 64
+    upload(store, session_id, data, 64, order=reversed(range(chunks)))
+
+    status = store.status(session_id)
+    assert status["received_chunks"] == list(range(chunks))
+    assert status["received_bytes"] == len(data)
+    pd.testing.assert_frame_equal(store.read_dataframe(session_id, chunks), DF, check_dtype=False)
+
+
+def test_checksum_mismatch_leaves_no_chunk(tmp_path):
+    store = UploadStore(str(tmp_path))
+    session_id = store.open("vacancies", "csv")["session_id"]
+    with pytest.raises(ValueError):
+        asyncio.run(store.write_chunk(session_id, 0, FakeRequest(b"name\n"), "0" * 64))
+    assert store.received(session_id) == {}
+    assert os.listdir(os.path.join(tmp_path, session_id)) == ["meta.json"]
+
+
+def test_missing_chunks_and_size_are_checked(tmp_path):
+    store = UploadStore(str(tmp_path))
+    data = serialize(DF, "csv")
+    session_id = store.open("vacancies", "csv", total_size=len(data) + 1, chunk_size=16)["session_id"]
+    chunks = upload(store, session_id, data, 16, order=[0, 2])
+    with pytest.raises(ValueError, match=r"Missing chunks: \[1"):
+        store.chunk_paths(session_id, chunks)
+
+    upload(store, session_id, data, 16)
+    with pytest.raises(ValueError, match="expected"):
+        store.chunk_paths(session_id, chunks)
+
+
+def test_unknown_sessions_and_formats_are_rejected(tmp_path):
+    store = UploadStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.open("vacancies", "pickle")
+    with pytest.raises(KeyError):
+        store.status("../" + "0" * 29)
+    with pytest.raises(KeyError):
+        store.status("0" * 32)
+
+
+def test_expired_sessions_are_removed(tmp_path):
+    store = UploadStore(str(tmp_path), ttl=60)
+    session_id = store.open("vacancies", "csv")["session_id"]
+    os.utime(os.path.join(tmp_path, session_id), (0, 0))
+    store.cleanup()
+    assert not os.path.exists(os.path.join(tmp_path, session_id))